@@ -0,0 +1,209 @@
+# asyncio串口接口：端口的文件描述符直接注册到事件循环（add_reader/add_writer），不为每个端口创建线程
+# 分包规则与SerialCore相同：数据间隔超过packet_timeout即结束当前数据包。
+# 用法：
+#   port = AsyncSerialPort('/dev/ttyUSB0', baudrate=115200)
+#   success, msg = await port.open()
+#   await port.send('01 03 00 00', is_hex=True)
+#   async for packet in port.packets():
+#       ...
+#   await port.close()
+# 需要提供文件描述符的端口（POSIX串口、pty、replay://）和支持add_reader的事件循环
+# （Windows上的ProactorEventLoop不支持）。
+import os
+import time
+import asyncio
+from collections import deque
+from packet_buffer import PacketAccumulator, Packet
+from serial_core import create_port, encode_payload
+from timebase import SessionClock
+
+
+class AsyncSerialPort:
+    """事件循环驱动的串口
+
+    接收的数据包（Packet）放入有界队列，超过max_packets时丢弃最旧的数据包并计数，
+    与接收缓冲区的drop_oldest策略一致；max_packets为0表示不限。
+    """
+
+    def __init__(self, port, baudrate=9600, bytesize=8, parity='N', stopbits=1,
+                 packet_timeout=0.01, max_packets=65536):
+        self.port = port
+        self.baudrate = baudrate
+        self.bytesize = bytesize
+        self.parity = parity
+        self.stopbits = stopbits
+        self.packet_timeout = packet_timeout  # 分包超时（秒）
+        self.max_packets = max_packets
+        self.serial_port = None
+        self.is_open = False
+        self.clock = SessionClock()
+        self.dropped_packets = 0
+        self.error = None  # 读取出错时的异常（端口随之关闭）
+        self._loop = None
+        self._fd = None
+        self._packet = PacketAccumulator()
+        self._first_rx_ns = 0
+        self._last_rx_ns = 0
+        self._timer = None  # 分包超时定时器
+        self._queue = deque()  # 已完成的数据包
+        self._waiter = None  # 等待数据包的Future
+        self._write_lock = asyncio.Lock()
+
+    async def open(self):
+        """打开串口并注册到当前事件循环，返回(是否成功, 消息)"""
+        if self.is_open:
+            return False, "串口已打开"
+        try:
+            self._loop = asyncio.get_running_loop()
+            # 读超时为0：只在事件循环报告可读后读取，读取不会阻塞
+            self.serial_port = create_port(self.port, self.baudrate, self.bytesize,
+                                           self.parity, self.stopbits, timeout=0)
+            try:
+                self._fd = self.serial_port.fileno()
+            except (AttributeError, NotImplementedError, OSError):
+                self.serial_port.close()
+                self.serial_port = None
+                return False, "串口打开失败: 该端口不提供文件描述符，无法注册到事件循环"
+            self._packet.clear()
+            self._queue.clear()
+            self.dropped_packets = 0
+            self.error = None
+            self.clock.reset()
+            self._loop.add_reader(self._fd, self._on_readable)
+            self.is_open = True
+            return True, "串口打开成功"
+        except Exception as e:
+            if self.serial_port is not None:
+                self.serial_port.close()
+                self.serial_port = None
+            return False, f"串口打开失败: {str(e)}"
+
+    async def close(self):
+        """关闭串口：等待进行中的发送完成，结束当前数据包，packets()迭代随之结束"""
+        if not self.is_open:
+            return False, "串口未打开"
+        async with self._write_lock:
+            self._shutdown()
+        return True, "串口关闭成功"
+
+    def _shutdown(self):
+        self.is_open = False
+        self._loop.remove_reader(self._fd)
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._packet:
+            self._emit_packet()
+        self.serial_port.close()
+        self._wake_waiter()
+
+    async def __aenter__(self):
+        success, msg = await self.open()
+        if not success:
+            raise OSError(msg)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _on_readable(self):
+        """端口可读（事件循环回调）：读出所有可用数据并按分包超时分包"""
+        try:
+            data = os.read(self._fd, 65536)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            # 设备断开（如USB串口拔出、pty另一端关闭）
+            self.error = e
+            self._shutdown()
+            return
+        if not data:
+            return
+        now_ns = time.monotonic_ns()
+        if self._packet and now_ns - self._last_rx_ns > self.packet_timeout * 1e9:
+            self._emit_packet()
+        if not self._packet:
+            self._first_rx_ns = now_ns
+        self._packet.append(data)
+        self._last_rx_ns = now_ns
+        if self._timer is None:
+            self._timer = self._loop.call_later(self.packet_timeout, self._on_packet_timeout)
+
+    def _on_packet_timeout(self):
+        """分包超时定时器：末字节之后超过packet_timeout没有新数据时结束数据包"""
+        self._timer = None
+        if not self._packet:
+            return
+        remaining = self.packet_timeout - (time.monotonic_ns() - self._last_rx_ns) / 1e9
+        if remaining > 0:
+            # 定时器启动后又收到了数据，按末字节时间顺延（不在每次读取时重设定时器）
+            self._timer = self._loop.call_later(remaining, self._on_packet_timeout)
+            return
+        self._emit_packet()
+
+    def _emit_packet(self):
+        item = Packet(self._packet.take(), self._first_rx_ns, self._last_rx_ns)
+        self._queue.append(item)
+        if self.max_packets and len(self._queue) > self.max_packets:
+            self._queue.popleft()
+            self.dropped_packets += 1
+        self._wake_waiter()
+
+    def _wake_waiter(self):
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    async def read_packet(self):
+        """取出下一个数据包，端口关闭且没有剩余数据包时返回None"""
+        while not self._queue:
+            if not self.is_open:
+                return None
+            self._waiter = self._loop.create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        return self._queue.popleft()
+
+    async def packets(self):
+        """异步迭代接收到的数据包，直到端口关闭"""
+        while True:
+            packet = await self.read_packet()
+            if packet is None:
+                return
+            yield packet
+
+    async def send(self, data, is_hex=False):
+        """发送数据（str按is_hex转换，bytes原样发送），返回(是否成功, 消息)
+
+        写缓冲区满时等待端口可写，不阻塞事件循环。
+        """
+        if not self.is_open:
+            return False, "串口未打开"
+        try:
+            bytes_data = data if isinstance(data, (bytes, bytearray)) else encode_payload(data, is_hex)
+            async with self._write_lock:
+                if not self.is_open:
+                    return False, "串口未打开"
+                await self._write_all(bytes_data)
+            return True, f"发送成功: {len(bytes_data)}字节"
+        except Exception as e:
+            return False, f"发送失败: {str(e)}"
+
+    async def _write_all(self, data):
+        if not hasattr(self.serial_port, 'fd'):
+            # 回放端口等不经过文件描述符写入
+            self.serial_port.write(data)
+            return
+        view = memoryview(data)
+        while view:
+            try:
+                view = view[os.write(self._fd, view):]
+            except BlockingIOError:
+                writable = self._loop.create_future()
+                self._loop.add_writer(self._fd, lambda: writable.done() or writable.set_result(None))
+                try:
+                    await writable
+                finally:
+                    self._loop.remove_writer(self._fd)
@@ -0,0 +1,83 @@
+# 数据包累积基准测试：对比bytes拼接与PacketAccumulator的复制量、分配次数和速度
+# 用法：python benchmarks/bench_accumulator.py [--packet-kb 1024] [--chunk 92]
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from packet_buffer import PacketAccumulator
+
+MB = 1024 * 1024
+
+
+def make_chunks(packet_size, chunk_size):
+    """模拟一次突发中每次read()返回的数据块"""
+    chunk = bytes(range(256)) * (chunk_size // 256 + 1)
+    chunk = chunk[:chunk_size]
+    count = packet_size // chunk_size
+    return [chunk] * count
+
+
+def run_bytes_concat(chunks):
+    """旧实现：current_packet += data"""
+    copied = 0
+    allocations = 0
+    packet = b''
+    for data in chunks:
+        packet += data
+        copied += len(packet)  # 每次拼接都复制整个新对象
+        allocations += 1
+    return packet, copied, allocations
+
+
+def run_accumulator(chunks):
+    """新实现：预分配缓冲区 + 结束时一次take()"""
+    acc = PacketAccumulator()
+    copied = 0
+    allocations = 1
+    for data in chunks:
+        capacity = acc.capacity
+        acc.append(data)
+        copied += len(data)
+        if acc.capacity != capacity:
+            copied += capacity  # 扩容时复制已有数据
+            allocations += 1
+    packet = acc.take()
+    copied += len(packet)
+    allocations += 1
+    return packet, copied, allocations
+
+
+def measure(func, chunks):
+    """运行并返回(耗时秒, 数据包大小, 复制字节数, 分配次数, 峰值内存)"""
+    # 计时与内存跟踪分开进行，避免tracemalloc影响速度
+    start = time.perf_counter()
+    func(chunks)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    packet, copied, allocations = func(chunks)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, len(packet), copied, allocations, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据包累积方式对比')
+    parser.add_argument('--packet-kb', type=int, default=1024, help='单个突发数据包大小(KB)')
+    parser.add_argument('--chunk', type=int, default=92, help='每次read()返回的字节数（921600波特率下1ms约92字节）')
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.packet_kb * 1024, args.chunk)
+    print(f"突发大小 {args.packet_kb}KB，每次读取 {args.chunk} 字节，共 {len(chunks)} 次读取")
+    print(f"{'实现':<14}{'MB/s':>10}{'复制MB/MB':>12}{'分配次数/MB':>14}{'峰值内存MB':>12}")
+    for name, func in (('bytes拼接', run_bytes_concat), ('Accumulator', run_accumulator)):
+        elapsed, size, copied, allocations, peak = measure(func, chunks)
+        mb = size / MB
+        print(f"{name:<14}{mb / elapsed:>10.1f}{copied / size:>12.1f}{allocations / mb:>14.1f}{peak / MB:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# 数据格式化基准测试：对比旧的逐字节拼接与data_format批量格式化的吞吐量(MB/s)
+# 用法：python benchmarks/bench_format.py [--packets 20000] [--size 64]
+import os
+import sys
+import time
+import random
+import argparse
+import binascii
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_format
+from packet_buffer import Packet
+from packet_store import PacketStore
+
+MB = 1024 * 1024
+
+
+def make_store(count, size, text=False):
+    """生成随机长度（平均size字节）的数据包并存入PacketStore，text为True时生成ASCII文本行"""
+    rng = random.Random(1)
+    store = PacketStore(max_bytes=1 << 40)
+    letters = b'abcdefghijklmnopqrstuvwxyz0123456789 ,.:='
+    ns = 0
+    for _ in range(count):
+        length = rng.randint(1, size * 2 - 1)
+        if text:
+            data = bytes(rng.choices(letters, k=length)) + b'\r\n'
+        else:
+            data = rng.randbytes(length)
+        ns += 1_000_000
+        store.append(Packet(data, ns, ns + 1000))
+    return store
+
+
+def legacy_hex(block):
+    """旧实现：hexlify后每两个字符切片再join"""
+    rows = []
+    payload = block.payload
+    for s, e in zip(block.offsets, block.offsets[1:]):
+        hex_str = binascii.hexlify(payload[s:e]).decode('ascii')
+        rows.append(' '.join([hex_str[i:i+2] for i in range(0, len(hex_str), 2)]))
+    return rows
+
+
+def per_packet_hex(block):
+    """逐包调用bytes.hex(' ')"""
+    payload = block.payload
+    return [data_format.hex_spaced(payload[s:e]) for s, e in zip(block.offsets, block.offsets[1:])]
+
+
+def bulk(data_mode):
+    return lambda block: data_format.format_rows(block.payload, block.offsets, data_mode)
+
+
+def hexdump_block(block):
+    return data_format.hexdump(block.payload)
+
+
+def measure(func, blocks, repeat):
+    """取repeat次中最快的一次，返回MB/s"""
+    total_bytes = sum(len(block.payload) for block in blocks)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for block in blocks:
+            func(block)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return total_bytes / MB / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据格式化吞吐量对比')
+    parser.add_argument('--packets', type=int, default=20000, help='数据包数量')
+    parser.add_argument('--size', type=int, default=64, help='平均数据包大小(字节)')
+    parser.add_argument('--block', type=int, default=256, help='每块数据包数（与显示缓存块一致）')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数')
+    args = parser.parse_args()
+
+    store = make_store(args.packets, args.size)
+    blocks = list(store.iter_blocks(args.block))
+    text_blocks = list(make_store(args.packets, args.size, text=True).iter_blocks(args.block))
+    print(f"{len(store)} 个数据包，共 {store.total_bytes / MB:.2f}MB，每块 {args.block} 包")
+    cases = (
+        ('旧hex(join切片)', legacy_hex, blocks),
+        ('逐包hex(" ")', per_packet_hex, blocks),
+        ('批量hex', bulk(data_format.HEX_MODE), blocks),
+        ('批量ascii', bulk(data_format.ASCII_MODE), blocks),
+        ('文本(二进制数据)', bulk(data_format.TEXT_MODE), blocks),
+        ('文本(ASCII行)', bulk(data_format.TEXT_MODE), text_blocks),
+        ('hexdump', hexdump_block, blocks),
+    )
+    print(f"{'方式':<18}{'MB/s':>10}")
+    for name, func, data in cases:
+        print(f"{name:<18}{measure(func, data, args.repeat):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# 读取线程基准测试：对比事件驱动读取与1ms轮询的空闲CPU占用和分包边界抖动
+# 用法（仅限Linux/macOS）：python benchmarks/bench_reader.py [--idle 3] [--packets 200]
+import os
+import sys
+import time
+import argparse
+import statistics
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serial_comm import SerialComm
+
+
+def open_pty_pair():
+    """创建虚拟串口对，返回(主端fd, 从端设备名)"""
+    master_fd, slave_fd = os.openpty()
+    slave_name = os.ttyname(slave_fd)
+    return master_fd, slave_fd, slave_name
+
+
+def measure_idle_cpu(comm, seconds):
+    """测量串口空闲时读取线程的CPU占用（百分比）"""
+    cpu_start = time.process_time()
+    wall_start = time.monotonic()
+    time.sleep(seconds)
+    cpu = time.process_time() - cpu_start
+    wall = time.monotonic() - wall_start
+    return 100.0 * cpu / wall
+
+
+def measure_boundary_jitter(comm, master_fd, packets, packet_timeout):
+    """测量分包边界延迟：从最后一个字节写入到数据包交付的时间减去分包超时"""
+    delivered = []
+    done = threading.Event()
+
+    def on_packet(data):
+        delivered.append(time.monotonic())
+        if len(delivered) >= packets:
+            done.set()
+
+    comm.set_callback(on_packet)
+    written = []
+    payload = bytes(range(32))
+    for _ in range(packets):
+        os.write(master_fd, payload)
+        written.append(time.monotonic())
+        # 包间隔取分包超时的3倍，保证每次写入都是一个独立数据包
+        time.sleep(packet_timeout * 3)
+    done.wait(timeout=2.0)
+    comm.set_callback(None)
+
+    delays = [(d - w - packet_timeout) * 1000.0 for w, d in zip(written, delivered)]
+    return {
+        'packets': len(delays),
+        'mean_ms': statistics.mean(delays),
+        'stdev_ms': statistics.pstdev(delays),
+        'min_ms': min(delays),
+        'max_ms': max(delays),
+    }
+
+
+def run_mode(mode, idle_seconds, packets, packet_timeout):
+    """以指定读取方式运行一轮测试"""
+    master_fd, slave_fd, slave_name = open_pty_pair()
+    comm = SerialComm()
+    comm.set_read_mode(mode)
+    comm.packet_timeout = packet_timeout
+    success, msg = comm.open_port(slave_name, baudrate=115200)
+    if not success:
+        raise RuntimeError(msg)
+    try:
+        time.sleep(0.2)  # 等待读取线程启动
+        idle_cpu = measure_idle_cpu(comm, idle_seconds)
+        jitter = measure_boundary_jitter(comm, master_fd, packets, packet_timeout)
+    finally:
+        comm.close_port()
+        os.close(master_fd)
+        os.close(slave_fd)
+    return idle_cpu, jitter
+
+
+def main():
+    parser = argparse.ArgumentParser(description='读取线程空闲CPU与分包抖动对比')
+    parser.add_argument('--idle', type=float, default=3.0, help='空闲测量时长(秒)')
+    parser.add_argument('--packets', type=int, default=200, help='抖动测量的数据包数量')
+    parser.add_argument('--packet-timeout', type=float, default=0.01, help='分包超时(秒)')
+    args = parser.parse_args()
+
+    print(f"{'模式':<8}{'空闲CPU%':>10}{'平均延迟ms':>12}{'抖动σ ms':>10}{'最小ms':>9}{'最大ms':>9}")
+    for mode in ('poll', 'event'):
+        idle_cpu, jitter = run_mode(mode, args.idle, args.packets, args.packet_timeout)
+        print(f"{mode:<8}{idle_cpu:>10.2f}{jitter['mean_ms']:>12.3f}{jitter['stdev_ms']:>10.3f}"
+              f"{jitter['min_ms']:>9.3f}{jitter['max_ms']:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+# 吞吐量与分包准确度基准测试：虚拟串口对(pty) + 独立的发送进程，输出机器可读的JSON报告
+# 用法（仅限Linux，无需显示器）：
+#   python benchmarks/bench_throughput.py [--consumer ring|gui] [--scenario 名称 ...] [--output report.json]
+#
+# 发送进程在pty主端按设定的包大小、包间隔写入，记录每个数据包写完的时间（CLOCK_MONOTONIC，
+# 与读取线程同一时钟）；SerialComm打开从端。每个场景测量：
+#   bytes_per_s / packets_per_s   - 从第一个包写入到最后一个包被消费者取走的速率
+#   cpu_percent                   - 本进程（读取线程 + 消费者）的CPU占用，不含发送进程
+#   latency_ms.split              - 最后一个字节写入到读取线程结束该包的时间（包含分包超时）
+#   latency_ms.reader_to_consumer - 读取线程结束该包（末字节时间 + 分包超时）到消费者取走的时间，
+#                                   主要是批量通知间隔和消费者调度延迟
+#   split                         - 与真实包边界对比：命中/漏分（合并）/误分（拆开）的边界数
+# consumer为gui时在offscreen平台上运行完整的SerialGUI（第一个串口标签页，经PortHub选择线程读取），
+# 走on_packets_available/on_packets_received和合并视图的路径。
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serial_comm import SerialComm
+
+# 场景：(包大小字节, 包间隔秒, 包数)；包间隔为0表示连续写入（只测吞吐量，不评价分包）
+SCENARIOS = {
+    'small_packets': (64, 0.02, 200),
+    'large_packets': (4096, 0.02, 200),
+    'near_timeout': (256, 0.016, 200),  # 包间隔接近分包超时(默认10ms)
+    'stream': (65536, 0.0, 256),  # 连续16MB，测最大吞吐量
+}
+
+
+def percentile(values, p):
+    """取第p百分位（最近秩）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(round(p / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[k]
+
+
+def latency_summary(values_ns):
+    """延迟统计（毫秒）"""
+    if not values_ns:
+        return None
+    ms = [v / 1e6 for v in values_ns]
+    return {
+        'p50': percentile(ms, 50),
+        'p95': percentile(ms, 95),
+        'p99': percentile(ms, 99),
+        'max': max(ms),
+        'mean': sum(ms) / len(ms),
+    }
+
+
+def make_packet(seq, size):
+    """生成内容可辨认的数据包（序号 + 填充）"""
+    head = seq.to_bytes(4, 'big')
+    return (head + bytes((seq + i) & 0xff for i in range(size - 4)))[:size]
+
+
+def generate(master_fd, size, gap, count, start_ns, conn):
+    """发送进程：在start_ns开始按包间隔写入，写完后把各包写完时间发回"""
+    packets = [make_packet(seq, size) for seq in range(count)]
+    while time.monotonic_ns() < start_ns:
+        time.sleep(0.001)
+    written = []
+    due = time.monotonic()
+    for data in packets:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(master_fd, view):]
+        written.append(time.monotonic_ns())
+        if gap:
+            due += gap
+            # 粗睡眠后自旋到截止时间，包间隔误差在几十微秒内
+            remaining = due - time.monotonic()
+            if remaining > 0.002:
+                time.sleep(remaining - 0.001)
+            while time.monotonic() < due:
+                pass
+    conn.send(written)
+    conn.close()
+
+
+def boundaries(sizes):
+    """由包长度序列得到包边界（累计字节偏移）集合，不含0"""
+    result = set()
+    offset = 0
+    for size in sizes:
+        offset += size
+        result.add(offset)
+    return result
+
+
+def split_accuracy(sent_sizes, received_sizes):
+    """对比真实包边界与检测到的边界"""
+    expected = boundaries(sent_sizes)
+    detected = boundaries(received_sizes)
+    hits = len(expected & detected)
+    return {
+        'expected_boundaries': len(expected),
+        'detected_boundaries': len(detected),
+        'hits': hits,
+        'missed': len(expected - detected),  # 相邻包被合并
+        'spurious': len(detected - expected),  # 一个包被拆开
+        'precision': hits / len(detected) if detected else None,
+        'recall': hits / len(expected) if expected else None,
+    }
+
+
+class RingConsumer:
+    """直接从接收缓冲区读取（测读取线程本身）"""
+
+    def __init__(self, comm):
+        self.consumer = comm.rx_ring.consumer()
+        self.received = []  # [(Packet, 取走时间ns), ...]
+        self.bytes = 0
+
+    def poll(self):
+        packets = self.consumer.read()
+        if packets:
+            now_ns = time.monotonic_ns()
+            self.received.extend((p, now_ns) for p in packets)
+            self.bytes += sum(len(p.data) for p in packets)
+        else:
+            time.sleep(0.001)
+
+    def close(self):
+        pass
+
+
+class GuiConsumer:
+    """完整的SerialGUI（offscreen），测on_packets_available到数据包存储的路径"""
+
+    def __init__(self, comm_holder, wrap=False, wrap_byte_limit=64 * 1024):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PyQt5.QtWidgets import QApplication
+        self.app = QApplication.instance() or QApplication(sys.argv)
+        from serial_gui import SerialGUI
+        self.window = SerialGUI()
+        panel = self.window.panels[0]
+        panel.receive_view.set_wrap_byte_limit(wrap_byte_limit)
+        panel.receive_view.set_wrap(wrap)
+        self.received = []
+        self.bytes = 0
+        original = panel.on_packets_received
+
+        def on_packets_received(packets):
+            now_ns = time.monotonic_ns()
+            self.received.extend((p, now_ns) for p in packets)
+            self.bytes += sum(len(p.data) for p in packets)
+            original(packets)
+
+        panel.on_packets_received = on_packets_received
+        comm_holder.append(panel.serial_comm)
+
+    def poll(self):
+        self.app.processEvents()
+        time.sleep(0.001)
+
+    def close(self):
+        self.window.port_timer.stop()
+        self.window.close()
+
+
+def run_scenario(name, size, gap, count, args):
+    """运行一个场景，返回结果字典"""
+    master_fd, slave_fd = os.openpty()
+    slave_name = os.ttyname(slave_fd)
+    holder = []
+    if args.consumer == 'gui':
+        consumer = GuiConsumer(holder, args.wrap, args.wrap_limit_kb * 1024)
+        comm = holder[0]
+    else:
+        comm = SerialComm()
+        consumer = RingConsumer(comm)
+    comm.packet_timeout = args.packet_timeout
+    comm.set_callback(None)
+    success, msg = comm.open_port(slave_name, baudrate=115200)
+    if not success:
+        raise RuntimeError(msg)
+
+    parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+    start_ns = time.monotonic_ns() + 200_000_000  # 留出读取线程启动时间
+    generator = multiprocessing.Process(target=generate,
+                                        args=(master_fd, size, gap, count, start_ns, child_conn))
+    generator.start()
+    total_bytes = size * count
+    cpu_start = resource.getrusage(resource.RUSAGE_SELF)
+    wall_start = time.monotonic()
+    deadline = None
+    written = None
+    try:
+        while True:
+            consumer.poll()
+            if written is None and parent_conn.poll():
+                written = parent_conn.recv()
+                deadline = time.monotonic() + args.settle
+            if consumer.bytes >= total_bytes and written is not None:
+                break
+            if deadline is not None and time.monotonic() > deadline:
+                break
+    finally:
+        cpu_end = resource.getrusage(resource.RUSAGE_SELF)
+        wall_end = time.monotonic()
+        generator.join(timeout=5)
+        comm.close_port()
+        consumer.close()
+        os.close(master_fd)
+        os.close(slave_fd)
+
+    received = consumer.received
+    timeout_ns = int(args.packet_timeout * 1e9)
+    received_bytes = sum(len(p.data) for p, _ in received)
+    first_ns = start_ns
+    last_ns = received[-1][1] if received else time.monotonic_ns()
+    duration = max((last_ns - first_ns) / 1e9, 1e-9)
+    cpu = (cpu_end.ru_utime - cpu_start.ru_utime) + (cpu_end.ru_stime - cpu_start.ru_stime)
+
+    result = {
+        'name': name,
+        'packet_size': size,
+        'packet_gap_ms': gap * 1000,
+        'packets_sent': count,
+        'bytes_sent': total_bytes,
+        'packets_received': len(received),
+        'bytes_received': received_bytes,
+        'duration_s': duration,
+        'bytes_per_s': received_bytes / duration,
+        'packets_per_s': len(received) / duration,
+        'cpu_percent': 100.0 * cpu / (wall_end - wall_start),
+        'latency_ms': {
+            'reader_to_consumer': latency_summary([t - p.last_ns - timeout_ns for p, t in received]),
+        },
+    }
+    if gap and written is not None:
+        # 每个真实包的最后一个字节写入时间，对应到包含该字节的接收包的结束时间
+        ends = []
+        offset = 0
+        for packet, _ in received:
+            offset += len(packet.data)
+            ends.append((offset, packet.last_ns))
+        split_latency = []
+        j = 0
+        for seq, write_ns in enumerate(written):
+            boundary = (seq + 1) * size
+            while j < len(ends) and ends[j][0] < boundary:
+                j += 1
+            if j == len(ends):
+                break
+            # 读取线程在最后一个字节到达后再等待分包超时才结束数据包，用末字节时间加超时近似结束时刻
+            split_latency.append(ends[j][1] + timeout_ns - write_ns)
+        result['latency_ms']['split'] = latency_summary(split_latency)
+        result['split'] = split_accuracy([size] * count, [len(p.data) for p, _ in received])
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SerialComm吞吐量与分包准确度基准测试')
+    parser.add_argument('--consumer', choices=('ring', 'gui'), default='ring',
+                        help='消费者：ring直接读接收缓冲区，gui运行完整的SerialGUI')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='要运行的场景（可重复，默认全部）')
+    parser.add_argument('--packet-timeout', type=float, default=0.01, help='分包超时(秒)')
+    parser.add_argument('--settle', type=float, default=2.0, help='发送结束后等待剩余数据的最长时间(秒)')
+    parser.add_argument('--output', help='JSON报告输出文件（默认输出到标准输出）')
+    parser.add_argument('--wrap', action='store_true',
+                        help='gui消费者：接收视图自动换行（界面"自动换行"，默认关闭）')
+    parser.add_argument('--wrap-limit-kb', type=int, default=64,
+                        help='gui消费者：自动换行时超过该数据量(KB)后不再换行（界面"数据量大时不换行"，0为不限）')
+    args = parser.parse_args()
+
+    report = {
+        'benchmark': 'serial_throughput',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': {
+            'consumer': args.consumer,
+            'packet_timeout_s': args.packet_timeout,
+            'wrap': args.wrap,
+            'wrap_limit_kb': args.wrap_limit_kb,
+        },
+        'scenarios': [],
+    }
+    for name in args.scenario or list(SCENARIOS):
+        size, gap, count = SCENARIOS[name]
+        result = run_scenario(name, size, gap, count, args)
+        report['scenarios'].append(result)
+        # 人可读的摘要输出到标准错误，标准输出只留JSON
+        split = result.get('split')
+        accuracy = f"recall={split['recall']:.3f} precision={split['precision']:.3f}" if split else ''
+        print(f"{name:<14}{result['bytes_per_s'] / 1e6:>9.2f}MB/s{result['packets_per_s']:>10.0f}pkt/s"
+              f"{result['cpu_percent']:>8.1f}%CPU  {accuracy}", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
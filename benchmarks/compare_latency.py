@@ -0,0 +1,48 @@
+# 延迟对比：读取两次延迟追踪的直方图文件（GUI"统计"窗口或capture_cli --trace-dump导出），
+# 按阶段对比p50/p90/p99/p99.9/最大值，用于验证某项改动对端到端延迟的影响
+# 用法：python benchmarks/compare_latency.py before.json after.json
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from latency import STAGES, load_histograms
+
+COLUMNS = [('p50', 50), ('p90', 90), ('p99', 99), ('p99.9', 99.9)]
+
+
+def format_change(before, after):
+    """变化量（毫秒）和相对变化"""
+    delta = (after - before) / 1000
+    if before:
+        return f"{delta:+.3f}ms ({(after - before) / before * 100:+.0f}%)"
+    return f"{delta:+.3f}ms"
+
+
+def compare(before, after):
+    for stage, label in STAGES.items():
+        a = before.get(stage)
+        b = after.get(stage)
+        if not (a and a.count) and not (b and b.count):
+            continue
+        print(f"{label}（{stage}）: 样本 {a.count if a else 0} -> {b.count if b else 0}")
+        if not (a and a.count and b and b.count):
+            print("  只有一侧有记录，跳过对比")
+            continue
+        rows = [(name, a.percentile(p), b.percentile(p)) for name, p in COLUMNS]
+        rows.append(('最大', a.max, b.max))
+        for name, x, y in rows:
+            print(f"  {name:<6} {x / 1000:>10.3f}ms -> {y / 1000:>10.3f}ms  {format_change(x, y)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按阶段对比两次延迟追踪的分位数')
+    parser.add_argument('before', help='基准版本的直方图文件')
+    parser.add_argument('after', help='改动后的直方图文件')
+    args = parser.parse_args()
+    compare(load_histograms(args.before), load_histograms(args.after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+# 命令行抓包：不启动GUI、不导入PyQt5，打开串口后把接收数据流式写入会话记录并定期打印速率统计
+# 记录器作为接收端订阅SerialCore，读取线程直接把数据包交给记录器的写线程，主线程只负责统计输出
+# 用法：python capture_cli.py COM3 -b 115200 [--record capture] [--duration 60]
+#       python capture_cli.py --list
+# Ctrl+C（SIGINT）或SIGTERM时写完积压数据、关闭记录文件后退出。
+import sys
+import time
+import signal
+import argparse
+import threading
+from serial_core import SerialCore
+from data_logger import DataLogger, SessionRecorder
+from sinks import RecorderSink
+from metrics import MetricsRegistry, JsonLinesExporter, format_rate
+from latency import LatencyTracer, STAGES
+import diag_log
+import framing
+
+# 与GUI串口设置一致的可选参数
+BAUDRATES = [9600, 19200, 38400, 57600, 115200]
+PARITIES = ['N', 'O', 'E', 'M', 'S']
+STOPBITS = {'1': 1, '1.5': 1.5, '2': 2}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='串口命令行抓包（无界面）')
+    parser.add_argument('port', nargs='?', help="串口名，也可以是'replay://文件'或pyserial URL")
+    parser.add_argument('-b', '--baudrate', type=int, default=115200,
+                        help=f"波特率（GUI可选值: {', '.join(map(str, BAUDRATES))}）")
+    parser.add_argument('--bytesize', type=int, choices=(5, 6, 7, 8), default=8, help='数据位')
+    parser.add_argument('--parity', choices=PARITIES, default='N', help='校验位')
+    parser.add_argument('--stopbits', choices=sorted(STOPBITS), default='1', help='停止位')
+    parser.add_argument('--read-timeout', type=int, default=1000, help='读超时(ms)')
+    parser.add_argument('--packet-timeout', type=int, default=10, help='分包超时(ms)')
+    parser.add_argument('--framing', default='gap',
+                        help="分帧方式：gap、delimiter:0d0a、fixed:aa,4、length:aa,1,1,0、slip、cobs（见framing模块）")
+    parser.add_argument('--frame-timeout-discard', action='store_true',
+                        help='未完成的帧在分包超时内没有新数据时丢弃（仅分帧方式不为gap时有效）')
+    parser.add_argument('--record', choices=sorted(SessionRecorder.FILE_NAMES), default='capture',
+                        help='会话记录类型')
+    parser.add_argument('--log-dir', default='logs', help='日志目录')
+    parser.add_argument('--duration', type=float, help='抓包时长(秒)，默认直到Ctrl+C')
+    parser.add_argument('--stats-interval', type=float, default=1.0, help='统计输出间隔(秒)')
+    parser.add_argument('--metrics-json', metavar='FILE', help='每个统计间隔把运行统计追加写入JSON Lines文件')
+    parser.add_argument('--trace', type=int, metavar='N',
+                        help='抽样延迟追踪：每N个数据包追踪一个（1为全部），结束时输出各阶段延迟分位数')
+    parser.add_argument('--trace-dump', metavar='FILE', help='结束时把延迟直方图写入JSON文件（未指定--trace时按16抽样）')
+    parser.add_argument('-v', '--verbose', action='store_true', help='逐包输出收发数据的日志（DEBUG级别）')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='诊断日志级别（默认取环境变量UART_LOG_LEVEL，未设置时为INFO）')
+    parser.add_argument('--log-file', metavar='FILE', help='诊断日志同时追加写入该文件')
+    parser.add_argument('--list', action='store_true', help='列出可用串口后退出')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    core = SerialCore()
+    if args.list:
+        for port in core.get_ports():
+            print(port)
+        return 0
+    if not args.port:
+        print('请指定串口（--list列出可用串口）', file=sys.stderr)
+        return 2
+
+    try:
+        diag_log.setup_logging(args.log_level, args.log_file)
+    except OSError as e:
+        print(f'无法写入日志文件: {e}', file=sys.stderr)
+        return 2
+    diag_log.set_packet_logging(args.verbose)
+    core.set_timeouts(args.read_timeout / 1000.0, args.packet_timeout / 1000.0)
+    try:
+        core.set_framer(framing.create_framer(args.framing, args.frame_timeout_discard))
+    except ValueError as e:
+        print(f'分帧方式无效: {e}', file=sys.stderr)
+        return 2
+    logger = DataLogger(args.log_dir)
+    success, msg = core.open_port(
+        port=args.port,
+        baudrate=args.baudrate,
+        bytesize=args.bytesize,
+        parity=args.parity,
+        stopbits=STOPBITS[args.stopbits],
+        timeout=args.read_timeout / 1000.0
+    )
+    print(msg, file=sys.stderr)
+    if not success:
+        return 1
+
+    port_info = {
+        'port': args.port,
+        'baudrate': args.baudrate,
+        'bytesize': args.bytesize,
+        'parity': args.parity,
+        'stopbits': args.stopbits,
+    }
+    tracer = None
+    if args.trace or args.trace_dump:
+        tracer = core.tracer = LatencyTracer(args.trace or 16)
+    session_dir = logger.start_session_log(port_info, core.clock, record=args.record, tracer=tracer)
+    sink = core.subscribe(RecorderSink(logger.recorder))
+    print(f"记录到: {session_dir}", file=sys.stderr)
+
+    # 运行统计：接收缓冲区没有消费者时数据包随写随释放，速率来自它的累计计数
+    registry = MetricsRegistry(labels={'port': args.port})
+    core.register_metrics(registry)
+    recorder = logger.recorder
+    registry.add_rate('recorder_bytes', lambda: recorder.bytes_written)
+    registry.add_gauge('recorder_queued_bytes', lambda: recorder.stats()['queued_bytes'])
+    registry.add_gauge('recorder_dropped_packets', lambda: recorder.dropped_packets)
+    registry.snapshot()
+    exporter = None
+    if args.metrics_json:
+        try:
+            exporter = JsonLinesExporter(args.metrics_json)
+        except OSError as e:
+            print(f'无法写入统计文件: {e}', file=sys.stderr)
+
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        stop.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    start = time.monotonic()
+    next_stats = start + args.stats_interval
+    try:
+        while not stop.is_set():
+            stop.wait(min(args.stats_interval, 0.2))
+            now = time.monotonic()
+            if now >= next_stats:
+                snapshot = registry.snapshot()
+                framing_errors = f" | 分帧错误 {snapshot['framing_errors']}" if core.framer else ''
+                print(f"[{now - start:8.1f}s] {snapshot['rx_packets_per_s']:9.0f}包/s "
+                      f"{format_rate(snapshot['rx_bytes_per_s']):>11} | "
+                      f"累计 {snapshot['rx_packets_total']}包 {snapshot['rx_bytes_total']}字节 | "
+                      f"记录积压 {snapshot['recorder_queued_bytes']}字节 "
+                      f"丢弃 {snapshot['recorder_dropped_packets']}包{framing_errors}",
+                      file=sys.stderr, flush=True)
+                if exporter is not None:
+                    exporter.write(snapshot)
+                next_stats = now + args.stats_interval
+            if args.duration is not None and now - start >= args.duration:
+                break
+            if not core.is_open:
+                print('串口已断开', file=sys.stderr)
+                break
+    finally:
+        # 读取线程退出前把剩余数据包交给接收端，之后再停止记录器
+        core.close_port()
+        core.unsubscribe(sink)
+        if exporter is not None:
+            exporter.close()
+        total_packets, total_bytes = core.rx_ring.total_packets, core.rx_ring.total_bytes
+        result = logger.stop_session_log()
+        elapsed = time.monotonic() - start
+        print(f"共接收 {total_packets}包 {total_bytes}字节，用时 {elapsed:.1f}s，"
+              f"平均 {format_rate(total_bytes / max(elapsed, 1e-9))}", file=sys.stderr)
+        framing_stats = core.get_framing_stats()
+        if framing_stats:
+            print(f"分帧({framing_stats['framer']}): {framing_stats['frames']}帧，错误 {framing_stats['errors']}次，"
+                  f"丢弃 {framing_stats['discarded_bytes']}字节", file=sys.stderr)
+        if result is not None:
+            print(f"已写入 {result['path']}（{result['bytes_written']}字节，丢弃 {result['dropped_packets']}包）",
+                  file=sys.stderr)
+            if result['error']:
+                print(f"记录错误: {result['error']}", file=sys.stderr)
+        if tracer is not None:
+            print_latency(tracer)
+            if args.trace_dump:
+                try:
+                    tracer.dump(args.trace_dump, port=args.port, source='capture_cli')
+                    print(f"延迟直方图已写入 {args.trace_dump}", file=sys.stderr)
+                except OSError as e:
+                    print(f"无法写入延迟直方图: {e}", file=sys.stderr)
+    return 0
+
+
+def print_latency(tracer):
+    """输出各阶段的延迟分位数"""
+    summary = tracer.summary()
+    print(f"延迟（从首字节到达算起，每{tracer.sample_every}包抽样一个）:", file=sys.stderr)
+    for stage, label in STAGES.items():
+        stats = summary.get(stage)
+        if stats:
+            print(f"  {label:<6} {stats['count']:>7}次  p50 {stats['p50_ms']:.3f}ms  p99 {stats['p99_ms']:.3f}ms  "
+                  f"p99.9 {stats['p999_ms']:.3f}ms  最大 {stats['max_ms']:.3f}ms", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,243 @@
+# 带索引的二进制抓包文件：长度前缀记录 + 文件尾稀疏索引，读取端用mmap按包号/时间二分定位
+#
+# 文件布局（小端）：
+#   文件头  magic 'SCAP' | 版本 u16 | 文件头长度 u16 | 墙上时间锚点 u64 | 单调时间锚点 u64
+#   记录    数据长度 u32 | 方向 u8 | 保留 u8*3 | 首字节时间 u64 | 末字节时间 u64 | 数据
+#   索引    每INDEX_INTERVAL个记录一项：包号 u64 | 记录文件偏移 u64 | 首字节时间 u64
+#           （索引项的时间是截至该记录（含）的最大首字节时间，记录不按时间顺序写入时仍单调）
+#   文件尾  索引偏移 u64 | 索引项数 u64 | 记录总数 u64 | magic 'SIDX'
+#
+# 未正常关闭（无文件尾）的文件打开时顺序扫描一遍记录重建索引，截断的最后一条记录被忽略。
+import mmap
+import struct
+from array import array
+from itertools import accumulate
+from bisect import bisect_left, bisect_right
+from packet_buffer import Packet
+
+MAGIC = b'SCAP'
+INDEX_MAGIC = b'SIDX'
+VERSION = 1
+
+DIR_RX = 0  # 接收
+DIR_TX = 1  # 发送
+
+HEADER = struct.Struct('<4sHHQQ')
+RECORD = struct.Struct('<I4xQQ')
+DIRECTION = 4  # 记录头中方向字节的偏移
+INDEX_ENTRY = struct.Struct('<QQQ')
+TRAILER = struct.Struct('<QQQ4s')
+
+INDEX_INTERVAL = 1024  # 每多少个记录建立一个索引项
+
+
+class CaptureWriter:
+    """顺序写入抓包文件，内存中只保留稀疏索引，close()时写入索引和文件尾"""
+
+    def __init__(self, path, clock=None, buffer_size=1024 * 1024, index_interval=INDEX_INTERVAL):
+        self.path = path
+        self.index_interval = index_interval
+        self._file = open(path, 'wb', buffering=buffer_size)
+        wall_ns = clock.wall_anchor_ns if clock is not None else 0
+        mono_ns = clock.mono_anchor_ns if clock is not None else 0
+        self._file.write(HEADER.pack(MAGIC, VERSION, HEADER.size, wall_ns, mono_ns))
+        self._offset = HEADER.size  # 下一条记录的文件偏移
+        self._index = array('Q')  # 扁平的(包号, 偏移, 时间)三元组
+        self.count = 0  # 已写入的记录数
+        self._max_ns = 0  # 已写入记录的最大首字节时间（发送记录可能早于之前写入的接收记录结束）
+
+    def write_packet(self, packet, direction=DIR_RX):
+        """写入一个数据包（Packet）"""
+        self.write_packets((packet,), direction)
+
+    def write_packets(self, packets, direction=DIR_RX):
+        """写入一批同方向的数据包，记录头和数据拼接后一次写出"""
+        parts = []
+        offset = self._offset
+        count = self.count
+        interval = self.index_interval
+        index = self._index
+        max_ns = self._max_ns
+        for packet in packets:
+            data = packet.data
+            if packet.first_ns > max_ns:
+                max_ns = packet.first_ns
+            if count % interval == 0:
+                index.extend((count, offset, max_ns))
+            header = bytearray(RECORD.pack(len(data), packet.first_ns, packet.last_ns))
+            header[DIRECTION] = direction
+            parts.append(header)
+            parts.append(data)
+            offset += RECORD.size + len(data)
+            count += 1
+        self._file.write(b''.join(parts))
+        self._offset = offset
+        self.count = count
+        self._max_ns = max_ns
+
+    def flush(self):
+        self._file.flush()
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def close(self):
+        """写入索引和文件尾并关闭文件"""
+        if self._file.closed:
+            return
+        self._file.write(self._index.tobytes())
+        self._file.write(TRAILER.pack(self._offset, len(self._index) // 3, self.count, INDEX_MAGIC))
+        self._file.close()
+
+
+class CaptureReader:
+    """用mmap读取抓包文件，不加载整个文件
+
+    seek_packet(n)和seek_time(t)先在稀疏索引上二分，再从索引项向后最多走
+    index_interval个记录，复杂度O(log n + index_interval)。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"抓包文件为空: {path}")
+        magic, version, header_size, self.wall_anchor_ns, self.mono_anchor_ns = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"不是抓包文件: {path}")
+        if version > VERSION:
+            self.close()
+            raise ValueError(f"不支持的抓包文件版本: {version}")
+        self._data_start = header_size
+        self.recovered = False  # 是否通过扫描重建了索引（文件未正常关闭）
+        if not self._load_index():
+            self._rebuild_index()
+            self.recovered = True
+
+    def _load_index(self):
+        """读取文件尾的索引，文件尾无效时返回False"""
+        size = len(self._map)
+        if size < self._data_start + TRAILER.size:
+            return False
+        index_offset, entries, count, magic = TRAILER.unpack_from(self._map, size - TRAILER.size)
+        if magic != INDEX_MAGIC or index_offset + entries * INDEX_ENTRY.size != size - TRAILER.size:
+            return False
+        index = array('Q')
+        index.frombytes(self._map[index_offset:index_offset + entries * INDEX_ENTRY.size])
+        self._set_index(index, count, index_offset)
+        return True
+
+    def _rebuild_index(self):
+        """顺序扫描记录重建索引（恢复未正常关闭的文件）"""
+        mm = self._map
+        size = len(mm)
+        offset = self._data_start
+        count = 0
+        max_ns = 0
+        index = array('Q')
+        while offset + RECORD.size <= size:
+            length, first_ns, _ = RECORD.unpack_from(mm, offset)
+            end = offset + RECORD.size + length
+            if end > size:
+                break  # 最后一条记录不完整
+            if first_ns > max_ns:
+                max_ns = first_ns
+            if count % INDEX_INTERVAL == 0:
+                index.extend((count, offset, max_ns))
+            offset = end
+            count += 1
+        self._set_index(index, count, offset)
+
+    def _set_index(self, index, count, data_end):
+        self._index_packets = index[0::3].tolist()
+        self._index_offsets = index[1::3].tolist()
+        # 较早的文件中索引项是该记录自身的时间，取累计最大值保证二分的前提（单调）
+        self._index_times = list(accumulate(index[2::3].tolist(), max))
+        self.count = count  # 记录总数
+        self._data_end = data_end  # 记录区结束偏移
+
+    def __len__(self):
+        return self.count
+
+    def wall_ns(self, mono_ns):
+        """记录中的单调时间戳换算为Unix纪元纳秒（使用文件头中的锚点）"""
+        return self.wall_anchor_ns + (mono_ns - self.mono_anchor_ns)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def _record_at(self, offset):
+        """读取offset处的记录，返回(方向, Packet, 下一记录偏移)，只复制该记录的数据"""
+        length, first_ns, last_ns = RECORD.unpack_from(self._map, offset)
+        direction = self._map[offset + DIRECTION]
+        start = offset + RECORD.size
+        # 复制为bytes，关闭文件后数据包仍然可用
+        data = self._map[start:start + length]
+        return direction, Packet(data, first_ns, last_ns), start + length
+
+    def _skip(self, offset, n):
+        """从offset处的记录向后跳过n个记录"""
+        for _ in range(n):
+            length = RECORD.unpack_from(self._map, offset)[0]
+            offset += RECORD.size + length
+        return offset
+
+    def offset_of(self, n):
+        """第n个记录的文件偏移"""
+        if not 0 <= n < self.count:
+            raise IndexError('记录号超出范围')
+        i = bisect_right(self._index_packets, n) - 1
+        return self._skip(self._index_offsets[i], n - self._index_packets[i])
+
+    def seek_packet(self, n):
+        """定位到第n个记录，返回从该记录开始的迭代器"""
+        return self._iter_from(n, self.offset_of(n))
+
+    def seek_time(self, t_ns):
+        """定位到（按文件顺序）首字节时间不早于t_ns的第一个记录，返回(记录号, 迭代器)
+
+        记录不保证按首字节时间写入：接收数据包在分包超时后才写入，之前已写入的发送记录的时间可能更晚。
+        索引项的时间是截至该项的最大首字节时间，二分找到的索引项之前的记录都早于t_ns，
+        从该项向后顺序查找，结果与从头扫描相同；返回的记录之后仍可能有更早的记录。
+        """
+        i = bisect_left(self._index_times, t_ns) - 1
+        if i < 0:
+            n, offset = 0, self._data_start
+        else:
+            n, offset = self._index_packets[i], self._index_offsets[i]
+        while n < self.count:
+            length, first_ns, _ = RECORD.unpack_from(self._map, offset)
+            if first_ns >= t_ns:
+                break
+            offset += RECORD.size + length
+            n += 1
+        return n, self._iter_from(n, offset)
+
+    def _iter_from(self, n, offset):
+        while n < self.count:
+            direction, packet, offset = self._record_at(offset)
+            yield direction, packet
+            n += 1
+
+    def __iter__(self):
+        """按顺序遍历所有记录，产生(方向, Packet)"""
+        return self._iter_from(0, self._data_start)
+
+    def __getitem__(self, n):
+        """第n个记录的(方向, Packet)"""
+        if n < 0:
+            n += self.count
+        direction, packet, _ = self._record_at(self.offset_of(n))
+        return direction, packet
@@ -0,0 +1,140 @@
+# 数据格式化：批量生成以空格分隔的十六进制、带偏移的十六进制转储和可打印ASCII视图
+# 批量接口直接作用于连续的数据区和偏移列，整块调用一次bytes.hex()/translate()后按偏移切片，
+# 避免逐字节拼接字符串
+import codecs
+
+# 不可打印字节显示为'.'
+_PRINTABLE_TABLE = bytes(b if 0x20 <= b < 0x7f else 0x2e for b in range(256))
+# 文本显示时行内换行符显示为'↵'
+_NEWLINE_TABLE = str.maketrans({'\r': '↵', '\n': '↵'})
+
+HEX_MODE = 'hex'
+TEXT_MODE = 'text'
+ASCII_MODE = 'ascii'
+
+
+def hex_spaced(data):
+    """格式化为以空格分隔的十六进制，如'aa 01 02'"""
+    return data.hex(' ')
+
+
+def printable_ascii(data):
+    """格式化为可打印ASCII，不可打印字节显示为'.'"""
+    return bytes(data).translate(_PRINTABLE_TABLE).decode('ascii')
+
+
+def display_text(data):
+    """格式化为单行文本：UTF-8解码，去掉末尾换行，行内换行显示为'↵'"""
+    text = bytes(data).decode('utf-8', errors='replace').rstrip('\r\n')
+    return text.replace('\r\n', '\n').translate(_NEWLINE_TABLE)
+
+
+def hexdump(data, base_offset=0, width=16):
+    """带偏移的十六进制转储，每行'偏移  十六进制  |ASCII|'，返回行列表"""
+    data = bytes(data)
+    hex_all = data.hex(' ') + ' '
+    ascii_all = data.translate(_PRINTABLE_TABLE).decode('ascii')
+    step = width * 3
+    full = len(data) - len(data) % width
+    lines = ['%08x  %s |%s|' % (base_offset + start, hex_all[start * 3:start * 3 + step], ascii_all[start:start + width])
+             for start in range(0, full, width)]
+    if full < len(data):
+        # 最后不足一行时补齐十六进制列
+        hex_part = hex_all[full * 3:].ljust(step)
+        lines.append('%08x  %s |%s|' % (base_offset + full, hex_part, ascii_all[full:]))
+    return lines
+
+
+def hex_rows(payload, offsets):
+    """批量格式化：payload为连续数据，offsets为n+1个相对偏移，返回n行十六进制"""
+    hex_all = payload.hex(' ')
+    return [hex_all[s * 3:e * 3 - 1] for s, e in zip(offsets, offsets[1:])]
+
+
+def ascii_rows(payload, offsets):
+    """批量格式化为可打印ASCII行"""
+    ascii_all = bytes(payload).translate(_PRINTABLE_TABLE).decode('ascii')
+    return [ascii_all[s:e] for s, e in zip(offsets, offsets[1:])]
+
+
+def text_rows(payload, offsets):
+    """批量格式化为文本行
+
+    纯ASCII数据整体解码一次后切片；否则UTF-8需按数据包边界分别解码。
+    """
+    if not payload.isascii():
+        view = memoryview(payload)
+        return [display_text(view[s:e]) for s, e in zip(offsets, offsets[1:])]
+    text_all = payload.decode('ascii')
+    rows = [text_all[s:e].rstrip('\r\n') for s, e in zip(offsets, offsets[1:])]
+    # 只有少数行内含换行符，单独替换
+    return [row.replace('\r\n', '\n').translate(_NEWLINE_TABLE) if '\n' in row or '\r' in row else row
+            for row in rows]
+
+
+_ROW_FORMATTERS = {
+    HEX_MODE: hex_rows,
+    TEXT_MODE: text_rows,
+    ASCII_MODE: ascii_rows,
+}
+
+
+def format_rows(payload, offsets, data_mode):
+    """按数据模式（'hex'/'text'/'ascii'）批量格式化连续数据中的各数据包"""
+    return _ROW_FORMATTERS[data_mode](payload, offsets)
+
+
+def format_block(block, data_mode, clock=None):
+    """格式化PacketStore.read_block()返回的数据块，clock不为None时添加时间戳前缀"""
+    rows = format_rows(block.payload, block.offsets, data_mode)
+    if clock is None:
+        return rows
+    return [f"{clock.format(ns)} {row}" for ns, row in zip(block.first_ns, rows)]
+
+
+def format_packets(packets, data_mode, clock=None):
+    """格式化Packet列表（先拼接为连续数据再批量格式化）"""
+    datas = [p.data for p in packets]
+    offsets = [0]
+    for data in datas:
+        offsets.append(offsets[-1] + len(data))
+    rows = format_rows(b''.join(datas), offsets, data_mode)
+    if clock is None:
+        return rows
+    return [f"{clock.format(p.first_ns)} {row}" for p, row in zip(packets, rows)]
+
+
+def iter_hex_lines(store, block_packets=4096):
+    """按换行标记把存储中的数据包拼成十六进制行，分块读取，不生成整个存储的字符串"""
+    line = []
+    for block in store.iter_blocks(block_packets):
+        rows = hex_rows(block.payload, block.offsets)
+        for i, row in enumerate(rows):
+            if line and block.breaks[i]:
+                yield ' '.join(line)
+                line = []
+            if row:
+                line.append(row)
+    if line:
+        yield ' '.join(line)
+
+
+def iter_hexdump_lines(store, block_bytes=64 * 1024, width=16):
+    """整个存储数据的十六进制转储（偏移连续），分块生成"""
+    offset = 0
+    with store.payload() as payload:
+        total = len(payload)
+        while offset < total:
+            end = min(offset + block_bytes, total)
+            yield from hexdump(payload[offset:end], offset, width)
+            offset = end
+
+
+def iter_text(store, block_bytes=64 * 1024):
+    """整个存储数据解码后的文本，分块增量解码（跨块的多字节字符不会被拆坏）"""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    with store.payload() as payload:
+        total = len(payload)
+        for start in range(0, total, block_bytes):
+            yield decoder.decode(payload[start:start + block_bytes])
+    yield decoder.decode(b'', final=True)
@@ -2,18 +2,188 @@ import os
 import time
 import csv
 import json
+import queue
+import threading
 from datetime import datetime
+import data_format
+from diag_log import get_logger
+from capture_file import CaptureWriter, DIR_RX
+
+log = get_logger('logger')
+
+
+class SessionRecorder:
+    """会话记录器：一个会话一个只追加文件，由后台写线程批量写入
+
+    write()只把一批数据包放入队列，不做格式化和文件IO，不会阻塞读取线程或GUI。
+    写线程一次取出队列中的所有批次，格式化后用大缓冲区写入，并定期fsync。
+    队列积压超过max_queue_bytes时丢弃新批次并计数（磁盘跟不上时不占满内存）。
+
+    记录类型：
+      capture - 带包边界、时间戳和收发方向的索引抓包文件（session.scap，见capture_file）
+      raw     - 原始二进制数据（rx.bin）
+      hex     - 每包一行'[时间戳] 十六进制'（rx_hex.txt）
+      text    - 每包一行'[时间戳] 文本'（rx_text.txt）
+    只有capture类型记录发送的数据，其他类型忽略发送方向的批次。
+    """
+
+    FILE_NAMES = {'capture': 'session.scap', 'raw': 'rx.bin', 'hex': 'rx_hex.txt', 'text': 'rx_text.txt'}
+
+    def __init__(self, session_dir, data_type='raw', clock=None, buffer_size=1024 * 1024,
+                 fsync_interval=1.0, max_queue_bytes=64 * 1024 * 1024, tracer=None):
+        if data_type not in self.FILE_NAMES:
+            raise ValueError(f"不支持的记录类型: {data_type}")
+        self.data_type = data_type
+        self.clock = clock  # 会话时钟，用于hex/text记录的时间戳
+        self.path = os.path.join(session_dir, self.FILE_NAMES[data_type])
+        self.buffer_size = buffer_size  # 文件写缓冲区大小
+        self.fsync_interval = fsync_interval  # fsync间隔（秒）
+        self.max_queue_bytes = max_queue_bytes  # 队列积压上限（字节）
+        self.tracer = tracer  # 延迟追踪（latency.LatencyTracer），记录写入和落盘阶段
+        self._queue = queue.Queue()
+        self._queued_bytes = 0
+        self._lock = threading.Lock()  # 保护_queued_bytes
+        self._file = None
+        self._thread = None
+        self.error = None  # 写线程遇到的错误
+        # 统计计数
+        self.packets_written = 0
+        self.bytes_written = 0
+        self.dropped_packets = 0
+        self.dropped_bytes = 0
+
+    def start(self):
+        """打开记录文件并启动写线程"""
+        if self.data_type == 'capture':
+            self._file = CaptureWriter(self.path, self.clock, self.buffer_size)
+        else:
+            self._file = open(self.path, 'ab', buffering=self.buffer_size)
+        self._thread = threading.Thread(target=self._run, name='SessionRecorder', daemon=True)
+        self._thread.start()
+
+    def write(self, packets, direction=DIR_RX):
+        """把一批数据包放入写队列，返回是否接受（积压超限或已停止时丢弃）"""
+        if direction != DIR_RX and self.data_type != 'capture':
+            return False
+        size = sum(len(p.data) for p in packets)
+        with self._lock:
+            if self._thread is None or self.error is not None or \
+                    self._queued_bytes + size > self.max_queue_bytes:
+                self.dropped_packets += len(packets)
+                self.dropped_bytes += size
+                return False
+            self._queued_bytes += size
+        self._queue.put((packets, size, direction))
+        return True
+
+    def stop(self):
+        """写完队列中的数据后关闭文件"""
+        # 在锁内置空，其他线程（接收端）之后的write()计为丢弃，不会排在结束标记之后
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join()
+
+    def stats(self):
+        """返回记录统计信息"""
+        return {
+            'path': self.path,
+            'packets_written': self.packets_written,
+            'bytes_written': self.bytes_written,
+            'queued_bytes': self._queued_bytes,
+            'dropped_packets': self.dropped_packets,
+            'dropped_bytes': self.dropped_bytes,
+            'error': self.error,
+        }
+
+    def _run(self):
+        """写线程：取出队列中的全部批次后一次写入，定期fsync"""
+        last_sync = time.monotonic()
+        stopping = False
+        unsynced = []  # 已写入、尚未fsync的抽样数据包首字节时间
+        try:
+            while not stopping:
+                try:
+                    batches = [self._queue.get(timeout=self.fsync_interval)]
+                except queue.Empty:
+                    batches = []
+                while True:
+                    try:
+                        batches.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if None in batches:
+                    stopping = True
+                    batches = [batch for batch in batches if batch is not None]
+                if batches:
+                    size = self._write_batches(batches)
+                    with self._lock:
+                        self._queued_bytes -= size
+                    tracer = self.tracer
+                    if tracer is not None:
+                        sampled = [t for packets, _, direction in batches if direction == DIR_RX
+                                   for t in tracer.select(packets)]
+                        tracer.record('record_write', sampled)
+                        unsynced += sampled
+                now = time.monotonic()
+                if stopping or now - last_sync >= self.fsync_interval:
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                    last_sync = now
+                    if self.tracer is not None:
+                        self.tracer.record('record_durable', unsynced)
+                    unsynced = []
+        except Exception as e:
+            self.error = str(e)
+            log.exception("会话记录写入失败")
+        finally:
+            self._file.close()
+
+    def _write_batches(self, batches):
+        """写入取出的全部批次，返回数据字节数"""
+        size = sum(batch[1] for batch in batches)
+        if self.data_type == 'capture':
+            # 抓包文件按批次写入，保留每批的收发方向
+            for packets, _, direction in batches:
+                self._file.write_packets(packets, direction)
+                self.packets_written += len(packets)
+        else:
+            packets = [p for batch in batches for p in batch[0]]
+            self._file.write(self._encode(packets))
+            self.packets_written += len(packets)
+        self.bytes_written += size
+        return size
+
+    def _encode(self, packets):
+        """把一批数据包编码为要写入文件的字节"""
+        if self.data_type == 'raw':
+            return b''.join(p.data for p in packets)
+        data_mode = data_format.HEX_MODE if self.data_type == 'hex' else data_format.TEXT_MODE
+        rows = data_format.format_packets(packets, data_mode, self.clock)
+        rows.append('')
+        return '\n'.join(rows).encode('utf-8')
+
 
 class DataLogger:
     def __init__(self, log_dir='logs'):
         self.log_dir = log_dir
+        self.recorder = None  # 当前会话的记录器
+        self._dirs = set()  # 已创建的目录，避免每次写入都检查
         # 确保日志目录存在
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
+        self._ensure_dir(log_dir)
     
-    def log_data(self, data, data_type='raw'):
-        """记录数据到文件"""
-        timestamp = datetime.now()
+    def _ensure_dir(self, path):
+        """确保目录存在（每个目录只检查一次）"""
+        if path not in self._dirs:
+            os.makedirs(path, exist_ok=True)
+            self._dirs.add(path)
+    
+    def log_data(self, data, data_type='raw', timestamp=None):
+        """记录数据到文件，timestamp为数据的捕获时间（datetime），默认为当前时间"""
+        if timestamp is None:
+            timestamp = datetime.now()
         date_str = timestamp.strftime('%Y-%m-%d')
         time_str = timestamp.strftime('%H-%M-%S')
         # 添加毫秒级时间戳
@@ -21,15 +191,14 @@ class DataLogger:
         
         # 创建日期目录
         date_dir = os.path.join(self.log_dir, date_str)
-        if not os.path.exists(date_dir):
-            os.makedirs(date_dir)
+        self._ensure_dir(date_dir)
         
-        # 根据数据类型选择不同的记录方式
+        # 根据数据类型选择不同的记录方式（同一秒内的多次写入追加到同一文件，不会互相覆盖）
         if data_type == 'raw':
             # 二进制数据直接保存
             filename = f"{time_str}_raw.bin"
             file_path = os.path.join(date_dir, filename)
-            with open(file_path, 'wb') as f:
+            with open(file_path, 'ab') as f:
                 f.write(data)
         elif data_type == 'text':
             # 文本数据保存为txt，添加时间戳
@@ -44,7 +213,7 @@ class DataLogger:
             else:
                 text_data = str(data)
             
-            with open(file_path, 'w', encoding='utf-8') as f:
+            with open(file_path, 'a', encoding='utf-8') as f:
                 f.write(f"[{full_timestamp}] {text_data}\n")
         elif data_type == 'hex':
             # 十六进制数据保存为txt，添加时间戳
@@ -59,39 +228,77 @@ class DataLogger:
             else:
                 hex_data = str(data)
             
-            with open(file_path, 'w') as f:
+            with open(file_path, 'a') as f:
                 f.write(f"[{full_timestamp}] {hex_data}\n")
         
         return file_path
     
-    def start_session_log(self, port_info):
-        """开始一个新的会话日志"""
+    def log_packet(self, packet, clock, data_type='hex'):
+        """记录一个接收数据包，使用读取线程记录的首字节到达时间"""
+        return self.log_data(packet.data, data_type, clock.to_datetime(packet.first_ns))
+    
+    def start_session_log(self, port_info, clock=None, record=None, **recorder_options):
+        """开始一个新的会话日志，clock为串口的会话时钟（记录其时间锚点）
+
+        record为记录类型（'capture'/'raw'/'hex'/'text'）时同时启动会话记录器，
+        之后通过record_packets()写入接收到的数据包。
+        """
+        self.stop_session_log()
         timestamp = datetime.now()
         date_str = timestamp.strftime('%Y-%m-%d')
         time_str = timestamp.strftime('%H-%M-%S')
         
         # 创建日期目录
         date_dir = os.path.join(self.log_dir, date_str)
-        if not os.path.exists(date_dir):
-            os.makedirs(date_dir)
+        self._ensure_dir(date_dir)
         
-        # 创建会话目录
+        # 创建会话目录，同一秒内开始的会话加序号区分
         session_dir = os.path.join(date_dir, f"session_{time_str}")
-        os.makedirs(session_dir)
+        suffix = 1
+        while True:
+            try:
+                os.makedirs(session_dir)
+                break
+            except FileExistsError:
+                suffix += 1
+                session_dir = os.path.join(date_dir, f"session_{time_str}_{suffix}")
         
         # 记录会话信息
         session_info = {
             'start_time': timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],  # 添加毫秒
             'port_info': port_info
         }
+        if clock is not None:
+            # 记录时间锚点，之后数据包的单调时钟时间戳可换算为墙上时间
+            session_info.update(clock.anchor_info())
+        if record is not None:
+            session_info['record'] = record
         
         with open(os.path.join(session_dir, 'session_info.json'), 'w') as f:
             json.dump(session_info, f, indent=4)
         
+        if record is not None:
+            self.recorder = SessionRecorder(session_dir, record, clock, **recorder_options)
+            self.recorder.start()
+        
         return session_dir
     
-    def log_to_csv(self, session_dir, data_dict):
-        """记录数据到CSV文件"""
+    def record_packets(self, packets, direction=DIR_RX):
+        """把一批数据包交给当前会话记录器（未在记录时忽略），不阻塞调用者"""
+        if self.recorder is not None:
+            self.recorder.write(packets, direction)
+    
+    def stop_session_log(self):
+        """停止会话记录器，写完积压数据后关闭文件，返回其统计信息"""
+        recorder = self.recorder
+        if recorder is None:
+            return None
+        self.recorder = None
+        recorder.stop()
+        return recorder.stats()
+    
+    def log_to_csv(self, session_dir, data_dict, timestamp=None):
+        """记录数据到CSV文件，timestamp为数据的捕获时间（datetime），默认为当前时间"""
         csv_path = os.path.join(session_dir, 'data_log.csv')
         
         # 检查文件是否存在，不存在则创建并写入表头
@@ -105,7 +312,9 @@ class DataLogger:
                 writer.writeheader()
             
             # 添加时间戳
-            data_dict['timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+            if timestamp is None:
+                timestamp = datetime.now()
+            data_dict['timestamp'] = timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
             writer.writerow(data_dict)
         
         return csv_path
\ No newline at end of file
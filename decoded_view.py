@@ -0,0 +1,60 @@
+# 协议解码表：每个字段一行，显示最新值、原始值、最小/最大值和解码帧数
+# 由接收界面按显示节奏（与接收视图刷新同步）送入批量解码结果，每批只更新一次表格
+from PyQt5.QtWidgets import QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView
+
+COLUMNS = ['字段', '最新值', '原始值', '最小', '最大']
+
+
+class DecodedTable(QTableWidget):
+    """协议解码结果表"""
+
+    def __init__(self, parent=None):
+        super().__init__(0, len(COLUMNS), parent)
+        self.setHorizontalHeaderLabels(COLUMNS)
+        self.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.verticalHeader().setVisible(False)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.protocol = None
+        self.frames = 0  # 已解码的帧数
+        self._minimum = []  # 各字段原始值的最小/最大值
+        self._maximum = []
+
+    def set_protocol(self, protocol):
+        """切换协议，按字段重建表格"""
+        self.protocol = protocol
+        self.setRowCount(len(protocol.fields) if protocol else 0)
+        if protocol:
+            for row, f in enumerate(protocol.fields):
+                self.setItem(row, 0, QTableWidgetItem(f.name))
+        self.clear_values()
+
+    def clear_values(self):
+        """清空统计（字段名保留）"""
+        self.frames = 0
+        count = len(self.protocol.fields) if self.protocol else 0
+        self._minimum = [None] * count
+        self._maximum = [None] * count
+        for row in range(count):
+            for column in range(1, len(COLUMNS)):
+                self.setItem(row, column, QTableWidgetItem(''))
+
+    def update_batch(self, batch):
+        """合并一批解码结果（protocol.DecodedBatch）并刷新表格"""
+        if not batch.rows or self.protocol is None:
+            return
+        self.frames += len(batch.rows)
+        protocol = self.protocol
+        latest = batch.rows[-1]
+        for index, column in enumerate(zip(*batch.rows)):
+            low, high = min(column), max(column)
+            if self._minimum[index] is None or low < self._minimum[index]:
+                self._minimum[index] = low
+            if self._maximum[index] is None or high > self._maximum[index]:
+                self._maximum[index] = high
+            raw = latest[index]
+            self.item(index, 1).setText(protocol.format_value(index, protocol.value(index, raw)))
+            self.item(index, 2).setText(str(raw))
+            self.item(index, 3).setText(
+                protocol.format_value(index, protocol.value(index, self._minimum[index])))
+            self.item(index, 4).setText(
+                protocol.format_value(index, protocol.value(index, self._maximum[index])))
@@ -0,0 +1,104 @@
+# 诊断日志：分级输出，记录经队列交给后台线程格式化和写出
+#
+# 各模块通过get_logger()取得'uart.<模块>'下的logger。setup_logging()在'uart'上安装一个QueueHandler，
+# 调用线程（读取线程、GUI线程）只创建LogRecord并放入队列，格式化和控制台/文件I/O都在
+# QueueListener的后台线程中进行，控制台阻塞不会拖慢读取。
+# 逐包日志使用'uart.rx'/'uart.tx'的DEBUG级别，默认关闭；调用处先用isEnabledFor()判断，
+# 关闭时不创建记录，也不生成十六进制预览。
+import os
+import sys
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+ROOT = 'uart'
+FORMAT = '%(asctime)s.%(msecs)03d %(levelname)s [%(threadName)s] %(name)s: %(message)s'
+DATE_FORMAT = '%H:%M:%S'
+LEVEL_ENV = 'UART_LOG_LEVEL'  # 环境变量：默认日志级别（如DEBUG、INFO、WARNING）
+
+_listener = None
+_handler = None
+
+
+def get_logger(name):
+    """取得模块的logger（'uart.<name>'）"""
+    return logging.getLogger(f'{ROOT}.{name}')
+
+
+class HexPreview:
+    """数据的十六进制预览，在输出线程格式化时才生成（data必须是不可变的bytes）"""
+
+    __slots__ = ('data', 'limit')
+
+    def __init__(self, data, limit=20):
+        self.data = data
+        self.limit = limit
+
+    def __str__(self):
+        if len(self.data) <= self.limit:
+            return self.data.hex()
+        return self.data[:self.limit].hex() + '...'
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """不在调用线程格式化的QueueHandler
+
+    标准QueueHandler.prepare()在放入队列前格式化消息（为了跨进程传递）；这里只在进程内传递，
+    记录原样入队，消息和异常堆栈由后台线程格式化。因此日志参数必须是不会再被修改的对象。
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def setup_logging(level=None, path=None, stream=None):
+    """安装队列日志并启动后台输出线程，重复调用时替换之前的设置
+
+    level: 日志级别，None时取环境变量UART_LOG_LEVEL，未设置时为INFO
+    path: 同时追加写入的日志文件
+    stream: 控制台输出流，默认sys.stderr
+    """
+    global _listener, _handler
+    shutdown_logging()
+    if level is None:
+        level = os.environ.get(LEVEL_ENV, 'INFO').upper()
+    formatter = logging.Formatter(FORMAT, DATE_FORMAT)
+    handlers = [logging.StreamHandler(stream or sys.stderr)]
+    if path:
+        handlers.append(logging.FileHandler(path, encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    records = queue.SimpleQueue()
+    _handler = _DeferredQueueHandler(records)
+    root = logging.getLogger(ROOT)
+    root.addHandler(_handler)
+    root.setLevel(level)
+    root.propagate = False
+    _listener = QueueListener(records, *handlers)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """输出队列中剩余的记录并停止后台线程（进程退出时自动调用）"""
+    global _listener, _handler
+    if _handler is not None:
+        logging.getLogger(ROOT).removeHandler(_handler)
+        _handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def set_packet_logging(enabled):
+    """开关逐包日志（'uart.rx'/'uart.tx'的DEBUG级别），不影响其他日志的级别"""
+    level = logging.DEBUG if enabled else logging.NOTSET
+    for name in ('rx', 'tx'):
+        get_logger(name).setLevel(level)
+
+
+atexit.register(shutdown_logging)
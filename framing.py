@@ -0,0 +1,307 @@
+# 增量分帧：按协议结构（分隔符、帧头+长度字段、SLIP、COBS）把接收的字节流切分为数据帧
+#
+# 默认的超时分包（SerialCore中按数据间隔超过packet_timeout分包）受系统调度抖动影响，
+# 设备连续发送的帧可能被合并或拆开。设置分帧器后，读取线程把每次读到的数据交给分帧器，
+# 分帧器只扫描新到的字节（记录上次扫描位置），完整的帧作为数据包输出。
+#
+# 规格字符串（GUI和命令行使用，见create_framer）：
+#   gap                     超时分包（不使用分帧器）
+#   delimiter:0d0a          以分隔符结束的帧（分隔符保留在帧中）
+#   fixed:aa,4              帧头aa，固定帧长4字节
+#   length:aa,1,1,2         帧头aa，长度字段在偏移1、1字节，帧长 = 2 + 长度值 + 2（如CRC）
+#   slip / cobs             SLIP / COBS编码的帧（输出解码后的数据）
+# 分帧器默认一直等待未完成的帧补全；timeout_discard（GUI“超时丢弃半帧”、命令行--frame-timeout-discard）
+# 打开时，半帧在分包超时内没有新数据就丢弃，设备中途复位后不会与下一帧拼在一起。
+from packet_buffer import Packet
+
+SLIP_END = 0xC0
+SLIP_ESC = 0xDB
+
+
+class Framer:
+    """分帧器基类
+
+    子类实现_extract(buf)：从buf中的_scan位置开始查找完整的帧，返回(帧列表, 已消费字节数)，
+    未完成的部分留在缓冲区，下次只从新数据（以及可能跨越边界的少量字节）开始扫描。
+
+    帧的首字节时间取帧中第一个字节所在的那次读取，末字节时间取完成该帧的那次读取。
+    timeout_discard为True时，未完成的帧在packet_timeout内没有新数据则丢弃并计为错误。
+    """
+
+    name = ''
+
+    def __init__(self, max_length=65536, timeout_discard=False):
+        self.max_length = max_length  # 单帧最大长度，超出时丢弃并计为错误
+        self.timeout_discard = timeout_discard
+        self.frames = 0  # 输出的帧数
+        self.errors = 0  # 分帧错误数（长度超限、编码错误、帧头前的多余数据等）
+        self.discarded_bytes = 0  # 因错误丢弃的字节数
+        self._buf = bytearray()
+        self._scan = 0  # 下次扫描的起始位置
+        self._first_ns = 0  # 缓冲区中第一个字节的到达时间
+        self._resync = False  # 正在丢弃数据重新同步（同一段无效数据只计一次错误，可跨越多次读取）
+
+    @property
+    def pending(self):
+        """缓冲区中未完成的字节数"""
+        return len(self._buf)
+
+    def feed(self, data, now_ns):
+        """加入新读到的数据，返回完成的帧（Packet列表）"""
+        buf = self._buf
+        if not buf:
+            self._first_ns = now_ns
+        buf += data
+        frames, consumed = self._extract(buf)
+        packets = []
+        if frames:
+            first_ns = self._first_ns
+            for frame in frames:
+                packets.append(Packet(frame, first_ns, now_ns))
+                # 同一次读取中完成的后续帧都来自本次数据
+                first_ns = now_ns
+            self._first_ns = now_ns
+            self.frames += len(frames)
+        if consumed:
+            del buf[:consumed]
+            self._scan = max(self._scan - consumed, 0)
+        if len(buf) > self.max_length:
+            self._error(len(buf))
+            buf.clear()
+            self._scan = 0
+        return packets
+
+    def discard(self):
+        """丢弃未完成的帧（超时或切换分帧方式时）"""
+        if self._buf:
+            self._error(len(self._buf))
+            self._buf.clear()
+        self._scan = 0
+
+    def reset(self):
+        """清空缓冲区和统计"""
+        self._buf.clear()
+        self._scan = 0
+        self._resync = False
+        self.frames = self.errors = self.discarded_bytes = 0
+
+    def stats(self):
+        return {
+            'framer': self.name,
+            'frames': self.frames,
+            'errors': self.errors,
+            'discarded_bytes': self.discarded_bytes,
+            'pending': len(self._buf),
+        }
+
+    def _error(self, discarded):
+        self.errors += 1
+        self.discarded_bytes += discarded
+
+    def _extract(self, buf):
+        raise NotImplementedError
+
+
+class DelimiterFramer(Framer):
+    """以分隔符（单字节或字节序列）结束的帧，分隔符保留在帧中"""
+
+    name = 'delimiter'
+
+    def __init__(self, delimiter=b'\n', **kwargs):
+        super().__init__(**kwargs)
+        if not delimiter:
+            raise ValueError('分隔符不能为空')
+        self.delimiter = bytes(delimiter)
+
+    def _extract(self, buf):
+        delimiter = self.delimiter
+        size = len(delimiter)
+        frames = []
+        start = 0
+        pos = buf.find(delimiter, self._scan)
+        while pos >= 0:
+            end = pos + size
+            frames.append(bytes(buf[start:end]))
+            start = end
+            pos = buf.find(delimiter, start)
+        # 分隔符可能跨越两次读取，下次从末尾size-1个字节之前开始扫描
+        self._scan = max(len(buf) - size + 1, start)
+        return frames, start
+
+
+class LengthFramer(Framer):
+    """帧头 + 长度字段的帧
+
+    帧长 = length_offset + length_size + 长度值 + length_adjust；
+    length_size为0时没有长度字段，帧长固定为length_adjust（如'aa'开头的4字节命令帧）。
+    设置sync（帧头字节）时先查找帧头，帧头之前的数据丢弃并计为一次错误。
+    """
+
+    name = 'length'
+
+    def __init__(self, sync=b'', length_offset=0, length_size=1, byteorder='little',
+                 length_adjust=0, **kwargs):
+        super().__init__(**kwargs)
+        if length_size not in (0, 1, 2, 4):
+            raise ValueError('长度字段只能是0、1、2或4字节')
+        if length_size == 0 and length_adjust <= 0:
+            raise ValueError('固定帧长必须大于0')
+        self.sync = bytes(sync)
+        self.length_offset = length_offset if length_size else 0
+        self.length_size = length_size
+        self.byteorder = byteorder
+        self.length_adjust = length_adjust
+        self.header_size = self.length_offset + length_size
+
+    def _extract(self, buf):
+        frames = []
+        start = 0
+        size = len(buf)
+        sync = self.sync
+        while True:
+            if sync and buf[start:start + len(sync)] != sync:
+                pos = buf.find(sync, max(start, self._scan))
+                # 没有找到帧头时保留可能是帧头前缀的末尾字节，其余丢弃
+                skip_to = pos if pos >= 0 else max(size - len(sync) + 1, start)
+                if skip_to > start:
+                    self.discarded_bytes += skip_to - start
+                    if not self._resync:
+                        self.errors += 1
+                        self._resync = True
+                if pos < 0:
+                    self._scan = 0
+                    return frames, skip_to
+                start = pos
+            if size - start < self.header_size:
+                break
+            if self.length_size:
+                offset = start + self.length_offset
+                value = int.from_bytes(buf[offset:offset + self.length_size], self.byteorder)
+                total = self.header_size + value + self.length_adjust
+            else:
+                total = self.length_adjust
+            if total <= 0 or total > self.max_length:
+                # 长度无效：跳过一个字节重新同步
+                if self._resync:
+                    self.discarded_bytes += 1
+                else:
+                    self._error(1)
+                    self._resync = True
+                start += 1
+                self._scan = start
+                continue
+            if size - start < total:
+                break
+            frames.append(bytes(buf[start:start + total]))
+            start += total
+            self._scan = start
+            self._resync = False
+        self._scan = start
+        return frames, start
+
+
+class SlipFramer(Framer):
+    """SLIP（RFC 1055）：0xC0结束帧，0xDB转义；输出解码后的数据，空帧忽略"""
+
+    name = 'slip'
+
+    def _extract(self, buf):
+        frames = []
+        start = 0
+        pos = buf.find(SLIP_END, self._scan)
+        while pos >= 0:
+            raw = bytes(buf[start:pos])
+            start = pos + 1
+            if raw:
+                frame = self._decode(raw)
+                if frame is None:
+                    self._error(len(raw))
+                else:
+                    frames.append(frame)
+            pos = buf.find(SLIP_END, start)
+        self._scan = len(buf)
+        return frames, start
+
+    @staticmethod
+    def _decode(raw):
+        """解码一帧，转义序列无效时返回None"""
+        escapes = raw.count(SLIP_ESC)
+        if not escapes:
+            return raw
+        # 先还原0xC0再还原0xDB：编码后每个0xDB都是转义起始，DB DC只可能是转义的0xC0
+        if raw.count(b'\xdb\xdc') + raw.count(b'\xdb\xdd') != escapes:
+            return None
+        return raw.replace(b'\xdb\xdc', b'\xc0').replace(b'\xdb\xdd', b'\xdb')
+
+
+class CobsFramer(Framer):
+    """COBS：0x00结束帧；输出解码后的数据，空帧忽略"""
+
+    name = 'cobs'
+
+    def _extract(self, buf):
+        frames = []
+        start = 0
+        pos = buf.find(0, self._scan)
+        while pos >= 0:
+            raw = bytes(buf[start:pos])
+            start = pos + 1
+            if raw:
+                frame = self._decode(raw)
+                if frame is None:
+                    self._error(len(raw))
+                else:
+                    frames.append(frame)
+            pos = buf.find(0, start)
+        self._scan = len(buf)
+        return frames, start
+
+    @staticmethod
+    def _decode(raw):
+        """解码一帧，编码块越界时返回None"""
+        parts = []
+        i = 0
+        size = len(raw)
+        while i < size:
+            code = raw[i]
+            end = i + code
+            if end > size:
+                return None
+            parts.append(raw[i + 1:end])
+            i = end
+            if code < 0xFF and i < size:
+                parts.append(b'\x00')
+        return b''.join(parts)
+
+
+def create_framer(spec, timeout_discard=False):
+    """按规格字符串创建分帧器，'gap'或空字符串返回None（使用超时分包）
+
+    规格格式见模块说明，格式错误时抛出ValueError。timeout_discard见Framer。
+    """
+    spec = spec.strip()
+    kind, _, args = spec.partition(':')
+    kind = kind.strip().lower()
+    args = [a.strip() for a in args.split(',')] if args.strip() else []
+    options = {'timeout_discard': timeout_discard}
+    if kind in ('', 'gap'):
+        return None
+    if kind == 'delimiter':
+        return DelimiterFramer(bytes.fromhex(args[0]) if args else b'\n', **options)
+    if kind == 'fixed':
+        if len(args) != 2:
+            raise ValueError('fixed格式: fixed:帧头hex,帧长')
+        return LengthFramer(sync=bytes.fromhex(args[0]), length_size=0, length_adjust=int(args[1]), **options)
+    if kind == 'length':
+        if not 3 <= len(args) <= 5:
+            raise ValueError('length格式: length:帧头hex,长度偏移,长度字节数[,附加长度[,big]]')
+        return LengthFramer(sync=bytes.fromhex(args[0]), length_offset=int(args[1]),
+                            length_size=int(args[2]),
+                            length_adjust=int(args[3]) if len(args) > 3 else 0,
+                            byteorder='big' if len(args) > 4 and args[4] == 'big' else 'little',
+                            **options)
+    if kind == 'slip':
+        return SlipFramer(**options)
+    if kind == 'cobs':
+        return CobsFramer(**options)
+    raise ValueError(f'不支持的分帧方式: {kind}')
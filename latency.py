@@ -0,0 +1,161 @@
+# 端到端延迟追踪：抽样的数据包在各处理阶段记录"当前时间 - 首字节到达时间"，汇总为HDR风格直方图
+#
+# 所有时间都是time.monotonic_ns()。数据包本身不携带追踪状态：是否抽样由首字节时间的哈希决定，
+# 同一个数据包在每个阶段得到相同的结果，各阶段只需拿到Packet（或它的first_ns）即可记录。
+# 每个阶段只在一个线程中记录（关闭在读取线程，显示在GUI线程，写盘在记录线程），不需要加锁。
+import json
+import time
+
+# 阶段（按处理顺序）：名称 -> 说明
+STAGES = {
+    'close': '分包完成',  # 读取线程结束数据包（超时分包时包含分包超时）
+    'ingest': '界面取出',  # GUI线程从接收缓冲区取出
+    'display': '界面显示',  # 显示刷新完成，数据包已在视图中
+    'record_write': '写入文件',  # 记录线程写入文件（尚未fsync）
+    'record_durable': '落盘',  # 记录线程fsync完成
+}
+
+SUB_BUCKET_BITS = 7
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS  # 小于该值的延迟精确记录，更大的值相对误差不超过2/SUB_BUCKETS
+
+
+class LatencyHistogram:
+    """HDR风格的延迟直方图（单位微秒）
+
+    小于SUB_BUCKETS的值每个值一个桶；更大的值按2的幂分段，每段等分为SUB_BUCKETS/2个桶，
+    记录是O(1)的整数运算，内存只与最大值的位数有关。
+    """
+
+    def __init__(self):
+        self.counts = []
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    @staticmethod
+    def _index(value):
+        if value < SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - SUB_BUCKET_BITS
+        return shift * (SUB_BUCKETS // 2) + (value >> shift)
+
+    @staticmethod
+    def _upper(index):
+        """桶内的最大值（报告分位数时取上界，不低估延迟）"""
+        if index < SUB_BUCKETS:
+            return index
+        half = SUB_BUCKETS // 2
+        shift = index // half - 1
+        top = index - shift * half
+        # top落在[half, SUB_BUCKETS)中，对应值区间[top << shift, (top + 1) << shift)
+        return ((top + 1) << shift) - 1
+
+    def record(self, value_us):
+        value_us = max(int(value_us), 0)
+        index = self._index(value_us)
+        counts = self.counts
+        if index >= len(counts):
+            counts.extend([0] * (index + 1 - len(counts)))
+        counts[index] += 1
+        self.count += 1
+        self.total += value_us
+        if value_us > self.max:
+            self.max = value_us
+
+    def percentile(self, p):
+        """第p百分位的延迟（微秒），没有记录时返回0"""
+        if not self.count:
+            return 0
+        target = max(1, -(-self.count * p // 100))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(self._upper(index), self.max)
+        return self.max
+
+    def summary(self):
+        """分位数摘要（毫秒）"""
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count / 1000, 3) if self.count else 0.0,
+            'p50_ms': self.percentile(50) / 1000,
+            'p90_ms': self.percentile(90) / 1000,
+            'p99_ms': self.percentile(99) / 1000,
+            'p999_ms': self.percentile(99.9) / 1000,
+            'max_ms': self.max / 1000,
+        }
+
+    def to_dict(self):
+        return {'counts': list(self.counts), 'count': self.count, 'total': self.total, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.counts = list(data['counts'])
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.max = data['max']
+        return histogram
+
+
+class LatencyTracer:
+    """抽样延迟追踪：每sample_every个数据包约抽取一个（按首字节时间哈希），sample_every为1时追踪全部"""
+
+    def __init__(self, sample_every=16):
+        self.sample_every = max(int(sample_every), 1)
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+        self.started = time.time()
+
+    def sampled(self, first_ns):
+        """数据包是否被抽样（同一个数据包在各阶段结果相同）"""
+        return self.sample_every == 1 or ((first_ns * 0x9E3779B1) >> 24) % self.sample_every == 0
+
+    def mark(self, stage, first_ns, now_ns=None):
+        """单个数据包到达stage"""
+        if self.sampled(first_ns):
+            if now_ns is None:
+                now_ns = time.monotonic_ns()
+            self.histograms[stage].record((now_ns - first_ns) // 1000)
+
+    def select(self, packets):
+        """一批数据包中被抽样的首字节时间（延后到某个阶段再记录时使用）"""
+        sampled = self.sampled
+        return [p.first_ns for p in packets if sampled(p.first_ns)]
+
+    def record(self, stage, first_ns_list, now_ns=None):
+        """已抽样的数据包（select()的结果）到达stage"""
+        if not first_ns_list:
+            return
+        if now_ns is None:
+            now_ns = time.monotonic_ns()
+        histogram = self.histograms[stage]
+        for first_ns in first_ns_list:
+            histogram.record((now_ns - first_ns) // 1000)
+
+    def mark_packets(self, stage, packets, now_ns=None):
+        """一批数据包到达stage"""
+        self.record(stage, self.select(packets), now_ns)
+
+    def summary(self):
+        """各阶段的分位数摘要，没有记录的阶段省略"""
+        return {stage: histogram.summary() for stage, histogram in self.histograms.items() if histogram.count}
+
+    def dump(self, path, **info):
+        """把完整直方图写入JSON文件，供不同版本之间对比（见benchmarks/compare_latency.py）"""
+        data = {
+            'started': self.started,
+            'dumped': time.time(),
+            'sample_every': self.sample_every,
+            'info': info,
+            'stages': {stage: histogram.to_dict() for stage, histogram in self.histograms.items()},
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+
+def load_histograms(path):
+    """读取dump()写入的文件，返回{阶段: LatencyHistogram}"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return {stage: LatencyHistogram.from_dict(h) for stage, h in data['stages'].items()}
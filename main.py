@@ -1,8 +1,11 @@
 import sys
 from PyQt5.QtWidgets import QApplication
 from serial_gui import SerialGUI
+import diag_log
 
 if __name__ == "__main__":
+    # 诊断日志输出到控制台，级别由环境变量UART_LOG_LEVEL设置（DEBUG时包括逐包日志）
+    diag_log.setup_logging()
     app = QApplication(sys.argv)
     window = SerialGUI()
     window.show()
@@ -0,0 +1,107 @@
+# 多串口合并视图：按首字节时间合并各串口的数据包，每行前标出来源串口
+from array import array
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QCheckBox, QPushButton
+from PyQt5.QtCore import Qt
+from packet_store import PacketStore
+from receive_view import ReceiveModel, ReceiveView
+from timebase import SessionClock
+
+
+class MergedModel(ReceiveModel):
+    """合并视图模型：数据包存储与普通接收视图相同，另按绝对序号保存每个数据包的来源"""
+
+    def __init__(self, packets, clock, parent=None):
+        super().__init__(packets, clock, parent)
+        self.sources = []  # 来源名称，下标即来源编号
+        self._source_index = {}
+        self._tags = array('H')  # 每个数据包的来源编号
+        self._tag_origin = 0  # _tags[0]对应的数据包绝对序号
+
+    def append(self, items):
+        """追加按时间排序的[(来源, Packet), ...]，由sync()通知视图"""
+        index = self._source_index
+        tags = []
+        for source, _ in items:
+            tag = index.get(source)
+            if tag is None:
+                tag = index[source] = len(self.sources)
+                self.sources.append(source)
+            tags.append(tag)
+        self._tags.extend(tags)
+        self.packets.extend([packet for _, packet in items])
+        # 存储淘汰旧数据包后成批丢弃对应的来源编号
+        evicted = self.packets.evicted
+        if evicted - self._tag_origin > 65536:
+            del self._tags[:evicted - self._tag_origin]
+            self._tag_origin = evicted
+
+    def set_packets(self, packets):
+        if not len(packets):
+            self._tags = array('H')
+            self._tag_origin = packets.evicted
+        super().set_packets(packets)
+
+    def display_text(self, row):
+        tag = self._tags[self._evicted + row - self._tag_origin]
+        return f'[{self.sources[tag]}] ' + super().display_text(row)
+
+
+class MergedView(QWidget):
+    """合并视图页：接收视图 + 显示选项"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.packet_store = PacketStore(max_bytes=64 * 1024 * 1024)
+        self.model = MergedModel(self.packet_store, SessionClock())
+        layout = QVBoxLayout(self)
+        self.view = ReceiveView()
+        self.view.setModel(self.model)
+        layout.addWidget(self.view)
+
+        options = QHBoxLayout()
+        self.hex_display_check = QCheckBox('HEX显示')
+        self.hex_display_check.setChecked(True)
+        options.addWidget(self.hex_display_check)
+        self.show_timestamp_check = QCheckBox('显示时间戳')
+        self.show_timestamp_check.setChecked(True)
+        options.addWidget(self.show_timestamp_check)
+        self.lock_scroll_check = QCheckBox('固定滚动')
+        options.addWidget(self.lock_scroll_check)
+        self.clear_btn = QPushButton('清空')
+        options.addWidget(self.clear_btn)
+        options.addStretch()
+        layout.addLayout(options)
+
+        self.hex_display_check.stateChanged.connect(self.update_display_options)
+        self.show_timestamp_check.stateChanged.connect(self.update_display_options)
+        self.lock_scroll_check.stateChanged.connect(self.toggle_scroll_lock)
+        self.clear_btn.clicked.connect(self.clear)
+
+    def append(self, items):
+        """追加按时间排序的[(来源, Packet), ...]"""
+        self.model.append(items)
+        # 不在当前标签页时只存入数据，切换过来时再通知视图
+        if self.isVisible():
+            self._sync()
+
+    def _sync(self):
+        at_bottom = self.view.is_at_bottom()
+        self.model.sync()
+        if at_bottom and not self.lock_scroll_check.isChecked():
+            self.view.scrollToBottom()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._sync()
+
+    def update_display_options(self):
+        self.model.set_display_options(self.hex_display_check.isChecked(),
+                                       self.show_timestamp_check.isChecked())
+
+    def toggle_scroll_lock(self, state):
+        if state != Qt.Checked:
+            self.view.scrollToBottom()
+
+    def clear(self):
+        self.packet_store.clear()
+        self.model.set_packets(self.packet_store)
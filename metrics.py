@@ -0,0 +1,114 @@
+# 运行统计：吞吐量、队列深度、渲染耗时和丢弃计数
+#
+# 热路径只做整数累加（各模块已有的累计计数，如接收缓冲区的total_bytes，以及Timing的累计耗时），
+# 不加锁、不计算速率；MetricsRegistry由一个采样者（GUI定时器或命令行统计循环）定期调用snapshot()，
+# 用两次采样之间的差值计算速率和平均耗时。快照是扁平的字典，可直接写为JSON Lines。
+import json
+import time
+
+
+class Timing:
+    """耗时统计：只有一个线程调用add()，采样者读取累计值计算区间平均
+
+    max_ns由采样者在每次采样后清零（与add()的竞争最多丢失一次最大值，不影响累计值）。
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, elapsed_ns):
+        self.count += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+
+
+class MetricsRegistry:
+    """统计项登记和采样
+
+    rate: 累计计数的来源函数，快照中给出每秒速率和累计值
+    gauge: 瞬时值的来源函数（队列深度、存储大小等），快照中给出当前值
+    timing: Timing对象，快照中给出区间内的次数、平均和最大耗时（毫秒）
+    """
+
+    def __init__(self, labels=None):
+        self.labels = dict(labels or {})  # 附加到每个快照的标签（如串口名）
+        self._rates = {}
+        self._gauges = {}
+        self._timings = {}
+        self._last = None  # 上次采样的(单调时间, {名称: 累计值})
+
+    def add_rate(self, name, source):
+        self._rates[name] = source
+
+    def add_gauge(self, name, source):
+        self._gauges[name] = source
+
+    def timing(self, name):
+        """取得（不存在时创建）名为name的Timing"""
+        timing = self._timings.get(name)
+        if timing is None:
+            timing = self._timings[name] = Timing()
+        return timing
+
+    def add_timing(self, name, timing):
+        """登记其他模块持有的Timing"""
+        self._timings[name] = timing
+
+    def snapshot(self):
+        """采样一次，返回扁平的统计字典"""
+        now = time.monotonic()
+        totals = {}
+        for name, source in self._rates.items():
+            totals[name] = source()
+        for name, timing in self._timings.items():
+            totals[name] = (timing.count, timing.total_ns)
+        last_time, last_totals = self._last if self._last else (now, totals)
+        elapsed = now - last_time
+        self._last = (now, totals)
+
+        result = {'time': round(time.time(), 3)}
+        result.update(self.labels)
+        for name in self._rates:
+            value = totals[name]
+            previous = last_totals.get(name, value)
+            # 计数被重置（如重新打开串口）时从新的累计值开始
+            delta = value - previous if value >= previous else value
+            result[f'{name}_per_s'] = round(delta / elapsed, 1) if elapsed > 0 else 0.0
+            result[f'{name}_total'] = value
+        for name, source in self._gauges.items():
+            result[name] = source()
+        for name, timing in self._timings.items():
+            count, total_ns = totals[name]
+            last_count, last_total_ns = last_totals.get(name, (count, total_ns))
+            calls = count - last_count
+            result[f'{name}_count'] = calls
+            result[f'{name}_avg_ms'] = round((total_ns - last_total_ns) / calls / 1e6, 3) if calls > 0 else 0.0
+            result[f'{name}_max_ms'] = round(timing.max_ns / 1e6, 3)
+            timing.max_ns = 0
+        return result
+
+
+class JsonLinesExporter:
+    """把统计快照逐行追加写入JSON Lines文件"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write(self, snapshot):
+        self._file.write(json.dumps(snapshot, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def format_rate(value):
+    """字节速率格式化"""
+    for unit in ('B/s', 'KB/s', 'MB/s'):
+        if value < 1024 or unit == 'MB/s':
+            return f"{value:.1f}{unit}"
+        value /= 1024
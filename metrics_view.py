@@ -0,0 +1,135 @@
+# 运行统计窗口：显示最近一次统计快照的全部项目，可把每次快照导出为JSON Lines；
+# 下方为抽样延迟追踪的各阶段分位数
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
+                             QHeaderView, QAbstractItemView, QCheckBox, QLabel, QFileDialog,
+                             QGroupBox, QSpinBox, QPushButton)
+from PyQt5.QtCore import Qt
+from metrics import JsonLinesExporter
+from latency import STAGES
+
+LATENCY_COLUMNS = ['阶段', '次数', 'p50(ms)', 'p90(ms)', 'p99(ms)', 'p99.9(ms)', '最大(ms)']
+LATENCY_KEYS = ['count', 'p50_ms', 'p90_ms', 'p99_ms', 'p999_ms', 'max_ms']
+
+
+class MetricsWindow(QWidget):
+    """运行统计窗口（独立窗口，关闭时只隐藏）
+
+    update_snapshot()每次采样调用一次：窗口可见时刷新表格；启用导出时无论窗口是否可见都写入文件。
+    """
+
+    def __init__(self, title='运行统计', parent=None):
+        super().__init__(parent, Qt.Window)
+        self.setWindowTitle(title)
+        self.resize(560, 720)
+        self.exporter = None
+        layout = QVBoxLayout(self)
+        self.table = QTableWidget(0, 2)
+        self.table.setHorizontalHeaderLabels(['项目', '值'])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.table)
+        options = QHBoxLayout()
+        self.export_check = QCheckBox('导出JSON Lines')
+        options.addWidget(self.export_check)
+        self.export_label = QLabel()
+        options.addWidget(self.export_label)
+        options.addStretch()
+        layout.addLayout(options)
+        self.export_check.stateChanged.connect(self.toggle_export)
+        self._rows = {}  # 项目名 -> 行号
+
+        # 延迟追踪：数据包从首字节到达到各阶段的延迟（控件的信号由串口页面连接）
+        latency_group = QGroupBox('延迟追踪（从首字节到达算起）')
+        latency_layout = QVBoxLayout(latency_group)
+        trace_options = QHBoxLayout()
+        self.trace_check = QCheckBox('启用')
+        trace_options.addWidget(self.trace_check)
+        trace_options.addWidget(QLabel('抽样: 每'))
+        self.sample_spin = QSpinBox()
+        self.sample_spin.setRange(1, 100000)
+        self.sample_spin.setValue(16)
+        trace_options.addWidget(self.sample_spin)
+        trace_options.addWidget(QLabel('包'))
+        self.trace_reset_btn = QPushButton('重置')
+        trace_options.addWidget(self.trace_reset_btn)
+        self.trace_dump_btn = QPushButton('导出直方图')
+        trace_options.addWidget(self.trace_dump_btn)
+        trace_options.addStretch()
+        latency_layout.addLayout(trace_options)
+        self.latency_table = QTableWidget(len(STAGES), len(LATENCY_COLUMNS))
+        self.latency_table.setHorizontalHeaderLabels(LATENCY_COLUMNS)
+        self.latency_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.latency_table.verticalHeader().setVisible(False)
+        self.latency_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        for row, label in enumerate(STAGES.values()):
+            self.latency_table.setItem(row, 0, QTableWidgetItem(label))
+            for column in range(1, len(LATENCY_COLUMNS)):
+                self.latency_table.setItem(row, column, QTableWidgetItem(''))
+        latency_layout.addWidget(self.latency_table)
+        layout.addWidget(latency_group)
+
+    def update_snapshot(self, snapshot):
+        if self.exporter is not None:
+            try:
+                self.exporter.write(snapshot)
+            except OSError as e:
+                self.export_label.setText(f'导出失败: {e}')
+                self.export_check.setChecked(False)
+        if not self.isVisible():
+            return
+        for name, value in snapshot.items():
+            row = self._rows.get(name)
+            if row is None:
+                row = self._rows[name] = self.table.rowCount()
+                self.table.insertRow(row)
+                self.table.setItem(row, 0, QTableWidgetItem(name))
+                self.table.setItem(row, 1, QTableWidgetItem())
+            self.table.item(row, 1).setText(str(value))
+
+    def update_latency(self, summary):
+        """显示各阶段的延迟分位数（latency.LatencyTracer.summary()）"""
+        if not self.isVisible():
+            return
+        for row, stage in enumerate(STAGES):
+            stats = summary.get(stage)
+            for column, key in enumerate(LATENCY_KEYS, 1):
+                self.latency_table.item(row, column).setText(str(stats[key]) if stats else '')
+
+    def toggle_export(self, state):
+        if state == Qt.Checked:
+            if self.exporter is not None:
+                return
+            filename, _ = QFileDialog.getSaveFileName(self, '导出运行统计', 'metrics.jsonl',
+                                                      'JSON Lines (*.jsonl);;所有文件 (*)')
+            if not filename:
+                self.export_check.setChecked(False)
+                return
+            self.start_export(filename)
+        else:
+            self.stop_export()
+
+    def start_export(self, filename):
+        """开始把快照追加写入filename"""
+        self.stop_export()
+        try:
+            self.exporter = JsonLinesExporter(filename)
+        except OSError as e:
+            self.export_label.setText(f'导出失败: {e}')
+            self.export_check.setChecked(False)
+            return
+        self.export_label.setText(filename)
+        self.export_check.blockSignals(True)
+        self.export_check.setChecked(True)
+        self.export_check.blockSignals(False)
+
+    def stop_export(self):
+        if self.exporter is not None:
+            self.exporter.close()
+            self.exporter = None
+            self.export_label.clear()
+
+    def closeEvent(self, event):
+        # 关闭窗口只隐藏，导出继续
+        event.ignore()
+        self.hide()
@@ -0,0 +1,272 @@
+# 数据包缓冲区：读取线程中累积数据包、以及向各消费者分发数据包所用的缓冲结构
+from threading import Condition
+from collections import namedtuple
+
+# 接收到的数据包：数据、首字节到达时间、末字节到达时间（time.monotonic_ns()，纳秒）
+Packet = namedtuple('Packet', ['data', 'first_ns', 'last_ns'])
+
+
+class PacketAccumulator:
+    """预分配、可增长的数据包累积缓冲区
+
+    追加数据时只把新数据复制进预分配的bytearray，容量不足时按倍数扩容；
+    数据包结束时调用take()一次性复制出bytes，避免bytes拼接带来的二次方复制。
+    """
+
+    def __init__(self, initial_size=4096, max_retained_size=1024 * 1024):
+        self.initial_size = initial_size  # 初始容量
+        self.max_retained_size = max_retained_size  # take()后保留的最大容量，超出则收缩
+        self._buf = bytearray(initial_size)
+        self._len = 0  # 已累积的字节数
+
+    def __len__(self):
+        return self._len
+
+    def __bool__(self):
+        return self._len > 0
+
+    @property
+    def capacity(self):
+        """当前缓冲区容量"""
+        return len(self._buf)
+
+    def append(self, data):
+        """追加数据，只复制新数据本身"""
+        size = len(data)
+        end = self._len + size
+        if end > len(self._buf):
+            self._grow(end)
+        self._buf[self._len:end] = data
+        self._len = end
+
+    def _grow(self, min_size):
+        """扩容到至少min_size字节（按倍数增长，摊还O(1)）"""
+        new_size = max(min_size, len(self._buf) * 2)
+        self._buf.extend(bytes(new_size - len(self._buf)))
+
+    def view(self):
+        """返回已累积数据的只读memoryview（零复制）
+
+        注意：持有view期间不能再调用append()/take()，用完后需调用release()。
+        """
+        return memoryview(self._buf)[:self._len].toreadonly()
+
+    def snapshot(self):
+        """已累积数据的副本，可在其他线程调用
+
+        切片直接复制bytearray，不导出缓冲区，读取线程同时append()扩容也不会出现BufferError。
+        """
+        return bytes(self._buf[:self._len])
+
+    def take(self):
+        """取出已累积的数据包（唯一一次复制），并清空缓冲区"""
+        with memoryview(self._buf) as view:
+            data = view[:self._len].tobytes()
+        self._len = 0
+        # 长时间突发后缓冲区可能很大，超出保留上限时收缩回初始容量
+        if len(self._buf) > self.max_retained_size:
+            self._buf = bytearray(self.initial_size)
+        return data
+
+    def clear(self):
+        """丢弃已累积的数据"""
+        self._len = 0
+
+
+class PacketRing:
+    """固定容量的单生产者、多消费者数据包环形缓冲区
+
+    读取线程是唯一的生产者，每个消费者（GUI、日志记录器等）持有独立的读游标，
+    按各自的节奏取数据。生产者只写槽位后再发布写序号，消费者只修改自己的游标，
+    依靠GIL下列表元素和整数读写的原子性，非阻塞策略下无需加锁。
+
+    容量以数据包数量和字节数两方面限定，满时按溢出策略处理：
+      drop_oldest - 丢弃最旧的数据包（默认）
+      drop_newest - 丢弃新到的数据包
+      block       - 阻塞生产者直到最慢的消费者腾出空间
+    """
+
+    DROP_OLDEST = 'drop_oldest'
+    DROP_NEWEST = 'drop_newest'
+    BLOCK = 'block'
+    POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+    def __init__(self, capacity=65536, max_bytes=64 * 1024 * 1024, policy=DROP_OLDEST):
+        self.capacity = capacity  # 最多保留的数据包数
+        self.max_bytes = max_bytes  # 最多保留的字节数
+        self.policy = None
+        self._slots = [None] * capacity  # 槽位：(序号, 数据项, 字节数)
+        self._head = 0  # 下一个写入序号（已发布的数据为[_floor, _head)）
+        self._floor = 0  # 仍保留的最旧序号
+        self._bytes = 0  # 保留的数据字节数
+        self._consumers = []
+        self._space = None  # block策略下等待空间的条件变量
+        self._closed = False
+        # 统计计数（只由生产者修改）
+        self.total_packets = 0
+        self.total_bytes = 0
+        self.dropped_packets = 0
+        self.dropped_bytes = 0
+        self.high_water = 0  # 最大积压数据包数
+        self.high_water_bytes = 0  # 最大积压字节数
+        self.set_policy(policy)
+
+    def __len__(self):
+        """尚未被所有消费者读取的数据包数"""
+        oldest = min((c.seq for c in self._consumers), default=self._head)
+        return self._head - max(oldest, self._floor)
+
+    def set_policy(self, policy):
+        """设置溢出策略"""
+        if policy not in self.POLICIES:
+            raise ValueError(f"不支持的溢出策略: {policy}")
+        if policy == self.BLOCK and self._space is None:
+            self._space = Condition()
+        self.policy = policy
+        self._notify_space()
+
+    @property
+    def size_bytes(self):
+        """当前积压的字节数"""
+        return self._bytes
+
+    def consumer(self):
+        """注册一个新的消费者，从当前写位置开始读取"""
+        consumer = RingConsumer(self, self._head)
+        self._consumers = self._consumers + [consumer]
+        return consumer
+
+    def remove_consumer(self, consumer):
+        """注销消费者"""
+        self._consumers = [c for c in self._consumers if c is not consumer]
+        self._notify_space()
+
+    def put(self, item, size):
+        """写入一个数据项（size为其字节数），返回是否写入成功"""
+        self.total_packets += 1
+        self.total_bytes += size
+        self._release_consumed()
+        while self._head - self._floor >= self.capacity or \
+                (self._bytes + size > self.max_bytes and self._head > self._floor):
+            if self.policy == self.DROP_OLDEST:
+                self._evict_oldest()
+            elif self.policy == self.DROP_NEWEST or not self._wait_for_space(size):
+                self.dropped_packets += 1
+                self.dropped_bytes += size
+                return False
+            else:
+                self._release_consumed()
+        head = self._head
+        self._slots[head % self.capacity] = (head, item, size)
+        self._bytes += size
+        # 先写槽位再发布序号，消费者只会看到完整写入的数据
+        self._head = head + 1
+        backlog = self._head - self._floor
+        if backlog > self.high_water:
+            self.high_water = backlog
+        if self._bytes > self.high_water_bytes:
+            self.high_water_bytes = self._bytes
+        return True
+
+    def _release_consumed(self):
+        """释放所有消费者都已读过的数据"""
+        consumers = self._consumers
+        target = min((c.seq for c in consumers), default=self._head)
+        while self._floor < target:
+            slot = self._slots[self._floor % self.capacity]
+            self._bytes -= slot[2]
+            self._floor += 1
+
+    def _evict_oldest(self):
+        """丢弃最旧的一个数据包（drop_oldest策略）"""
+        slot = self._slots[self._floor % self.capacity]
+        self._bytes -= slot[2]
+        self._floor += 1
+        self.dropped_packets += 1
+        self.dropped_bytes += slot[2]
+
+    def _wait_for_space(self, size):
+        """block策略：等待消费者读取数据，缓冲区关闭时返回False"""
+        with self._space:
+            while not self._closed:
+                self._release_consumed()
+                if self._head - self._floor < self.capacity and \
+                        (self._bytes + size <= self.max_bytes or self._head == self._floor):
+                    return True
+                self._space.wait(0.1)
+        return False
+
+    def _notify_space(self):
+        """通知阻塞中的生产者已有空间"""
+        if self._space is not None:
+            with self._space:
+                self._space.notify()
+
+    def close(self):
+        """关闭缓冲区，唤醒阻塞中的生产者"""
+        self._closed = True
+        self._notify_space()
+
+    def reset(self):
+        """清空缓冲区和统计计数，已注册的消费者游标移到起点"""
+        self._slots = [None] * self.capacity
+        self._head = self._floor = self._bytes = 0
+        self._closed = False
+        self.total_packets = self.total_bytes = 0
+        self.dropped_packets = self.dropped_bytes = 0
+        self.high_water = self.high_water_bytes = 0
+        for consumer in self._consumers:
+            consumer.seq = 0
+
+    def stats(self):
+        """返回缓冲区统计信息"""
+        return {
+            'policy': self.policy,
+            'backlog_packets': len(self),
+            'backlog_bytes': self._bytes,
+            'total_packets': self.total_packets,
+            'total_bytes': self.total_bytes,
+            'dropped_packets': self.dropped_packets,
+            'dropped_bytes': self.dropped_bytes,
+            'high_water': self.high_water,
+            'high_water_bytes': self.high_water_bytes,
+        }
+
+
+class RingConsumer:
+    """PacketRing的消费者游标"""
+
+    def __init__(self, ring, seq):
+        self.ring = ring
+        self.seq = seq  # 下一个要读取的序号
+        self.missed_packets = 0  # 因溢出而错过的数据包数
+
+    def pending(self):
+        """尚未读取的数据包数"""
+        return self.ring._head - self.seq
+
+    def read(self, max_items=None):
+        """读取所有（或最多max_items个）未读数据项"""
+        ring = self.ring
+        head = ring._head
+        seq = self.seq
+        floor = ring._floor
+        if seq < floor:
+            # 落后太多，部分数据已被丢弃
+            self.missed_packets += floor - seq
+            seq = floor
+        if max_items is not None:
+            head = min(head, seq + max_items)
+        slots = ring._slots
+        capacity = ring.capacity
+        items = []
+        for s in range(seq, head):
+            slot = slots[s % capacity]
+            if slot[0] != s:
+                # 读取期间槽位已被生产者覆盖
+                self.missed_packets += 1
+                continue
+            items.append(slot[1])
+        self.seq = head
+        ring._notify_space()
+        return items
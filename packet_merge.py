@@ -0,0 +1,52 @@
+# 多串口数据包按时间合并：各串口的数据包分批到达，按首字节时间（单调时钟，各串口一致）排序后输出
+import time
+from heapq import heappush, heappop
+from itertools import count
+
+
+class PacketMerger:
+    """按首字节时间合并多个来源的数据包
+
+    各串口的数据包在分包超时和批量通知间隔之后才分批到达，不同串口的批次互相交错，
+    所以只释放首字节时间早于（当前时间 - delay）的数据包，保证窗口内的数据包按时间顺序输出。
+    晚于窗口到达的数据包仍会释放，排在已输出的数据包之后。
+    """
+
+    def __init__(self, delay=0.2):
+        self.delay_ns = int(delay * 1e9)  # 重排窗口
+        self._heap = []  # (首字节时间, 到达序号, 来源, Packet)
+        self._seq = count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def add(self, source, packets):
+        """加入一个来源的一批数据包"""
+        heap = self._heap
+        seq = self._seq
+        for packet in packets:
+            heappush(heap, (packet.first_ns, next(seq), source, packet))
+
+    def pop_ready(self, now_ns=None):
+        """取出重排窗口之前的数据包，返回按时间排序的[(来源, Packet), ...]"""
+        if now_ns is None:
+            now_ns = time.monotonic_ns()
+        limit = now_ns - self.delay_ns
+        heap = self._heap
+        ready = []
+        while heap and heap[0][0] <= limit:
+            _, _, source, packet = heappop(heap)
+            ready.append((source, packet))
+        return ready
+
+    def pop_all(self):
+        """取出全部数据包（按时间排序）"""
+        heap = self._heap
+        ready = []
+        while heap:
+            _, _, source, packet = heappop(heap)
+            ready.append((source, packet))
+        return ready
+
+    def clear(self):
+        self._heap = []
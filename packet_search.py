@@ -0,0 +1,173 @@
+# 接收历史搜索：查找HEX字节序列、文本或正则表达式，命中按数据包序号记录
+#
+# HEX和文本查询编译为一个bytes正则表达式：多个模式用'|'分隔时合并为一个表达式，
+# 在数据包存储的连续数据区上整段只扫描一次，命中位置按偏移映射回数据包序号，
+# 匹配不能跨越数据包边界。正则查询逐个数据包在解码后的文本上匹配，
+# '^'、'$'、'\b'和前后查找只看到本数据包的内容。每个数据包最多记录一次命中。
+# 搜索结果随新数据增量更新（只扫描上次之后存入的数据包），被淘汰的数据包的命中随之丢弃。
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+SEARCH_HEX = 'hex'
+SEARCH_TEXT = 'text'
+SEARCH_REGEX = 'regex'
+
+
+def compile_query(query, kind=SEARCH_HEX, ignore_case=False):
+    """编译查询字符串为正则表达式，格式错误时抛出ValueError
+
+    hex: 十六进制字节序列，'??'匹配任意字节，如'aa ?? 01'；'|'分隔多个序列（不区分大小写无效）
+    text: 文本（UTF-8编码后按字节匹配）；'|'分隔多个文本
+    regex: 正则表达式（str），作用于每个数据包按UTF-8解码（无效字节替换为U+FFFD）后的文本，
+    与文本显示模式看到的内容相同
+    """
+    query = query.strip()
+    if not query:
+        raise ValueError('查询不能为空')
+    case_flag = re.IGNORECASE if ignore_case else 0
+    try:
+        if kind == SEARCH_HEX:
+            return re.compile(b'|'.join(_hex_pattern(part) for part in query.split('|')), re.DOTALL)
+        if kind == SEARCH_TEXT:
+            alternatives = [re.escape(part.encode('utf-8')) for part in query.split('|') if part]
+            return re.compile(b'|'.join(alternatives), re.DOTALL | case_flag)
+        if kind == SEARCH_REGEX:
+            return re.compile(query, re.DOTALL | case_flag)
+    except re.error as e:
+        raise ValueError(f'正则表达式错误: {e}')
+    raise ValueError(f'不支持的搜索方式: {kind}')
+
+
+def _hex_pattern(text):
+    """一个十六进制序列转换为正则表达式片段"""
+    tokens = text.split()
+    if len(tokens) == 1:
+        # 不带空格时按两个字符一组
+        tokens = [text.strip()[i:i + 2] for i in range(0, len(text.strip()), 2)]
+    parts = []
+    for token in tokens:
+        if token == '??':
+            parts.append(b'.')
+        else:
+            try:
+                if len(token) != 2:
+                    raise ValueError
+                parts.append(re.escape(bytes.fromhex(token)))
+            except ValueError:
+                raise ValueError(f'无效的HEX字节: {token}')
+    if not parts:
+        raise ValueError('HEX序列不能为空')
+    return b''.join(parts)
+
+
+class PacketSearch:
+    """数据包存储上的搜索结果：命中数据包的绝对序号（升序）
+
+    与PacketStore一样按绝对编号管理：evicted为已丢弃的命中数（对应的数据包已被淘汰），
+    第i个命中（0为仍保留的最旧命中）的数据包序号为seq_at(i)。update()只在GUI线程调用。
+    """
+
+    def __init__(self, store, pattern):
+        self.store = store
+        self.pattern = pattern
+        self.reset()
+
+    def reset(self):
+        """清空命中，下次update()从存储中最旧的数据包开始扫描"""
+        self._matches = array('Q')
+        self._head = 0  # 第一个有效命中在_matches中的下标
+        self.evicted = 0  # 累计丢弃的命中数
+        self._next_seq = self.store.evicted  # 下一个待扫描数据包的绝对序号
+
+    def __len__(self):
+        return len(self._matches) - self._head
+
+    def seq_at(self, index):
+        """第index个有效命中的数据包绝对序号"""
+        return self._matches[self._head + index]
+
+    def index_of(self, seq):
+        """数据包seq在命中中的下标，不是命中时返回-1"""
+        i = bisect_left(self._matches, seq, self._head)
+        if i < len(self._matches) and self._matches[i] == seq:
+            return i - self._head
+        return -1
+
+    def __contains__(self, seq):
+        return self.index_of(seq) >= 0
+
+    def next_index(self, seq):
+        """序号大于seq的第一个命中的下标，没有时返回-1"""
+        i = bisect_right(self._matches, seq, self._head)
+        return i - self._head if i < len(self._matches) else -1
+
+    def prev_index(self, seq):
+        """序号小于seq的最后一个命中的下标，没有时返回-1"""
+        i = bisect_left(self._matches, seq, self._head)
+        return i - 1 - self._head if i > self._head else -1
+
+    def update(self):
+        """丢弃已淘汰数据包的命中并扫描新存入的数据包，返回新增命中数"""
+        store = self.store
+        if self._next_seq > store.evicted + len(store):
+            # 存储被清空
+            self.reset()
+        self._trim(store.evicted)
+        start_row = max(self._next_seq - store.evicted, 0)
+        count = len(store)
+        if start_row >= count:
+            return 0
+        found = len(self._matches)
+        self._scan(start_row, count)
+        self._next_seq = store.evicted + count
+        return len(self._matches) - found
+
+    def _trim(self, evicted):
+        """丢弃序号小于evicted的命中，累计超过数组一半时整体压缩"""
+        head = bisect_left(self._matches, evicted, self._head)
+        self.evicted += head - self._head
+        self._head = head
+        if head > 4096 and head * 2 > len(self._matches):
+            del self._matches[:head]
+            self._head = 0
+
+    def _scan(self, start_row, count):
+        """在store.payload()上从start_row开始查找，每个数据包最多记录一次命中"""
+        if isinstance(self.pattern.pattern, str):
+            self._scan_text(start_row, count)
+            return
+        store = self.store
+        search = self.pattern.search
+        matches = self._matches
+        base_seq = store.evicted
+        with store.payload() as payload:
+            end = len(payload)
+            pos = store.offset_of(start_row)
+            while pos < end:
+                m = search(payload, pos, end)
+                if m is None:
+                    break
+                row = store.index_at(m.start())
+                row_end = store.offset_of(row + 1) if row + 1 < count else end
+                if m.end() > row_end and search(payload, m.start(), row_end) is None:
+                    # 最左的匹配跨越了数据包边界，该数据包内没有命中
+                    pos = row_end
+                    continue
+                matches.append(base_seq + row)
+                pos = row_end
+
+    def _scan_text(self, start_row, count):
+        """正则查询：逐个数据包解码后匹配，锚点和前后查找不会看到相邻数据包"""
+        store = self.store
+        search = self.pattern.search
+        matches = self._matches
+        base_seq = store.evicted
+        with store.payload() as payload:
+            end = len(payload)
+            start = store.offset_of(start_row)
+            for row in range(start_row, count):
+                row_end = store.offset_of(row + 1) if row + 1 < count else end
+                if search(str(payload[start:row_end], 'utf-8', 'replace')) is not None:
+                    matches.append(base_seq + row)
+                start = row_end
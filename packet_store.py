@@ -0,0 +1,220 @@
+# 紧凑的接收数据包存储：连续的数据区 + 数组列，带内存上限和先进先出淘汰
+from array import array
+from bisect import bisect_right
+from threading import Lock
+from collections import namedtuple
+from packet_buffer import Packet
+
+# 连续读取的一段数据包：起始绝对序号、连续数据、n+1个相对偏移、首字节时间、换行标记
+PacketBlock = namedtuple('PacketBlock', ['start', 'payload', 'offsets', 'first_ns', 'breaks'])
+
+
+class PacketStore:
+    """按列存储的数据包历史
+
+    所有数据包的内容顺序存放在一个bytearray中，起始偏移、首字节/末字节时间戳
+    分别存放在array('Q')列中，换行标记存放在位图中，每个数据包只占约25字节的额外开销。
+    追加和按下标访问都是O(1)；超出内存上限时从最旧的数据包开始淘汰，
+    每次淘汰约10%的内存上限后整体压缩一次（摊还O(1)）。
+
+    偏移使用逻辑偏移（累计接收字节数），压缩数据区时无需改写偏移列。
+
+    写操作只在GUI线程进行；后台线程（如格式化线程）读取时需使用read_range()/read_block()，
+    它们与写操作通过lock互斥。
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, line_gap_ns=5_000_000):
+        self.max_bytes = max_bytes  # 内存上限（字节）
+        self.line_gap_ns = line_gap_ns  # 与上一包的静默间隔超过该值时标记为新行
+        self.lock = Lock()  # 写操作与后台线程读取之间的互斥锁
+        self._reset()
+
+    def clear(self):
+        """清空存储"""
+        with self.lock:
+            self._reset()
+
+    def _reset(self):
+        self._data = bytearray()
+        self._data_origin = 0  # _data[0]对应的逻辑偏移
+        self._end = 0  # 已追加数据的逻辑结束偏移
+        self._offsets = array('Q')  # 每个数据包的起始逻辑偏移
+        self._first_ns = array('Q')  # 首字节到达时间
+        self._last_ns = array('Q')  # 末字节到达时间
+        self._breaks = bytearray()  # 换行标记位图
+        self._bit_origin = 0  # 位图第0位对应的数组下标
+        self._head = 0  # 第一个有效数据包在数组列中的下标
+        self.evicted = 0  # 累计淘汰的数据包数（即第0行的绝对序号）
+        self.evicted_bytes = 0  # 累计淘汰的字节数
+
+    def __len__(self):
+        return len(self._offsets) - self._head
+
+    def __getitem__(self, index):
+        """按行号（0为最旧的有效数据包）访问，返回Packet"""
+        count = len(self)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError('数据包下标超出范围')
+        j = self._head + index
+        start, end = self._bounds(j)
+        return Packet(bytes(self._data[start:end]), self._first_ns[j], self._last_ns[j])
+
+    def _bounds(self, j):
+        """数组下标j对应的数据包在_data中的[start, end)"""
+        start = self._offsets[j] - self._data_origin
+        if j + 1 < len(self._offsets):
+            end = self._offsets[j + 1] - self._data_origin
+        else:
+            end = self._end - self._data_origin
+        return start, end
+
+    @property
+    def total_bytes(self):
+        """当前保留的数据字节数"""
+        return self._end - self._offsets[self._head] if len(self) else 0
+
+    def memory_usage(self):
+        """当前占用的内存（数据区 + 数组列 + 位图）"""
+        return len(self._data) + len(self._offsets) * 24 + len(self._breaks)
+
+    def append(self, packet):
+        """追加一个数据包（Packet）"""
+        with self.lock:
+            self._append(packet)
+
+    def _append(self, packet):
+        data = packet.data
+        j = len(self._offsets)
+        if j > self._head and packet.first_ns - self._last_ns[j - 1] > self.line_gap_ns:
+            self._set_break(j)
+        self._offsets.append(self._end)
+        self._first_ns.append(packet.first_ns)
+        self._last_ns.append(packet.last_ns)
+        self._data += data
+        self._end += len(data)
+        if self.memory_usage() > self.max_bytes:
+            self._evict()
+
+    def extend(self, packets):
+        """批量追加数据包"""
+        with self.lock:
+            for packet in packets:
+                self._append(packet)
+
+    def read_range(self, start_seq, end_seq):
+        """按绝对序号读取[start_seq, end_seq)内仍保留的数据包（线程安全）
+
+        返回(实际起始序号, [Packet, ...])，已淘汰的部分被跳过。
+        """
+        with self.lock:
+            start = max(start_seq, self.evicted)
+            end = min(end_seq, self.evicted + len(self))
+            return start, [self[seq - self.evicted] for seq in range(start, end)]
+
+    def read_block(self, start_seq, end_seq):
+        """按绝对序号读取[start_seq, end_seq)内仍保留的数据包为一个连续数据块（线程安全）
+
+        数据只复制一次，供批量格式化使用。
+        """
+        with self.lock:
+            start = max(start_seq, self.evicted)
+            end = max(start, min(end_seq, self.evicted + len(self)))
+            j0 = self._head + (start - self.evicted)
+            j1 = self._head + (end - self.evicted)
+            if j1 == j0:
+                return PacketBlock(start, b'', [0], [], [])
+            base = self._offsets[j0]
+            stop = self._offsets[j1] if j1 < len(self._offsets) else self._end
+            payload = bytes(self._data[base - self._data_origin:stop - self._data_origin])
+            offsets = [offset - base for offset in self._offsets[j0:j1]]
+            offsets.append(stop - base)
+            first_ns = self._first_ns[j0:j1].tolist()
+            breaks = [self.starts_line(j - self._head) for j in range(j0, j1)]
+            return PacketBlock(start, payload, offsets, first_ns, breaks)
+
+    def iter_blocks(self, block_packets=4096):
+        """从最旧的数据包开始按块遍历整个存储"""
+        seq = self.evicted
+        while seq < self.evicted + len(self):
+            block = self.read_block(seq, seq + block_packets)
+            if not block.first_ns:
+                break
+            yield block
+            seq = block.start + len(block.first_ns)
+
+    def data_at(self, index):
+        """第index行数据包的内容"""
+        return self[index].data
+
+    def timestamps_at(self, index):
+        """第index行数据包的(首字节时间ns, 末字节时间ns)"""
+        j = self._head + index
+        return self._first_ns[j], self._last_ns[j]
+
+    def starts_line(self, index):
+        """第index行数据包是否开始新的一行（与上一包间隔超过line_gap_ns）"""
+        bit = self._head + index - self._bit_origin
+        byte = bit >> 3
+        return byte < len(self._breaks) and bool(self._breaks[byte] & (1 << (bit & 7)))
+
+    def _set_break(self, j):
+        """设置数组下标j的换行标记"""
+        bit = j - self._bit_origin
+        byte = bit >> 3
+        if byte >= len(self._breaks):
+            self._breaks.extend(bytes(byte - len(self._breaks) + 1))
+        self._breaks[byte] |= 1 << (bit & 7)
+
+    def payload(self):
+        """全部有效数据包内容的连续只读视图（零复制），用于保存和搜索
+
+        注意：持有视图期间不能追加数据，用完后需调用release()。
+        """
+        if not len(self):
+            return memoryview(b'')
+        start = self._offsets[self._head] - self._data_origin
+        return memoryview(self._data)[start:].toreadonly()
+
+    def offset_of(self, index):
+        """第index行数据包在payload()中的起始偏移"""
+        return self._offsets[self._head + index] - self._offsets[self._head]
+
+    def index_at(self, offset):
+        """payload()中偏移offset所在数据包的行号（二分查找偏移列）"""
+        logical = self._offsets[self._head] + offset
+        return bisect_right(self._offsets, logical, self._head) - self._head - 1
+
+    def _evict(self):
+        """淘汰最旧的数据包，直到内存占用降到上限的90%以下"""
+        target = self.max_bytes * 0.9
+        count = len(self._offsets)
+        usage = self.memory_usage()
+        head = self._head
+        # 至少保留最新的一个数据包
+        while head < count - 1 and usage > target:
+            start = self._offsets[head]
+            size = self._offsets[head + 1] - start
+            usage -= size + 24
+            self.evicted_bytes += size
+            head += 1
+        self.evicted += head - self._head
+        self._head = head
+        self._compact()
+
+    def _compact(self):
+        """丢弃已淘汰数据包占用的数据区、数组列和位图"""
+        head = self._head
+        dead = self._offsets[head] - self._data_origin
+        del self._data[:dead]
+        self._data_origin += dead
+        del self._offsets[:head]
+        del self._first_ns[:head]
+        del self._last_ns[:head]
+        # 位图按整字节压缩，剩余不足8位的偏移留在_bit_origin中
+        dead_bits = head - self._bit_origin
+        dead_bytes = dead_bits >> 3
+        del self._breaks[:dead_bytes]
+        self._bit_origin = -(dead_bits & 7)
+        self._head = 0
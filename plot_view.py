@@ -0,0 +1,317 @@
+# 数值通道实时曲线：每个通道一个TimeSeries，按绘图区像素宽度做min/max抽取后绘制
+# 新数据只标记需要重绘，由定时器按最高帧率合并刷新；滚轮缩放、拖动平移保留的历史数据
+import math
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QCheckBox, QPushButton, QLabel
+from PyQt5.QtCore import Qt, QTimer, QPointF, QRectF
+from PyQt5.QtGui import QPainter, QPen, QColor, QPolygonF
+from timeseries import TimeSeries
+
+COLORS = [QColor(31, 119, 180), QColor(255, 127, 14), QColor(44, 160, 44),
+          QColor(214, 39, 40), QColor(148, 103, 189), QColor(140, 86, 75)]
+
+MAX_FPS = 30  # 最高刷新帧率
+MIN_SPAN_NS = 1_000_000  # 最小显示范围1ms
+DEFAULT_SPAN_NS = 10_000_000_000  # 默认显示最近10秒
+
+
+def nice_step(span, target):
+    """把span分成约target段的整齐刻度间隔（1、2、5 × 10^n）"""
+    raw = span / max(target, 1)
+    magnitude = 10 ** math.floor(math.log10(raw))
+    for factor in (1, 2, 5, 10):
+        if raw <= factor * magnitude:
+            return factor * magnitude
+    return 10 * magnitude
+
+
+class PlotWidget(QWidget):
+    """曲线绘图区
+
+    跟随模式下右边界为最新样本；缩放或平移后固定在所选范围，双击恢复跟随。
+    x轴为会话开始后的秒数（SessionClock的单调时间锚点），y轴按可见数据自动缩放。
+    """
+
+    MARGIN_LEFT = 64
+    MARGIN_RIGHT = 10
+    MARGIN_TOP = 10
+    MARGIN_BOTTOM = 24
+
+    def __init__(self, clock, parent=None):
+        super().__init__(parent)
+        self.clock = clock
+        self.channels = {}  # 通道名 -> TimeSeries
+        self.hidden = set()  # 隐藏的通道
+        self.span_ns = DEFAULT_SPAN_NS
+        self.follow = True
+        self.end_ns = 0  # 非跟随模式下的右边界
+        self._dirty = False
+        self._drag = None  # 拖动起点(x, end_ns)
+        self.setMinimumHeight(160)
+        self.setMouseTracking(False)
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self._refresh)
+
+    def set_channels(self, names):
+        """重建通道（清空数据）"""
+        self.channels = {name: TimeSeries() for name in names}
+        self.hidden &= set(names)
+        self._dirty = True
+
+    def extend(self, name, times, values):
+        """追加一个通道的一批样本，下一帧重绘"""
+        self.channels[name].extend(times, values)
+        self._dirty = True
+
+    def clear(self):
+        for series in self.channels.values():
+            series.clear()
+        self.follow = True
+        self._dirty = True
+
+    def color(self, name):
+        return COLORS[list(self.channels).index(name) % len(COLORS)]
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh_timer.start(1000 // MAX_FPS)
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.refresh_timer.stop()
+
+    def _refresh(self):
+        """按帧率合并重绘：只在有新数据或视图变化时重绘一次"""
+        if self._dirty:
+            self._dirty = False
+            self.update()
+
+    def data_range(self):
+        """所有通道保留数据的(最早时间, 最晚时间)，没有数据时返回None"""
+        ranges = [series.time_range() for series in self.channels.values() if len(series)]
+        if not ranges:
+            return None
+        return min(r[0] for r in ranges), max(r[1] for r in ranges)
+
+    def view_range(self):
+        """当前显示的时间范围[t0, t1)"""
+        if self.follow:
+            data_range = self.data_range()
+            end = data_range[1] + 1 if data_range else self.clock.now_ns()
+        else:
+            end = self.end_ns
+        return end - self.span_ns, end
+
+    def show_all(self):
+        """显示全部保留的数据"""
+        data_range = self.data_range()
+        if data_range:
+            self.span_ns = max(data_range[1] + 1 - data_range[0], MIN_SPAN_NS)
+        self.follow = True
+        self.update()
+
+    def follow_latest(self):
+        self.follow = True
+        self.update()
+
+    def _plot_rect(self):
+        return QRectF(self.MARGIN_LEFT, self.MARGIN_TOP,
+                      max(self.width() - self.MARGIN_LEFT - self.MARGIN_RIGHT, 1),
+                      max(self.height() - self.MARGIN_TOP - self.MARGIN_BOTTOM, 1))
+
+    def _collect(self, t0, t1, columns):
+        """可见通道在[t0, t1)内的数据：样本少时取原始点，否则按列抽取min/max"""
+        curves = []
+        low, high = math.inf, -math.inf
+        for name, series in self.channels.items():
+            if name in self.hidden:
+                continue
+            if series.count_between(t0, t1) <= columns:
+                times, values = series.samples(t0, t1)
+                if values:
+                    low, high = min(low, min(values)), max(high, max(values))
+                curves.append((name, 'points', (times, values)))
+            else:
+                bins = series.decimate(t0, t1, columns)
+                for item in bins:
+                    if item is not None:
+                        low, high = min(low, item[0]), max(high, item[1])
+                curves.append((name, 'bins', bins))
+        return curves, low, high
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        rect = self._plot_rect()
+        columns = int(rect.width())
+        t0, t1 = self.view_range()
+        curves, low, high = self._collect(t0, t1, columns)
+        if low > high:
+            low, high = 0.0, 1.0
+        elif low == high:
+            low, high = low - 1, high + 1
+        else:
+            margin = (high - low) * 0.05
+            low, high = low - margin, high + margin
+
+        x_scale = rect.width() / (t1 - t0)
+        y_scale = rect.height() / (high - low)
+        left, bottom = rect.left(), rect.bottom()
+        self._draw_axes(painter, rect, t0, t1, low, high)
+
+        painter.setClipRect(rect)
+        for name, kind, data in curves:
+            painter.setPen(QPen(self.color(name), 1))
+            if kind == 'points':
+                times, values = data
+                polygon = QPolygonF([QPointF(left + (t - t0) * x_scale, bottom - (v - low) * y_scale)
+                                     for t, v in zip(times, values)])
+                painter.drawPolyline(polygon)
+                continue
+            # 每列画一段从最小值到最大值的竖线，相邻列首尾相连；没有数据的列断开
+            polygon = QPolygonF()
+            for c, item in enumerate(data):
+                if item is None:
+                    if polygon.size():
+                        painter.drawPolyline(polygon)
+                        polygon = QPolygonF()
+                    continue
+                x = left + c + 0.5
+                polygon.append(QPointF(x, bottom - (item[0] - low) * y_scale))
+                polygon.append(QPointF(x, bottom - (item[1] - low) * y_scale))
+            if polygon.size():
+                painter.drawPolyline(polygon)
+        painter.setClipping(False)
+
+        # 图例
+        x = left + 6
+        for name in self.channels:
+            if name in self.hidden:
+                continue
+            painter.setPen(self.color(name))
+            painter.drawText(QPointF(x, rect.top() + 14), name)
+            x += painter.fontMetrics().horizontalAdvance(name) + 12
+
+    def _draw_axes(self, painter, rect, t0, t1, low, high):
+        """坐标框、网格和刻度（x为会话开始后的秒数）"""
+        grid_pen = QPen(QColor(225, 225, 225), 1)
+        text_pen = QPen(Qt.darkGray, 1)
+        origin = self.clock.mono_anchor_ns
+        metrics = painter.fontMetrics()
+
+        step = nice_step((t1 - t0) / 1e9, rect.width() / 90)
+        decimals = max(0, -int(math.floor(math.log10(step))))
+        first = math.ceil((t0 - origin) / 1e9 / step)
+        last = math.floor((t1 - origin) / 1e9 / step)
+        for i in range(first, last + 1):
+            seconds = i * step
+            x = rect.left() + ((origin + seconds * 1e9) - t0) * rect.width() / (t1 - t0)
+            painter.setPen(grid_pen)
+            painter.drawLine(QPointF(x, rect.top()), QPointF(x, rect.bottom()))
+            painter.setPen(text_pen)
+            label = f'{seconds:.{decimals}f}s'
+            painter.drawText(QPointF(x - metrics.horizontalAdvance(label) / 2, rect.bottom() + 16), label)
+
+        step = nice_step(high - low, rect.height() / 40)
+        decimals = max(0, -int(math.floor(math.log10(step))))
+        for i in range(math.ceil(low / step), math.floor(high / step) + 1):
+            value = i * step
+            y = rect.bottom() - (value - low) * rect.height() / (high - low)
+            painter.setPen(grid_pen)
+            painter.drawLine(QPointF(rect.left(), y), QPointF(rect.right(), y))
+            painter.setPen(text_pen)
+            label = f'{value:.{decimals}f}'
+            painter.drawText(QPointF(rect.left() - metrics.horizontalAdvance(label) - 4, y + 4), label)
+
+        painter.setPen(QPen(Qt.gray, 1))
+        painter.drawRect(rect)
+
+    def wheelEvent(self, event):
+        """滚轮缩放，以光标所在时间为中心"""
+        rect = self._plot_rect()
+        t0, t1 = self.view_range()
+        factor = 0.8 ** (event.angleDelta().y() / 120)
+        data_range = self.data_range()
+        max_span = max(data_range[1] + 1 - data_range[0], DEFAULT_SPAN_NS) if data_range else DEFAULT_SPAN_NS
+        span = min(max(int(self.span_ns * factor), MIN_SPAN_NS), max_span)
+        ratio = min(max((event.pos().x() - rect.left()) / rect.width(), 0.0), 1.0)
+        center = t0 + ratio * (t1 - t0)
+        end = int(center + (1 - ratio) * span)
+        self.span_ns = span
+        self._set_end(end)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self._drag = (event.pos().x(), self.view_range()[1])
+
+    def mouseMoveEvent(self, event):
+        if self._drag is not None:
+            x, end = self._drag
+            self._set_end(int(end - (event.pos().x() - x) * self.span_ns / self._plot_rect().width()))
+
+    def mouseReleaseEvent(self, event):
+        self._drag = None
+
+    def mouseDoubleClickEvent(self, event):
+        self.follow_latest()
+
+    def _set_end(self, end):
+        """设置右边界，移到最新数据之后时恢复跟随"""
+        data_range = self.data_range()
+        self.follow = data_range is None or end > data_range[1]
+        self.end_ns = end
+        self.update()
+
+
+class PlotView(QWidget):
+    """曲线页：通道选择 + 绘图区，数据来自协议解码结果（protocol.DecodedBatch）"""
+
+    def __init__(self, clock, parent=None):
+        super().__init__(parent)
+        self.protocol = None
+        self.plot = PlotWidget(clock)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.channel_layout = QHBoxLayout()
+        layout.addLayout(self.channel_layout)
+        layout.addWidget(self.plot)
+        self.channel_checks = []
+
+    def set_protocol(self, protocol):
+        """按协议的字段建立通道（清空曲线）"""
+        self.protocol = protocol
+        names = [f.name for f in protocol.fields] if protocol else []
+        self.plot.set_channels(names)
+        while self.channel_layout.count():
+            widget = self.channel_layout.takeAt(0).widget()
+            if widget is not None:
+                widget.deleteLater()
+        self.channel_checks = []
+        for name in names:
+            check = QCheckBox(name)
+            check.setChecked(name not in self.plot.hidden)
+            check.setStyleSheet(f'color: {self.plot.color(name).name()}')
+            check.stateChanged.connect(lambda state, name=name: self.set_channel_visible(name, state == Qt.Checked))
+            self.channel_layout.addWidget(check)
+            self.channel_checks.append(check)
+        self.channel_layout.addStretch()
+        self.channel_layout.addWidget(QLabel('滚轮缩放，拖动平移，双击跟随最新'))
+        show_all_btn = QPushButton('全部')
+        show_all_btn.clicked.connect(self.plot.show_all)
+        self.channel_layout.addWidget(show_all_btn)
+
+    def set_channel_visible(self, name, visible):
+        if visible:
+            self.plot.hidden.discard(name)
+        else:
+            self.plot.hidden.add(name)
+        self.plot.update()
+
+    def add_batch(self, batch):
+        """追加一批解码结果，各字段作为一个通道"""
+        if self.protocol is None or not batch.rows:
+            return
+        for index, f in enumerate(self.protocol.fields):
+            self.plot.extend(f.name, batch.first_ns, self.protocol.column(batch.rows, index))
+
+    def clear(self):
+        self.plot.clear()
@@ -0,0 +1,134 @@
+# 多串口共用一个读取线程：所有串口的文件描述符注册到同一个选择器（selectors），
+# 一个线程等待任一串口可读或任一串口的分包/批量通知截止时间到期
+# 分包、接收缓冲区和通知逻辑仍由各串口的SerialCore完成，PortHub只负责等待和调度。
+import os
+import time
+import selectors
+from threading import Thread, Lock, Event, current_thread
+from diag_log import get_logger
+
+log = get_logger('hub')
+
+
+class PortHub:
+    """串口选择线程
+
+    SerialCore(hub=hub)打开串口时注册到hub，关闭时注销；没有串口时线程退出，
+    再有串口注册时重新启动。注册/注销由选择线程执行，其他线程通过命令队列和唤醒管道请求。
+    不提供文件描述符的端口（Windows串口、loop://等）仍使用各自的读取线程。
+    """
+
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ)
+        self._cores = []  # 已注册的串口（只在选择线程中修改）
+        self._commands = []  # 待执行的(操作, 串口, 完成事件)
+        self._lock = Lock()
+        self._thread = None
+
+    @property
+    def port_count(self):
+        """已注册的串口数"""
+        return len(self._cores)
+
+    def add(self, core):
+        """注册已打开的串口，由选择线程开始读取"""
+        with self._lock:
+            self._commands.append(('add', core, None))
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name='PortHub', daemon=True)
+                self._thread.start()
+        self.wake()
+
+    def remove(self, core, timeout=1.0):
+        """注销串口，等待选择线程通知完剩余数据包后返回"""
+        if current_thread() is self._thread:
+            # 在选择线程中（如接收端回调里关闭串口）直接注销
+            self._unregister(core)
+            return
+        done = Event()
+        with self._lock:
+            if self._thread is None:
+                return
+            self._commands.append(('remove', core, done))
+        self.wake()
+        done.wait(timeout)
+
+    def wake(self):
+        """唤醒选择线程（注册变化、超时参数变化时重新计算等待时间）"""
+        try:
+            os.write(self._wake_w, b'\0')
+        except OSError:
+            pass
+
+    def _run(self):
+        log.debug("串口选择线程已启动")
+        while True:
+            with self._lock:
+                commands, self._commands = self._commands, []
+                if not commands and not self._cores:
+                    self._thread = None
+                    break
+            for op, core, done in commands:
+                if op == 'add':
+                    self._selector.register(core._port_fd, selectors.EVENT_READ, core)
+                    self._cores = self._cores + [core]
+                else:
+                    self._unregister(core)
+                    done.set()
+            if not self._cores:
+                continue
+
+            # 等待时间取所有串口中最早的分包/批量通知截止时间
+            timeout = min(core._next_wait_timeout() for core in self._cores)
+            events = self._selector.select(timeout)
+            now_ns = time.monotonic_ns()
+            readable = set()
+            for key, _ in events:
+                if key.data is None:
+                    try:
+                        os.read(self._wake_r, 4096)
+                    except BlockingIOError:
+                        pass
+                    continue
+                readable.add(key.data)
+            for core in self._cores:
+                self._service(core, core in readable, now_ns)
+        log.debug("串口选择线程已退出")
+
+    def _service(self, core, readable, now_ns):
+        """读取一个串口的可用数据并推进其分包状态"""
+        try:
+            port = core.serial_port
+            data = port.read(port.in_waiting or 1) if readable else b''
+            core._process_input(data, now_ns)
+        except Exception as e:
+            log.error("读取数据错误（%s）: %s", core.port, e)
+            if not core.serial_port.is_open or readable:
+                # 可读但读取失败（设备断开）时不再选择该串口，避免空转；
+                # 注销（通知剩余数据包）后由串口按正常流程关闭（停止发送线程、通知界面）
+                self._unregister(core)
+                core._on_port_lost(e)
+
+    def _unregister(self, core):
+        if core not in self._cores:
+            return
+        self._selector.unregister(core._port_fd)
+        self._cores = [c for c in self._cores if c is not core]
+        core._finish_reading()
+
+    def close(self):
+        """关闭选择器（所有串口注销后调用，重复调用无效）"""
+        if self._wake_r is None:
+            return
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout=1.0)
+        self._selector.close()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+        self._wake_r = self._wake_w = None
@@ -0,0 +1,165 @@
+# 声明式协议定义：字段名、偏移、类型、比例/偏置、枚举表，编译为struct解码器后按块批量解码数据包存储
+#
+# 每个协议编译成一个struct.Struct（字段之间的空隙用填充字节'x'跳过），解码一个数据包只需一次unpack_from；
+# decode_block()直接在PacketStore.read_block()返回的连续数据区上按偏移解码，不逐包复制数据。
+import struct
+from collections import namedtuple
+
+# 字段：名称、在帧中的字节偏移、struct类型码、物理值 = 原始值 * scale + bias、枚举表（原始值 -> 名称）、单位
+Field = namedtuple('Field', ['name', 'offset', 'type', 'scale', 'bias', 'enum', 'unit'])
+
+# 一批解码结果：各帧的首字节时间、原始值元组、绝对序号
+DecodedBatch = namedtuple('DecodedBatch', ['first_ns', 'rows', 'seqs'])
+
+
+def field(name, offset, type='B', scale=1, bias=0, enum=None, unit=''):
+    """定义一个字段"""
+    return Field(name, offset, type, scale, bias, enum, unit)
+
+
+class Protocol:
+    """编译后的协议解码器
+
+    header为帧头（帧开头的固定字节），只解码以帧头开始、长度不小于帧长的数据包；
+    exact_length为True时数据包长度必须等于帧长。byteorder为struct字节序前缀。
+    """
+
+    def __init__(self, name, fields, header=b'', byteorder='<', exact_length=False):
+        self.name = name
+        self.header = bytes(header)
+        self.exact_length = exact_length
+        self.fields = sorted(fields, key=lambda f: f.offset)
+        self._struct = self._compile(byteorder)
+        self.size = max(self._struct.size, len(self.header))  # 帧长
+
+    def _compile(self, byteorder):
+        fmt = [byteorder]
+        position = 0
+        for f in self.fields:
+            if f.offset < position:
+                raise ValueError(f'字段重叠: {f.name}')
+            if f.offset > position:
+                fmt.append(f'{f.offset - position}x')
+            fmt.append(f.type)
+            position = f.offset + struct.calcsize(byteorder + f.type)
+        return struct.Struct(''.join(fmt))
+
+    def match(self, data, offset=0, length=None):
+        """data[offset:offset+length]是否为本协议的帧"""
+        if length is None:
+            length = len(data) - offset
+        if length < self.size or (self.exact_length and length != self.size):
+            return False
+        header = self.header
+        return not header or data[offset:offset + len(header)] == header
+
+    def decode_raw(self, data):
+        """解码一个数据包，返回原始值元组，不匹配时返回None"""
+        if not self.match(data):
+            return None
+        return self._struct.unpack_from(data, 0)
+
+    def value(self, index, raw):
+        """第index个字段的物理值（带枚举表的字段返回枚举名称）"""
+        f = self.fields[index]
+        if f.enum is not None:
+            return f.enum.get(raw, raw)
+        return raw * f.scale + f.bias if (f.scale != 1 or f.bias) else raw
+
+    def column(self, rows, index):
+        """一批原始值元组中第index个字段的数值列（带枚举表的字段取原始值），用于绘图"""
+        f = self.fields[index]
+        values = [row[index] for row in rows]
+        if f.enum is None and (f.scale != 1 or f.bias):
+            scale, bias = f.scale, f.bias
+            values = [v * scale + bias for v in values]
+        return values
+
+    def format_value(self, index, value):
+        """物理值格式化为显示文本（带单位）"""
+        unit = self.fields[index].unit
+        if isinstance(value, float):
+            value = f'{value:.6g}'
+        return f'{value}{unit}' if unit else str(value)
+
+    def decode(self, data):
+        """解码一个数据包为{字段名: 物理值}，不匹配时返回None"""
+        raw = self.decode_raw(data)
+        if raw is None:
+            return None
+        return {f.name: self.value(i, v) for i, (f, v) in enumerate(zip(self.fields, raw))}
+
+    def decode_block(self, block):
+        """批量解码一段数据包（packet_store.PacketBlock），跳过不匹配的数据包"""
+        payload = block.payload
+        offsets = block.offsets
+        first_ns = block.first_ns
+        count = len(first_ns)
+        size = self.size
+        header = self.header
+        if self._uniform(payload, offsets, count):
+            # 快速路径：全部是帧长相同的本协议帧（分帧后的常见情况），整块一次iter_unpack
+            rows = list(self._struct.iter_unpack(payload))
+            return DecodedBatch(first_ns, rows, list(range(block.start, block.start + count)))
+        unpack_from = self._struct.unpack_from
+        exact = self.exact_length
+        header_size = len(header)
+        times = []
+        rows = []
+        seqs = []
+        for i in range(count):
+            start = offsets[i]
+            length = offsets[i + 1] - start
+            if length < size or (exact and length != size):
+                continue
+            if header_size and payload[start:start + header_size] != header:
+                continue
+            rows.append(unpack_from(payload, start))
+            times.append(first_ns[i])
+            seqs.append(block.start + i)
+        return DecodedBatch(times, rows, seqs)
+
+    def _uniform(self, payload, offsets, count):
+        """数据块是否全部由恰好一帧长、帧头正确的数据包组成"""
+        size = self.size
+        if self._struct.size != size or offsets != list(range(0, (count + 1) * size, size)):
+            return False
+        header = self.header
+        if not header:
+            return True
+        if len(header) == 1:
+            return payload[::size] == header * count
+        return all(payload[i:i + len(header)] == header for i in range(0, count * size, size))
+
+    def decode_store(self, store, start_seq=None, block_packets=4096):
+        """按块解码数据包存储中从start_seq（绝对序号，默认最旧）开始的数据包，逐块产生DecodedBatch"""
+        seq = store.evicted if start_seq is None else max(start_seq, store.evicted)
+        end = store.evicted + len(store)
+        while seq < end:
+            block = store.read_block(seq, min(seq + block_packets, end))
+            if not block.first_ns:
+                break
+            yield self.decode_block(block)
+            seq = block.start + len(block.first_ns)
+
+
+# 电流/OPA设备协议：aa <电流> <opa0增益> <opa1增益>
+# 电流值编码为 mA / 5 - 1；增益直接发送倍数（超过255时按255发送）
+OPA0_GAINS = {'1x': 1, '20x': 20, '40x': 40, '60x': 60, '80x': 80, '100x': 100, '120x': 120,
+              '140x': 140, '160x': 160, '200x': 200, '240x': 240, '280x': 280}
+OPA1_GAINS = {'1x': 1, '10x': 10, '20x': 20, '30x': 30, '40x': 40, '50x': 50, '60x': 60, '70x': 70}
+
+
+def gain_enum(gains):
+    """增益表（名称 -> 倍数）转换为解码用的枚举表（发送的字节 -> 名称）"""
+    return {min(value, 255): name for name, value in gains.items()}
+
+
+CURRENT_OPA = Protocol('电流/OPA', [
+    field('电流', 1, 'B', scale=5, bias=5, unit='mA'),
+    field('opa0', 2, 'B', enum=gain_enum(OPA0_GAINS)),
+    field('opa1', 3, 'B', enum=gain_enum(OPA1_GAINS)),
+], header=b'\xaa')
+
+# GUI中可选的协议
+PROTOCOLS = {CURRENT_OPA.name: CURRENT_OPA}
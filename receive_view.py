@@ -0,0 +1,358 @@
+# 接收数据的虚拟化显示：模型只在视图需要时格式化可见行
+import time
+from collections import OrderedDict
+from threading import Lock
+from PyQt5.QtWidgets import QListView, QAbstractItemView, QApplication
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QVariant, QThread, pyqtSignal
+from PyQt5.QtGui import QKeySequence, QBrush, QColor
+import data_format
+from metrics import Timing
+
+
+class FormatCache:
+    """按显示模式分块缓存已格式化的行（LRU淘汰）
+
+    键为(显示模式, 块号)，块号按数据包绝对序号计算，淘汰旧数据包不影响已缓存的块。
+    切换回之前用过的显示模式时可直接命中缓存。GUI线程和后台格式化线程共用，需加锁。
+    """
+
+    CHUNK_ROWS = 256  # 每块的行数
+
+    def __init__(self, max_chunks=1024):
+        self.max_chunks = max_chunks
+        self._chunks = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            lines = self._chunks.get(key)
+            if lines is not None:
+                self._chunks.move_to_end(key)
+            return lines
+
+    def put(self, key, lines):
+        with self._lock:
+            self._chunks[key] = lines
+            self._chunks.move_to_end(key)
+            while len(self._chunks) > self.max_chunks:
+                self._chunks.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._chunks
+
+    def clear(self):
+        with self._lock:
+            self._chunks.clear()
+
+
+# 搜索命中行的背景色
+HIGHLIGHT_BRUSH = QBrush(QColor(255, 236, 140))
+
+
+class ReceiveModel(QAbstractListModel):
+    """接收数据包列表模型：每行一个数据包，HEX/文本/时间戳列按需计算"""
+
+    HexRole = Qt.UserRole + 1
+    TextRole = Qt.UserRole + 2
+    TimestampRole = Qt.UserRole + 3
+
+    def __init__(self, packets, clock, parent=None):
+        super().__init__(parent)
+        self._packets = packets  # 数据包存储（PacketStore）
+        self._clock = clock  # 会话时钟，用于格式化时间戳
+        self._count = 0  # 视图已知的行数
+        self._evicted = self._rows().evicted  # 视图已知的被淘汰行数
+        self.hex_mode = True
+        self.show_timestamp = True
+        self.cache = FormatCache()  # 各显示模式的分块格式缓存
+        self.highlight = None  # 搜索结果（packet_search.PacketSearch），命中的行高亮显示
+        self.format_timing = Timing()  # GUI线程中格式化块的耗时
+
+    def set_packets(self, packets):
+        """替换数据包存储并重置模型"""
+        self.beginResetModel()
+        self._packets = packets
+        rows = self._rows()
+        self._count = len(rows)
+        self._evicted = rows.evicted
+        self.cache.clear()
+        self.endResetModel()
+
+    def _rows(self):
+        """行的来源（提供evicted和len()），默认每个数据包一行"""
+        return self._packets
+
+    def seq_at(self, row):
+        """第row行对应的数据包绝对序号"""
+        return self._evicted + row
+
+    def set_highlight(self, search):
+        """设置（或以None取消）高亮的搜索结果，重新绘制可见行"""
+        self.highlight = search
+        if self._count:
+            self.dataChanged.emit(self.index(0), self.index(self._count - 1), [Qt.BackgroundRole])
+
+    @property
+    def mode(self):
+        """当前显示模式(hex_mode, show_timestamp)"""
+        return (self.hex_mode, self.show_timestamp)
+
+    @property
+    def packets(self):
+        return self._packets
+
+    @property
+    def clock(self):
+        return self._clock
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._count
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        row = index.row()
+        if role == Qt.DisplayRole or role == Qt.ToolTipRole:
+            return self.display_text(row)
+        if role == Qt.BackgroundRole:
+            if self.highlight is not None and self.seq_at(row) in self.highlight:
+                return HIGHLIGHT_BRUSH
+            return QVariant()
+        if role in (self.HexRole, self.TextRole, self.TimestampRole):
+            packet = self._packet_at(row)
+            if packet is None:
+                return QVariant()
+            if role == self.HexRole:
+                return data_format.hex_spaced(packet.data)
+            if role == self.TextRole:
+                return data_format.display_text(packet.data)
+            return self._clock.format(packet.first_ns)
+        return QVariant()
+
+    def _packet_at(self, row):
+        """行对应的数据包；存储已淘汰、模型尚未同步删除的行返回None（负下标会取到存储末尾的数据包）"""
+        index = self.seq_at(row) - self._packets.evicted
+        return self._packets[index] if index >= 0 else None
+
+    def display_text(self, row):
+        """按当前显示模式取一行文本，未缓存时格式化整块"""
+        seq = self.seq_at(row)
+        chunk, offset = divmod(seq, FormatCache.CHUNK_ROWS)
+        key = (self.mode, chunk)
+        lines = self.cache.get(key)
+        if lines is None or offset >= len(lines) or lines[offset] is None:
+            start_ns = time.perf_counter_ns()
+            lines = format_chunk(self._packets, self._clock, self.mode, chunk)
+            self.cache.put(key, lines)
+            self.format_timing.add(time.perf_counter_ns() - start_ns)
+        return lines[offset]
+
+    def set_display_options(self, hex_mode, show_timestamp):
+        """切换显示模式，返回模式是否改变
+
+        不清空缓存：各模式的块分别缓存，切换回来时直接命中。视图只会重新获取可见行。
+        """
+        if hex_mode == self.hex_mode and show_timestamp == self.show_timestamp:
+            return False
+        self.hex_mode = hex_mode
+        self.show_timestamp = show_timestamp
+        if self._count:
+            self.dataChanged.emit(self.index(0), self.index(self._count - 1))
+        return True
+
+    def sync(self):
+        """把数据包存储中淘汰和新增的数据包通知给视图，返回新增行数"""
+        rows = self._rows()
+        evicted = rows.evicted
+        if evicted < self._evicted:
+            # 存储被清空
+            self.set_packets(self._packets)
+            return self._count
+        if evicted > self._evicted:
+            # 最旧的数据包已被淘汰，从视图顶部移除对应的行
+            removed = min(evicted - self._evicted, self._count)
+            if removed:
+                self.beginRemoveRows(QModelIndex(), 0, removed - 1)
+                self._count -= removed
+                self._evicted = evicted
+                self.endRemoveRows()
+            self._evicted = evicted
+        total = len(rows)
+        if total < self._count:
+            self.set_packets(self._packets)
+            return self._count
+        if total == self._count:
+            return 0
+        added = total - self._count
+        self.beginInsertRows(QModelIndex(), self._count, total - 1)
+        self._count = total
+        self.endInsertRows()
+        return added
+
+
+class FilteredModel(ReceiveModel):
+    """只显示搜索命中的数据包：第row行为第row个命中，与完整视图的模型共用格式缓存
+
+    搜索结果更新（PacketSearch.update()）后调用sync()通知视图。
+    """
+
+    def __init__(self, source, search, parent=None):
+        self.search = search
+        super().__init__(source.packets, source.clock, parent)
+        self.cache = source.cache
+        self.format_timing = source.format_timing
+        self.hex_mode, self.show_timestamp = source.mode
+
+    def _rows(self):
+        return self.search
+
+    def seq_at(self, row):
+        return self.search.seq_at(self._evicted + row - self.search.evicted)
+
+
+def format_chunk(packets, clock, mode, chunk):
+    """格式化一个块中仍保留的数据包（整块批量格式化），块内已淘汰的位置填None"""
+    hex_mode, show_timestamp = mode
+    base = chunk * FormatCache.CHUNK_ROWS
+    block = packets.read_block(base, base + FormatCache.CHUNK_ROWS)
+    data_mode = data_format.HEX_MODE if hex_mode else data_format.TEXT_MODE
+    rows = data_format.format_block(block, data_mode, clock if show_timestamp else None)
+    return [None] * (block.start - base) + rows
+
+
+class FormatWorker(QThread):
+    """后台格式化线程：切换显示模式后，从可见区域开始向两侧预先格式化各块"""
+
+    progress = pyqtSignal(int, int)  # (已完成块数, 总块数)
+
+    def __init__(self, model, center_row, parent=None):
+        super().__init__(parent)
+        self._packets = model.packets
+        self._clock = model.clock
+        self._cache = model.cache
+        self._mode = model.mode
+        self._cancelled = False
+        self._chunks = self._plan(model, center_row)
+
+    def _plan(self, model, center_row):
+        """确定预格式化的块顺序：从可见块开始交替向两侧扩展
+
+        每种模式最多预格式化缓存容量的1/4，四种显示模式可同时留在缓存中。
+        """
+        rows = FormatCache.CHUNK_ROWS
+        first = self._packets.evicted // rows
+        last = (self._packets.evicted + len(self._packets) - 1) // rows
+        center = (self._packets.evicted + max(center_row, 0)) // rows
+        limit = self._cache.max_chunks // 4
+        order = [center]
+        step = 1
+        while len(order) < limit and (center - step >= first or center + step <= last):
+            if center + step <= last:
+                order.append(center + step)
+            if center - step >= first:
+                order.append(center - step)
+            step += 1
+        return [chunk for chunk in order[:limit] if first <= chunk <= last]
+
+    def cancel(self):
+        """取消格式化（显示模式再次切换时）"""
+        self._cancelled = True
+
+    def run(self):
+        total = len(self._chunks)
+        for done, chunk in enumerate(self._chunks, 1):
+            if self._cancelled:
+                return
+            key = (self._mode, chunk)
+            # 命中时get()同时刷新LRU顺序，避免本模式的块被本轮写入挤出
+            if self._cache.get(key) is None:
+                self._cache.put(key, format_chunk(self._packets, self._clock, self._mode, chunk))
+            if done % 16 == 0 or done == total:
+                self.progress.emit(done, total)
+
+
+class ReceiveView(QListView):
+    """接收数据视图：统一行高时只布局和绘制可见行
+
+    默认不换行，统一行高、长行末尾省略显示。换行时每次插入行都要按全部文本重新计算行高，
+    开销与总数据量成正比，因此保留的数据超过行数或数据量上限后退化为统一行高。
+    """
+
+    # 超过该行数时自动换行退化为统一行高
+    WRAP_ROW_LIMIT = 100000
+    # 默认的数据量上限（4KB的数据包几百个就会让每次刷新耗时上百毫秒）
+    WRAP_BYTE_LIMIT = 64 * 1024
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(1000)
+        self._wrap = False
+        self.wrap_byte_limit = self.WRAP_BYTE_LIMIT  # 保留的数据超过该字节数时也退化为统一行高，0为不限
+        self.set_wrap(False)
+        self.paint_timing = Timing()  # 每次绘制的耗时
+
+    def paintEvent(self, event):
+        start_ns = time.perf_counter_ns()
+        super().paintEvent(event)
+        self.paint_timing.add(time.perf_counter_ns() - start_ns)
+
+    def set_wrap(self, wrap):
+        """设置自动换行"""
+        self._wrap = wrap
+        self._apply_wrap()
+
+    def set_wrap_byte_limit(self, limit):
+        """设置自动换行的数据量上限（字节，0为不限）"""
+        self.wrap_byte_limit = limit
+        self._apply_wrap()
+
+    def _apply_wrap(self):
+        """根据行数决定是否能真正换行"""
+        wrap = self._wrap and not self._wrap_limit_exceeded()
+        if wrap != self.wordWrap() or self.uniformItemSizes() == wrap:
+            self.setWordWrap(wrap)
+            self.setUniformItemSizes(not wrap)
+            self.setTextElideMode(Qt.ElideNone if wrap else Qt.ElideRight)
+
+    def _wrap_limit_exceeded(self):
+        model = self.model()
+        if model is None:
+            return False
+        if model.rowCount() > self.WRAP_ROW_LIMIT:
+            return True
+        return 0 < self.wrap_byte_limit < model.packets.total_bytes
+
+    def reset(self):
+        # 模型重置（如清空数据）后重新判断能否换行
+        super().reset()
+        self._apply_wrap()
+
+    def rowsInserted(self, parent, start, end):
+        if self._wrap and self.wordWrap() and self._wrap_limit_exceeded():
+            self._apply_wrap()
+        super().rowsInserted(parent, start, end)
+
+    def is_at_bottom(self):
+        """滚动条是否位于底部"""
+        scrollbar = self.verticalScrollBar()
+        return scrollbar.value() >= scrollbar.maximum() - 2
+
+    def copy_selection(self):
+        """复制选中行的显示文本"""
+        rows = sorted(index.row() for index in self.selectedIndexes())
+        model = self.model()
+        lines = [model.data(model.index(row), Qt.DisplayRole) for row in rows]
+        QApplication.clipboard().setText('\n'.join(lines))
+
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.Copy):
+            self.copy_selection()
+            return
+        super().keyPressEvent(event)
@@ -0,0 +1,343 @@
+# 抓包回放：把DataLogger记录的会话文件按原始时间（或倍速/最快）重新送入SerialComm的读取流程
+#
+# ReplayPort模拟serial.Serial的读取接口，数据通过一对socket送出：后台线程按记录时间写入，
+# SerialComm的读取线程照常select/read，分包、缓冲区、显示和记录路径与真实串口完全相同。
+# 使用socketpair而不是管道，Windows的select()只支持socket；Windows上不提供fileno()，
+# SerialCore按无文件描述符的端口使用自己的读取线程和读超时。
+# 在SerialComm.open_port中以'replay://<文件或会话目录>'作为串口名打开。
+import os
+import time
+import select
+import socket
+import threading
+from datetime import datetime
+from capture_file import CaptureReader, DIR_RX
+
+try:
+    import fcntl
+    import termios
+except ImportError:  # Windows
+    fcntl = termios = None
+
+URL_PREFIX = 'replay://'
+
+# 会话目录中按优先级查找的文件
+SESSION_FILES = ('session.scap', 'rx.bin', 'rx_hex.txt')
+
+RAW_CHUNK = 4096  # 原始二进制文件每次送出的字节数
+
+
+class CaptureSource:
+    """抓包文件（.scap）：只回放接收方向的记录（发送方向的记录数据为None），保留原始包间隔"""
+
+    def __init__(self, path):
+        self.reader = CaptureReader(path)
+        self.count = len(self.reader)
+        self.origin_ns = self.reader[0][1].first_ns if self.count else 0
+
+    def events(self, index):
+        """从第index个记录开始产生(相对时间ns, 数据)"""
+        if index >= self.count:
+            return
+        for direction, packet in self.reader.seek_packet(index):
+            yield packet.first_ns - self.origin_ns, packet.data if direction == DIR_RX else None
+
+    def index_at(self, offset_ns):
+        """相对时间offset_ns处的记录号"""
+        return self.reader.seek_time(self.origin_ns + offset_ns)[0]
+
+    def close(self):
+        self.reader.close()
+
+
+class RawSource:
+    """原始二进制文件（rx.bin等）：没有时间信息，按波特率计算的线速率分块送出"""
+
+    def __init__(self, path, baudrate):
+        self.file = open(path, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.count = (self.size + RAW_CHUNK - 1) // RAW_CHUNK
+        # 每字节10位（起始位 + 8数据位 + 停止位）
+        self.ns_per_byte = 10 * 1_000_000_000 // max(baudrate, 1)
+
+    def events(self, index):
+        self.file.seek(index * RAW_CHUNK)
+        offset = index * RAW_CHUNK
+        while True:
+            data = self.file.read(RAW_CHUNK)
+            if not data:
+                return
+            yield offset * self.ns_per_byte, data
+            offset += len(data)
+
+    def index_at(self, offset_ns):
+        return min(offset_ns // self.ns_per_byte // RAW_CHUNK, self.count)
+
+    def close(self):
+        self.file.close()
+
+
+class HexTextSource:
+    """十六进制文本记录（每行'[时间戳] 十六进制'）：按行首时间戳回放"""
+
+    def __init__(self, path):
+        self.packets = []  # [(相对时间ns, 数据), ...]
+        origin = None
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if not line.startswith('[') or ']' not in line:
+                    continue
+                stamp, _, hex_part = line[1:].partition(']')
+                try:
+                    data = bytes.fromhex(hex_part.strip())
+                    when = datetime.fromisoformat(stamp.strip())
+                except ValueError:
+                    continue
+                ns = int(when.timestamp() * 1e9)
+                if origin is None:
+                    origin = ns
+                self.packets.append((max(ns - origin, 0), data))
+        self.count = len(self.packets)
+
+    def events(self, index):
+        for i in range(index, self.count):
+            yield self.packets[i]
+
+    def index_at(self, offset_ns):
+        for i, (ns, _) in enumerate(self.packets):
+            if ns >= offset_ns:
+                return i
+        return self.count
+
+    def close(self):
+        self.packets = []
+
+
+def open_source(path, baudrate=115200):
+    """按文件类型打开回放数据源，path可以是会话目录"""
+    if os.path.isdir(path):
+        for name in SESSION_FILES:
+            candidate = os.path.join(path, name)
+            if os.path.exists(candidate):
+                path = candidate
+                break
+        else:
+            raise ValueError(f"会话目录中没有可回放的文件: {path}")
+    if path.endswith('.scap'):
+        return CaptureSource(path)
+    if path.endswith('_hex.txt'):
+        # hex记录（rx_hex.txt）和逐条记录的'<时间>_hex.txt'
+        return HexTextSource(path)
+    if path.endswith('.txt'):
+        raise ValueError(f"不支持回放文本记录（只能回放capture、raw和hex记录）: {path}")
+    return RawSource(path, baudrate)
+
+
+class ReplayPort:
+    """回放串口：提供SerialComm读取线程用到的serial.Serial接口
+
+    speed为回放倍速，0表示不等待、尽快送出（受socket缓冲区和读取速度限制，可作为GUI压力测试的负载源）。
+    min_gap为相邻数据包之间的最小间隔（秒），倍速较高或最快回放时用它保持分包边界
+    （应大于SerialComm的分包超时）。
+    写入的数据被丢弃。
+    """
+
+    # SerialCore的select循环和hub需要文件描述符，Windows上select()不接受socket以外的描述符，
+    # 与串口的唤醒管道混用会出错，因此只在POSIX上提供fileno()
+    HAS_FILENO = os.name != 'nt'
+
+    def __init__(self, path, baudrate=115200, timeout=1, speed=1.0, min_gap=0.0, loop=False):
+        self.path = path
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.source = open_source(path, baudrate)
+        self.min_gap_ns = int(min_gap * 1e9)
+        self.loop = loop  # 回放结束后从头开始
+        self.is_open = True
+        self.finished = False  # 是否已回放到结尾
+        self.position = 0  # 下一个要送出的记录号
+        self._speed = speed
+        self._paused = False
+        self._seek_to = None
+        self._last_write_ns = None  # 上一次送出数据的时间（跳转后仍保证最小包间隔）
+        self._cond = threading.Condition()
+        self._reader, self._writer = socket.socketpair()
+        self._reader.setblocking(False)
+        # cancel_read()唤醒阻塞在read()中的读取线程（无文件描述符时SerialCore用它唤醒）
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._thread = threading.Thread(target=self._run, name='ReplayPort', daemon=True)
+        self._thread.start()
+
+    # serial.Serial接口
+
+    def fileno(self):
+        if not self.HAS_FILENO:
+            raise NotImplementedError("Windows上回放串口不提供文件描述符")
+        return self._reader.fileno()
+
+    @property
+    def in_waiting(self):
+        if fcntl is not None:
+            buf = bytearray(4)
+            fcntl.ioctl(self._reader.fileno(), termios.FIONREAD, buf)
+            return int.from_bytes(buf, 'little')
+        # Windows：没有FIONREAD，非阻塞地预读已到达的数据
+        try:
+            return len(self._reader.recv(RAW_CHUNK, socket.MSG_PEEK))
+        except (BlockingIOError, InterruptedError):
+            return 0
+
+    def read(self, size=1):
+        """读取最多size字节，无数据时最多等待timeout秒（cancel_read()可提前结束等待）"""
+        readable, _, _ = select.select([self._reader, self._wake_r], [], [], self.timeout)
+        if self._wake_r in readable:
+            try:
+                self._wake_r.recv(64)
+            except (BlockingIOError, InterruptedError):
+                pass
+        if self._reader not in readable:
+            return b''
+        try:
+            return self._reader.recv(size)
+        except (BlockingIOError, InterruptedError):
+            return b''
+
+    def write(self, data):
+        return len(data)
+
+    def cancel_read(self):
+        try:
+            self._wake_w.send(b'\0')
+        except OSError:
+            pass
+
+    def close(self):
+        if not self.is_open:
+            return
+        self.is_open = False
+        with self._cond:
+            self._cond.notify_all()
+        # 关闭读端后阻塞在发送上的回放线程会收到连接错误（OSError）退出
+        try:
+            self._reader.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._reader.close()
+        self._thread.join(timeout=1.0)
+        for sock in (self._writer, self._wake_r, self._wake_w):
+            sock.close()
+        self.source.close()
+
+    # 回放控制
+
+    @property
+    def total(self):
+        """记录总数（原始二进制文件为数据块数）"""
+        return self.source.count
+
+    @property
+    def speed(self):
+        return self._speed
+
+    @property
+    def paused(self):
+        return self._paused
+
+    def set_speed(self, speed):
+        """设置回放倍速（0为最快）"""
+        with self._cond:
+            self._speed = speed
+            if self._seek_to is None:
+                self._seek_to = self.position  # 从当前位置按新倍速重新计时
+            self._cond.notify_all()
+
+    def pause(self):
+        with self._cond:
+            self._paused = True
+            self._cond.notify_all()
+
+    def resume(self):
+        with self._cond:
+            self._paused = False
+            if self._seek_to is None:
+                self._seek_to = self.position
+            self._cond.notify_all()
+
+    def seek(self, index):
+        """跳到第index个记录"""
+        with self._cond:
+            self._seek_to = max(0, min(index, self.total))
+            self.finished = False
+            self._cond.notify_all()
+
+    def seek_time(self, seconds):
+        """跳到距回放开始seconds秒处"""
+        self.seek(self.source.index_at(int(seconds * 1e9)))
+
+    def _run(self):
+        """回放线程：按记录时间把数据写入socket"""
+        start = 0
+        try:
+            while self.is_open:
+                self._play_from(start)
+                with self._cond:
+                    if self._seek_to is None and self.is_open:
+                        if self.loop:
+                            self._seek_to = 0
+                        else:
+                            self.finished = True
+                            while self._seek_to is None and self.is_open:
+                                self._cond.wait()
+                    start = self._seek_to if self._seek_to is not None else 0
+                    self._seek_to = None
+        except OSError:
+            pass  # 端口已关闭
+
+    def _play_from(self, index):
+        """从第index个记录开始回放，被seek/变速打断或回放结束时返回"""
+        self.position = index
+        base_ns = None  # 第一个送出记录的相对时间
+        start_ns = time.monotonic_ns()
+        last_due = self._last_write_ns  # 上一个记录的送出时间
+        for offset_ns, data in self.source.events(index):
+            if data is None:
+                self.position += 1
+                continue
+            if base_ns is None:
+                base_ns = offset_ns
+            with self._cond:
+                while self._paused and self.is_open and self._seek_to is None:
+                    self._cond.wait()
+                if not self.is_open or self._seek_to is not None:
+                    return
+                # 按倍速换算送出时间，并保证最小包间隔
+                speed = self._speed
+                due = start_ns + int((offset_ns - base_ns) / speed) if speed > 0 else start_ns
+                if last_due is not None:
+                    due = max(due, last_due + self.min_gap_ns)
+                last_due = due
+                wait = (due - time.monotonic_ns()) / 1e9
+                if wait > 0 and self._cond.wait(wait):
+                    # 等待期间被暂停/跳转/变速打断，从当前位置重新计时
+                    if self.is_open and self._seek_to is None:
+                        self._seek_to = self.position
+                    return
+            self._writer.sendall(data)
+            self._last_write_ns = time.monotonic_ns()
+            self.position += 1
+
+
+def parse_url(url):
+    """解析'replay://<路径>?speed=2&min_gap=0.02&loop=1'，返回(路径, 参数字典)"""
+    rest = url[len(URL_PREFIX):]
+    path, _, query = rest.partition('?')
+    options = {}
+    for item in filter(None, query.split('&')):
+        key, _, value = item.partition('=')
+        if key in ('speed', 'min_gap'):
+            options[key] = float(value)
+        elif key == 'loop':
+            options[key] = value not in ('0', 'false', '')
+    return path, options
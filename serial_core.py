@@ -0,0 +1,569 @@
+# 串口读取核心：打开串口、事件驱动读取线程、按分包超时分包并写入接收缓冲区
+# 不依赖PyQt5，供命令行抓包等无界面场景直接使用；GUI使用的SerialComm在此基础上添加Qt信号
+import serial
+import serial.tools.list_ports
+import time
+import os
+import select
+import logging
+from threading import Thread, Event, current_thread
+from packet_buffer import PacketAccumulator, PacketRing, Packet
+from timebase import SessionClock
+from tx_writer import TxWriter
+import replay
+from diag_log import get_logger, HexPreview
+
+log = get_logger('core')
+rx_log = get_logger('rx')  # 逐包日志（DEBUG级别，默认关闭）
+tx_log = get_logger('tx')
+
+
+def create_port(port, baudrate=9600, bytesize=8, parity='N', stopbits=1, timeout=1):
+    """按串口名创建端口对象：'replay://'回放、pyserial URL或普通串口"""
+    if port.startswith(replay.URL_PREFIX):
+        path, options = replay.parse_url(port)
+        return replay.ReplayPort(path, baudrate=baudrate, timeout=timeout, **options)
+    if '://' in port:
+        return serial.serial_for_url(
+            port,
+            baudrate=baudrate,
+            bytesize=bytesize,
+            parity=parity,
+            stopbits=stopbits,
+            timeout=timeout
+        )
+    return serial.Serial(
+        port=port,
+        baudrate=baudrate,
+        bytesize=bytesize,
+        parity=parity,
+        stopbits=stopbits,
+        timeout=timeout
+    )
+
+
+def encode_payload(data, is_hex=False):
+    """把要发送的文本转换为字节：十六进制字符串（可含空格）或utf-8文本"""
+    if is_hex:
+        # 将十六进制字符串转换为字节
+        return bytes.fromhex(data.replace(" ", ""))
+    # 将字符串转换为字节
+    return data.encode('utf-8')
+
+
+class SerialCore:
+    """串口读取核心
+
+    读取线程把完整的数据包写入rx_ring，并按batch_interval限定频率通知消费者。消费者有两种方式：
+      - 订阅接收端（subscribe，见sinks）：每次通知时读取线程直接把这一批数据包交给各接收端
+      - 从rx_ring读取：用wait_for_packets()等待通知后从自己的RingConsumer读取，按自己的节奏处理
+    发送经发送队列由发送线程（tx_writer.TxWriter）写入，send_data()不会因流控阻塞调用线程。
+    子类（SerialComm）重写_deliver_packet/_notify/_on_sent/_on_send_error/_on_port_lost以发射Qt信号。
+
+    hub为port_hub.PortHub时，提供文件描述符的串口由hub的选择线程读取（多个串口共用一个线程），
+    否则每个串口使用自己的读取线程。
+    """
+
+    def __init__(self, hub=None, **kwargs):
+        super().__init__(**kwargs)
+        self.hub = hub
+        self._on_hub = False  # 当前串口是否由hub读取
+        self.serial_port = None
+        self.port = None  # 打开的串口名（日志使用）
+        self.is_open = False
+        self.read_thread = None
+        self.stop_event = Event()
+        self.callback = None
+        self.read_timeout = 1.0  # 读超时默认1000ms
+        self.packet_timeout = 0.01  # 分包超时默认10ms
+        self.last_receive_time = 0  # 上次接收数据的时间（单调时钟，秒）
+        self._first_rx_ns = 0  # 当前数据包首字节到达时间（单调时钟，纳秒）
+        self._last_rx_ns = 0  # 当前数据包末字节到达时间（单调时钟，纳秒）
+        self.clock = SessionClock()  # 会话时钟，每次打开串口时重新记录墙上时间锚点
+        self._packet = PacketAccumulator()  # 当前正在接收的数据包（预分配缓冲区）
+        self.show_timestamp = False  # 新增：时间戳选项，默认为False
+        self.sent_callback = None  # 数据发送成功后的回调，参数为Packet
+        self.data_ready = Event()  # 有新数据包通知（无界面消费者使用）
+        self.read_mode = 'event'  # 读取方式：'event'事件驱动 / 'poll'轮询
+        self.poll_interval = 0.001  # 轮询方式的休眠间隔
+        self._port_fd = None  # 串口文件描述符（POSIX下用于select）
+        self._wake_r = None  # 唤醒管道读端
+        self._wake_w = None  # 唤醒管道写端
+        self.batch_interval = 0.02  # 批量发射的最小间隔（秒），限制跨线程信号频率
+        self.batch_max_packets = 1000  # 单批最多数据包数，达到后立即发射
+        self._pending_batch = []  # 待交给接收端的数据包批次
+        self._sinks = []  # 订阅的接收端（替换整个列表，读取线程无需加锁）
+        self._unnotified = 0  # 上次通知后新写入的数据包数
+        self._last_flush_time = 0  # 上次批量发射的时间
+        self._notify_pending = False  # 是否有尚未处理的通知
+        # 统计计数（只在读取线程/发送线程中累加，由metrics定期采样）
+        self.tx_packets = 0
+        self.tx_bytes = 0
+        self.tx_errors = 0  # 写入失败次数
+        self.tx_writer = None  # 发送线程（tx_writer.TxWriter），打开串口时创建
+        self.tx_coalesce = False  # 是否合并发送队列中积压的小块数据
+        self.tx_byte_rate = 0  # 发送限速（字节/秒），0为不限
+        self.notifications = 0  # 批量通知次数
+        self.tracer = None  # 延迟追踪（latency.LatencyTracer），为None时不追踪
+        # 读取线程与各消费者之间的有界环形缓冲区
+        self.rx_ring = PacketRing()
+        # 分帧器（framing.Framer），None时按分包超时分包
+        self.framer = None
+    
+    # 添加设置时间戳选项的方法
+    def set_timestamp_enabled(self, enabled):
+        """设置是否启用时间戳显示"""
+        self.show_timestamp = enabled
+    
+    # 辅助方法：生成当前时间戳字符串
+    def _get_current_timestamp(self):
+        """获取当前时间戳字符串"""
+        return self.clock.format(self.clock.now_ns(), ms=True)
+    
+    # 修改open_port方法，重置数据包
+    def open_port(self, port, baudrate=9600, bytesize=8, parity='N', stopbits=1, timeout=1):
+        """打开串口
+
+        port也可以是'replay://<会话文件或目录>?speed=1&min_gap=0&loop=0'（回放记录的会话，
+        见replay.ReplayPort），或pyserial支持的URL（如'loop://'、'socket://host:port'）。
+        """
+        try:
+            self.read_timeout = timeout  # 设置读超时
+            self.serial_port = create_port(port, baudrate, bytesize, parity, stopbits, timeout)
+            self.port = port
+            self.is_open = True
+            self.stop_event.clear()
+            # 每个会话记录一次墙上时间锚点
+            self.clock.reset()
+            # 重置数据包相关变量
+            self._packet.clear()
+            if self.framer is not None:
+                self.framer.reset()
+            self.last_receive_time = 0
+            self._pending_batch = []
+            self._unnotified = 0
+            self._last_flush_time = 0
+            self._notify_pending = False
+            self.rx_ring.reset()
+            self.tx_packets = self.tx_bytes = self.tx_errors = self.notifications = 0
+            self._open_wake_pipe()
+            # block策略会让读取线程等待消费者，共用的选择线程里等待会卡住hub上的所有串口，这类串口使用自己的读取线程
+            self._on_hub = self.hub is not None and self._port_fd is not None and self.read_mode == 'event' \
+                and self.rx_ring.policy != PacketRing.BLOCK
+            if self._on_hub:
+                self.hub.add(self)
+            else:
+                self.start_read_thread()
+            self.tx_writer = TxWriter(self.serial_port, self._on_sent, self._on_send_error,
+                                      coalesce=self.tx_coalesce, byte_rate=self.tx_byte_rate)
+            self.tx_writer.start()
+            log.info("打开串口 %s（%d %d%s%s）", port, baudrate, bytesize, parity, stopbits)
+            return True, "串口打开成功"
+        except Exception as e:
+            log.warning("打开串口 %s 失败: %s", port, e)
+            return False, f"串口打开失败: {str(e)}"
+    
+    # 事件驱动读取：阻塞等待数据到达或分包超时到期，空闲时不占用CPU
+    def _read_data(self):
+        """读取数据的线程函数（事件驱动方式，read_mode为'poll'时退回轮询方式）"""
+        log.debug("数据读取线程已启动")
+        lost = None
+        while not self.stop_event.is_set() and self.is_open:
+            try:
+                if self.read_mode == 'poll':
+                    data = self._poll_for_data()
+                else:
+                    data = self._wait_for_data(self._next_wait_timeout())
+                self._process_input(data, time.monotonic_ns())
+            except Exception as e:
+                log.error("读取数据错误: %s", e)
+                # 串口已关闭，或读取本身出错（设备断开时pyserial抛出SerialException/OSError）
+                if not self.serial_port.is_open or isinstance(e, OSError):
+                    lost = e
+                    break
+                # 避免异常状态下空转
+                time.sleep(self.poll_interval)
+
+        self._finish_reading()
+        if lost is not None:
+            self._on_port_lost(lost)
+        log.debug("数据读取线程已退出")
+
+    def _on_port_lost(self, error):
+        """读取中串口断开（在读取线程或hub选择线程中调用，剩余数据包已通知）：按正常流程关闭串口"""
+        log.warning("串口 %s 已断开，关闭串口: %s", self.port, error)
+        self.close_port()
+
+    def _process_input(self, data, now_ns):
+        """处理一次等待的结果：按分包超时分包，并按限定频率批量通知（读取线程或hub选择线程中调用）"""
+        current_time = now_ns / 1e9
+
+        if self.framer is not None:
+            self._frame_input(data, now_ns, current_time)
+        elif data:
+            # 检查是否需要开始一个新包（基于分包超时）
+            if self.last_receive_time > 0 and \
+               current_time - self.last_receive_time > self.packet_timeout and \
+               self._packet:  # 如果当前已有累积的数据包
+                # 处理之前累积的完整数据包
+                self._emit_packet()
+            # 追加到当前数据包（只复制新数据），记录首字节/末字节到达时间
+            if not self._packet:
+                self._first_rx_ns = now_ns
+            self._packet.append(data)
+            self._last_rx_ns = now_ns
+
+            # 更新最后接收时间
+            self.last_receive_time = current_time
+
+        # 检查当前数据包是否已超过分包超时
+        elif self._packet and \
+             self.last_receive_time > 0 and \
+             current_time - self.last_receive_time >= self.packet_timeout:
+            # 处理超时的完整数据包
+            self._emit_packet()
+
+        # 批量通知已完成的数据包（限定频率）
+        if self._unnotified and \
+           current_time - self._last_flush_time >= self.batch_interval:
+            self._flush_batch(current_time)
+
+    def _frame_input(self, data, now_ns, current_time):
+        """交给分帧器分帧，完整的帧作为数据包发送"""
+        framer = self.framer
+        if self._packet:
+            # 切换到分帧器前按超时分包累积的数据
+            self._emit_packet()
+        if data:
+            for item in framer.feed(data, now_ns):
+                self._publish(item)
+            self.last_receive_time = current_time
+        elif framer.timeout_discard and framer.pending and \
+                current_time - self.last_receive_time >= self.packet_timeout:
+            # 未完成的帧超时，丢弃后从下一个字节重新同步
+            framer.discard()
+
+    def set_framer(self, framer):
+        """设置分帧器（framing.Framer），None恢复按分包超时分包"""
+        self.framer = framer
+        self._wake_reader()
+
+    def get_framing_stats(self):
+        """分帧统计（未设置分帧器时为None）"""
+        framer = self.framer
+        return framer.stats() if framer is not None else None
+
+    def _finish_reading(self):
+        """读取结束（线程退出或从hub注销）时通知剩余的数据包"""
+        if self._unnotified:
+            self._flush_batch(time.monotonic())
+
+    @property
+    def current_packet(self):
+        """当前正在接收的数据包（副本，仅用于查看，可在GUI线程调用）"""
+        return self._packet.snapshot()
+
+    def _emit_packet(self):
+        """发送当前累积的完整数据包，并清空累积缓冲区"""
+        # 数据包结束时只复制一次，生成最终的bytes
+        self._publish(Packet(self._packet.take(), self._first_rx_ns, self._last_rx_ns))
+
+    def _publish(self, item):
+        """把完整的数据包写入接收缓冲区、交给接收端，并按需批量通知"""
+        packet = item.data
+        if rx_log.isEnabledFor(logging.DEBUG):
+            # 时间戳前缀（首字节到达时间）和十六进制预览都在日志线程格式化
+            rx_log.debug("%s接收到数据: %d字节 - %s",
+                         f"{self.clock.format(item.first_ns, ms=True)} " if self.show_timestamp else "",
+                         len(packet), HexPreview(packet))
+        if self.tracer is not None:
+            self.tracer.mark('close', item.first_ns)
+        # 写入接收缓冲区（满时按溢出策略处理）
+        self.rx_ring.put(item, len(packet))
+        self._unnotified += 1
+        if self._sinks:
+            self._pending_batch.append(item)
+        if self._unnotified >= self.batch_max_packets:
+            self._flush_batch(time.monotonic())
+        self._deliver_packet(packet)
+
+    def subscribe(self, sink):
+        """订阅接收端（sinks.PacketSink），之后的每批数据包都会交给它"""
+        self._sinks = self._sinks + [sink]
+        return sink
+
+    def unsubscribe(self, sink):
+        """取消订阅接收端"""
+        self._sinks = [s for s in self._sinks if s is not sink]
+        sink.close()
+
+    def _deliver_packet(self, packet):
+        """逐包交付：调用兼容旧接口的回调函数"""
+        if self.callback:
+            try:
+                self.callback(packet)
+            except Exception:
+                log.exception("回调函数执行错误")
+
+    def _flush_batch(self, current_time):
+        """把待处理的一批数据包交给各接收端，并通知消费者有新数据"""
+        self._last_flush_time = current_time
+        self._unnotified = 0
+        self.notifications += 1
+        if self._pending_batch:
+            batch = self._pending_batch
+            self._pending_batch = []
+            for sink in self._sinks:
+                try:
+                    sink.on_packets(batch)
+                except Exception:
+                    log.exception("接收端处理出错: %s", type(sink).__name__)
+        self._notify()
+
+    def _notify(self):
+        """通知消费者接收缓冲区有新数据（子类重写为发射信号）"""
+        self.data_ready.set()
+
+    def wait_for_packets(self, timeout=None):
+        """等待新数据包通知，返回是否收到通知（无界面消费者使用）"""
+        notified = self.data_ready.wait(timeout)
+        self.data_ready.clear()
+        return notified
+
+    def set_overflow_policy(self, policy):
+        """设置接收缓冲区溢出策略：'drop_oldest'、'drop_newest'或'block'
+
+        hub读取中的串口不能切换为block（会阻塞共用的选择线程），需在打开串口前设置。
+        """
+        if policy == PacketRing.BLOCK and self._on_hub:
+            raise ValueError("由共用读取线程读取的串口不能使用block策略，请在打开串口前设置")
+        self.rx_ring.set_policy(policy)
+
+    def get_buffer_stats(self):
+        """获取接收缓冲区统计信息（积压、丢弃数据包/字节数、高水位）"""
+        return self.rx_ring.stats()
+
+    def register_metrics(self, registry):
+        """把收发计数、接收缓冲区和分帧统计登记到metrics.MetricsRegistry"""
+        ring = self.rx_ring
+        registry.add_rate('rx_bytes', lambda: ring.total_bytes)
+        registry.add_rate('rx_packets', lambda: ring.total_packets)
+        registry.add_rate('tx_bytes', lambda: self.tx_bytes)
+        registry.add_rate('tx_packets', lambda: self.tx_packets)
+        registry.add_rate('tx_writes', lambda: self.tx_writer.writes if self.tx_writer else 0)
+        registry.add_gauge('tx_queued_bytes', lambda: self.tx_writer.queued_bytes if self.tx_writer else 0)
+        registry.add_gauge('tx_dropped', lambda: self.tx_writer.dropped if self.tx_writer else 0)
+        registry.add_gauge('tx_errors', lambda: self.tx_errors)
+        registry.add_rate('notifications', lambda: self.notifications)
+        registry.add_rate('rx_dropped_packets', lambda: ring.dropped_packets)
+        registry.add_gauge('rx_buffer_packets', lambda: len(ring))
+        registry.add_gauge('rx_buffer_bytes', lambda: ring.size_bytes)
+        registry.add_gauge('framing_errors', lambda: self.framer.errors if self.framer else 0)
+
+    def _next_wait_timeout(self):
+        """计算本次等待的超时：取分包截止时间与批量发射截止时间中较早者，都没有时等待读超时"""
+        deadlines = []
+        if self._packet and self.last_receive_time > 0:
+            deadlines.append(self.last_receive_time + self.packet_timeout)
+        framer = self.framer
+        if framer is not None and framer.timeout_discard and framer.pending:
+            deadlines.append(self.last_receive_time + self.packet_timeout)
+        if self._unnotified:
+            deadlines.append(self._last_flush_time + self.batch_interval)
+        if deadlines:
+            return max(0.0, min(deadlines) - time.monotonic())
+        return self.read_timeout
+
+    def _wait_for_data(self, timeout):
+        """阻塞等待数据到达、超时或被close_port唤醒，返回读到的数据（可能为空）"""
+        port = self.serial_port
+        if self._wake_r is not None:
+            # 有文件描述符（POSIX）：用select同时等待串口和唤醒管道
+            readable, _, _ = select.select([self._port_fd, self._wake_r], [], [], timeout)
+            if self._wake_r in readable:
+                os.read(self._wake_r, 64)
+            if self._port_fd not in readable:
+                return b''
+            return port.read(port.in_waiting or 1)
+
+        # 无文件描述符（Windows、loop://等）：借助pyserial的读超时阻塞等待首字节
+        # 有未完成的包时等待时间恰好是分包超时，有待发射批次时不超过批量间隔，
+        # 只在状态切换时重设超时
+        wait = self.packet_timeout if self._packet else self.read_timeout
+        if self._unnotified:
+            wait = min(wait, self.batch_interval)
+        if port.timeout != wait:
+            port.timeout = wait
+        data = port.read(1)
+        if data and port.in_waiting:
+            data += port.read(port.in_waiting)
+        return data
+
+    def _poll_for_data(self):
+        """轮询方式读取数据（旧实现，保留用于对比测试）"""
+        if self.serial_port.in_waiting > 0:
+            # 读取所有可用数据
+            return self.serial_port.read(self.serial_port.in_waiting)
+        # 短暂休眠，减少CPU占用
+        time.sleep(self.poll_interval)
+        return b''
+
+    def set_read_mode(self, mode):
+        """设置读取方式：'event'（事件驱动，默认）或'poll'（1ms轮询）
+
+        由hub读取的串口在下次打开时生效。
+        """
+        if mode not in ('event', 'poll'):
+            raise ValueError(f"不支持的读取方式: {mode}")
+        self.read_mode = mode
+        self._wake_reader()
+
+    def _open_wake_pipe(self):
+        """为select创建唤醒管道（仅在串口提供文件描述符时使用）"""
+        self._close_wake_pipe()
+        try:
+            self._port_fd = self.serial_port.fileno()
+        except (AttributeError, NotImplementedError, OSError):
+            self._port_fd = None
+            return
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+
+    def _close_wake_pipe(self):
+        """关闭唤醒管道"""
+        for fd in (self._wake_r, self._wake_w):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._wake_r = self._wake_w = None
+        self._port_fd = None
+
+    def _wake_reader(self):
+        """唤醒阻塞中的读取线程"""
+        if self._on_hub:
+            self.hub.wake()
+        elif self._wake_w is not None:
+            try:
+                os.write(self._wake_w, b'\0')
+            except OSError:
+                pass
+        elif self.serial_port and self.is_open:
+            try:
+                self.serial_port.cancel_read()
+            except Exception:
+                pass
+
+    # 添加设置超时参数的方法
+    def set_timeouts(self, read_timeout, packet_timeout):
+        """设置读超时和分包超时参数"""
+        self.read_timeout = read_timeout
+        self.packet_timeout = packet_timeout
+        # 如果串口已打开，更新其超时设置
+        if self.serial_port and self.is_open:
+            self.serial_port.timeout = read_timeout
+            # 唤醒读取线程，按新的超时重新计算等待时间
+            self._wake_reader()
+    
+    @property
+    def replay(self):
+        """当前打开的回放端口（不是回放时为None），用于暂停、变速和跳转"""
+        if self.is_open and isinstance(self.serial_port, replay.ReplayPort):
+            return self.serial_port
+        return None
+
+    def get_ports(self):
+        """获取所有可用的串口列表"""
+        ports = []
+        for port in serial.tools.list_ports.comports():
+            ports.append(port.device)
+        return ports
+    
+    def close_port(self):
+        """关闭串口"""
+        if self.is_open and self.serial_port:
+            if self.tx_writer is not None:
+                # 未写入的数据丢弃，流控阻塞中的写入被取消
+                self.tx_writer.stop()
+                self.tx_writer = None
+            self.stop_event.set()
+            # 唤醒可能因block策略阻塞在缓冲区上的读取线程
+            self.rx_ring.close()
+            if self._on_hub:
+                # 选择线程注销该串口并通知剩余数据包后再关闭
+                self.hub.remove(self)
+                self._on_hub = False
+            else:
+                self._wake_reader()
+                # 串口断开时由读取线程自己调用，不等待自身
+                if self.read_thread and self.read_thread is not current_thread():
+                    self.read_thread.join(timeout=1.0)
+            self.serial_port.close()
+            self.is_open = False
+            self._close_wake_pipe()
+            log.info("关闭串口 %s", self.port)
+            return True, "串口关闭成功"
+        return False, "串口未打开"
+    
+    def send_data(self, data, is_hex=False):
+        """发送数据：放入发送队列后立即返回，写入结果由on_sent/_on_send_error通知"""
+        if not self.is_open or not self.serial_port:
+            return False, "串口未打开"
+        
+        try:
+            bytes_data = encode_payload(data, is_hex)
+        except ValueError as e:
+            return False, f"发送失败: {str(e)}"
+        if not self.send_bytes(bytes_data):
+            return False, "发送失败: 发送队列已满"
+        return True, f"已提交发送: {len(bytes_data)}字节"
+
+    def send_bytes(self, data):
+        """把字节数据放入发送队列（任意线程可调用），返回是否成功"""
+        writer = self.tx_writer
+        return writer is not None and writer.submit(data)
+
+    def set_tx_options(self, coalesce=None, byte_rate=None):
+        """设置是否合并小块写入和发送限速（字节/秒，0为不限），立即作用于发送线程"""
+        if coalesce is not None:
+            self.tx_coalesce = coalesce
+        if byte_rate is not None:
+            self.tx_byte_rate = byte_rate
+        writer = self.tx_writer
+        if writer is not None:
+            writer.coalesce = self.tx_coalesce
+            writer.byte_rate = self.tx_byte_rate
+
+    def _on_send_error(self, data, error):
+        """写入失败（在发送线程中调用）"""
+        self.tx_errors += 1
+        log.warning("发送失败（%d字节）: %s", len(data), error)
+    
+    def _on_sent(self, packet):
+        """数据写入完成，通知回调和接收端（在发送线程中调用）"""
+        if tx_log.isEnabledFor(logging.DEBUG):
+            tx_log.debug("发送数据: %d字节 - %s", len(packet.data), HexPreview(packet.data))
+        self.tx_packets += 1
+        self.tx_bytes += len(packet.data)
+        if self.sent_callback:
+            try:
+                self.sent_callback(packet)
+            except Exception:
+                log.exception("发送回调函数执行错误")
+        for sink in self._sinks:
+            try:
+                sink.on_sent(packet)
+            except Exception:
+                log.exception("接收端处理出错: %s", type(sink).__name__)
+
+    def start_read_thread(self):
+        """启动读取线程"""
+        self.read_thread = Thread(target=self._read_data)
+        self.read_thread.daemon = True
+        self.read_thread.start()
+    
+    def set_callback(self, callback):
+        """设置数据接收回调函数（保持向后兼容）"""
+        self.callback = callback
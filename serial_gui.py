@@ -1,42 +1,70 @@
 # 修复serial_gui.py文件，清理混乱的代码结构和注释
 import sys
 import time
-import binascii
 import os
 from datetime import datetime
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                             QLabel, QComboBox, QPushButton, QTextEdit, QLineEdit, QGroupBox,
-                            QCheckBox, QGridLayout, QFileDialog, QMessageBox, QSpinBox,
-                            QAction, QMenu, QTabWidget)
-from PyQt5.QtCore import Qt, QTimer
+                            QCheckBox, QGridLayout, QFileDialog, QMessageBox, QSpinBox, QDoubleSpinBox,
+                            QAction, QMenu, QTabWidget, QTabBar, QProgressBar, QSplitter)
+from PyQt5.QtCore import Qt, QTimer, QPoint, pyqtSignal
 from PyQt5.QtGui import QFont, QTextCursor, QIcon
 from serial_comm import SerialComm
+from serial_core import encode_payload
+from receive_view import ReceiveModel, FilteredModel, ReceiveView, FormatWorker
+from packet_store import PacketStore
+from packet_buffer import Packet
 from data_logger import DataLogger
+from sinks import RecorderSink
+from port_hub import PortHub
+from packet_merge import PacketMerger
+from merged_view import MergedView
+from decoded_view import DecodedTable
+from plot_view import PlotView
+from metrics_view import MetricsWindow
+import data_format
+import framing
+import protocol
+import packet_search
+import metrics
+from latency import LatencyTracer
+from diag_log import get_logger
+from tx_writer import AutoSender
 
-class SerialGUI(QMainWindow):
-    def __init__(self):
-        super().__init__()
-        self.serial_comm = SerialComm()
+log = get_logger('gui')
+
+class PortPanel(QMainWindow):
+    """单个串口的页面：串口设置、收发、显示和会话记录各自独立（嵌入主窗口的标签页）"""
+
+    # 一批接收的数据包已存入本页的数据包存储（供合并视图使用）
+    packets_stored = pyqtSignal(list)
+
+    def __init__(self, hub=None, parent=None):
+        super().__init__(parent)
+        self.serial_comm = SerialComm(hub=hub)
+        self.port_name = ''  # 当前打开的串口（合并视图中的来源名称）
+        # GUI作为接收缓冲区的一个消费者
+        self.rx_consumer = self.serial_comm.rx_ring.consumer()
+        self._reported_missed_packets = 0
+        self._reported_framing_errors = 0
+        self._decoded_seq = 0  # 下一个待解码数据包的绝对序号
+        self.search = None  # 当前搜索结果（PacketSearch）
+        self.filter_model = None  # 只显示命中数据包的模型
+        self.tracer = None  # 延迟追踪（启用时与串口、记录器共用）
+        self._trace_display = []  # 已取出、等待显示的抽样数据包首字节时间
         self.data_logger = DataLogger()
+        self.record_sink = None  # 会话记录接收端
+        # 接收数据包存储：连续数据区 + 数组列，超出内存上限时淘汰最旧的数据包
+        self.packet_store = PacketStore(max_bytes=256 * 1024 * 1024)
         self.init_ui()
         self.setup_connections()
         self.refresh_ports()
-        self.received_data = b''
         self.current_data_timestamp = None
         self.logging_enabled = False
         self.current_session_dir = None
-        self.last_receive_time = 0
+        self.last_receive_time = 0  # 上一个数据包末字节到达时间（单调时钟，纳秒）
         self.scroll_locked = False  # 初始化滚动锁定状态为未锁定
         
-        # 添加增量更新所需的额外初始化
-        self._last_processed_index = 0  # 跟踪上次处理到的数据索引
-        self._last_line_wrap_mode = None  # 跟踪上次的换行模式设置
-        
-        # 优化初始缓冲区大小，减少动态调整引起的闪烁
-        self.receive_text.setUndoRedoEnabled(False)  # 禁用撤销/重做以提高性能
-
-        # 添加这个新的数据结构初始化
-        self.received_data_with_timestamp = []
         self.send_history = []  # 存储发送历史记录
         self.send_history_max_lines = 100  # 最大历史记录行数
         
@@ -45,16 +73,11 @@ class SerialGUI(QMainWindow):
         self.last_update_time = 0
         self.update_interval = 10  # 最小更新间隔10ms
         self.update_pending = False
-        
-        # 定时刷新串口列表
-        self.port_timer = QTimer()
-        self.port_timer.timeout.connect(self.refresh_ports)
-        self.port_timer.start(3000)  # 每3秒刷新一次
 
     def init_ui(self):
         """初始化UI界面"""
-        self.setWindowTitle('串口通信工具')
-        self.setGeometry(100, 100, 800, 600)
+        # 标题作为标签页名称，打开串口后显示串口名
+        self.setWindowTitle('未连接')
         
         # 创建中央部件
         central_widget = QWidget()
@@ -105,6 +128,9 @@ class SerialGUI(QMainWindow):
         port_layout.addWidget(self.refresh_btn, 5, 0)
         self.open_btn = QPushButton('打开串口')
         port_layout.addWidget(self.open_btn, 5, 1)
+        # 回放记录的会话（按串口方式打开，数据走相同的接收流程）
+        self.replay_btn = QPushButton('回放会话')
+        port_layout.addWidget(self.replay_btn, 6, 0, 1, 2)
         
         port_group.setLayout(port_layout)
         control_layout.addWidget(port_group)
@@ -123,15 +149,13 @@ class SerialGUI(QMainWindow):
         # opa0设置下拉菜单
         current_layout.addWidget(QLabel('opa0设置:'), 1, 0)
         self.opa0_combo = QComboBox()
-        opa0_values = ['1x', '20x', '40x', '60x', '80x', '100x', '120x', '140x', '160x', '200x', '240x', '280x']
-        self.opa0_combo.addItems(opa0_values)
+        self.opa0_combo.addItems(list(protocol.OPA0_GAINS))
         current_layout.addWidget(self.opa0_combo, 1, 1)
         
         # opa1设置下拉菜单
         current_layout.addWidget(QLabel('opa1设置:'), 2, 0)
         self.opa1_combo = QComboBox()
-        opa1_values = ['1x', '10x', '20x', '30x', '40x', '50x', '60x', '70x']
-        self.opa1_combo.addItems(opa1_values)
+        self.opa1_combo.addItems(list(protocol.OPA1_GAINS))
         current_layout.addWidget(self.opa1_combo, 2, 1)
         
         # 添加设置按钮
@@ -166,8 +190,10 @@ class SerialGUI(QMainWindow):
         self.auto_send_check = QCheckBox('自动发送')
         send_options.addWidget(self.auto_send_check)
         send_options.addWidget(QLabel('间隔(ms):'))
-        self.send_interval = QSpinBox()
-        self.send_interval.setRange(10, 10000)
+        # 自动发送由独立的调度线程按绝对截止时间发送，支持10ms以下的间隔
+        self.send_interval = QDoubleSpinBox()
+        self.send_interval.setDecimals(1)
+        self.send_interval.setRange(1, 10000)
         self.send_interval.setValue(1000)
         send_options.addWidget(self.send_interval)
         
@@ -180,6 +206,23 @@ class SerialGUI(QMainWindow):
         
         send_layout.addLayout(send_options)
         
+        # 发送线程选项：合并积压的小块写入、按字节速率限速；自动发送的实际周期和抖动
+        tx_options = QHBoxLayout()
+        self.tx_coalesce_check = QCheckBox('合并写入')
+        self.tx_coalesce_check.setToolTip('发送队列积压时把多个小块合并为一次写入')
+        tx_options.addWidget(self.tx_coalesce_check)
+        tx_options.addWidget(QLabel('限速:'))
+        self.tx_rate_spin = QSpinBox()
+        self.tx_rate_spin.setRange(0, 10000000)
+        self.tx_rate_spin.setSingleStep(1000)
+        self.tx_rate_spin.setSuffix(' B/s')
+        self.tx_rate_spin.setSpecialValueText('不限')
+        tx_options.addWidget(self.tx_rate_spin)
+        self.auto_send_label = QLabel()
+        tx_options.addWidget(self.auto_send_label)
+        tx_options.addStretch()
+        send_layout.addLayout(tx_options)
+        
         # 添加发送历史显示区域
         send_layout.addWidget(QLabel('发送历史:'))
         self.send_history_text = QTextEdit()
@@ -197,10 +240,25 @@ class SerialGUI(QMainWindow):
         receive_group = QGroupBox('接收数据')
         receive_layout = QVBoxLayout()
         
-        self.receive_text = QTextEdit()
-        self.receive_text.setReadOnly(True)
-        self.receive_text.setLineWrapMode(QTextEdit.WidgetWidth)  # 自动换行到窗口宽度
-        receive_layout.addWidget(self.receive_text)
+        # 虚拟化接收视图：每行一个数据包，只格式化可见行
+        self.receive_model = ReceiveModel(self.packet_store, self.serial_comm.clock)
+        self.receive_view = ReceiveView()
+        self.receive_view.setModel(self.receive_model)
+        # 协议解码表（启用协议解码时显示在接收视图右侧）
+        self.decoded_table = DecodedTable()
+        self.decoded_table.hide()
+        receive_splitter = QSplitter(Qt.Horizontal)
+        receive_splitter.addWidget(self.receive_view)
+        receive_splitter.addWidget(self.decoded_table)
+        receive_splitter.setStretchFactor(0, 3)
+        receive_splitter.setStretchFactor(1, 1)
+        # 解码字段的实时曲线（启用绘图时显示在接收视图下方）
+        self.plot_view = PlotView(self.serial_comm.clock)
+        self.plot_view.hide()
+        plot_splitter = QSplitter(Qt.Vertical)
+        plot_splitter.addWidget(receive_splitter)
+        plot_splitter.addWidget(self.plot_view)
+        receive_layout.addWidget(plot_splitter)
         
         # 接收选项
         receive_options = QHBoxLayout()
@@ -213,8 +271,13 @@ class SerialGUI(QMainWindow):
         
         # 添加自动换行复选框
         self.auto_line_check = QCheckBox('自动换行')
-        self.auto_line_check.setChecked(True)  # 默认启用自动换行
+        self.auto_line_check.setToolTip('逐行计算行高，数据量大时刷新较慢；不换行时长行末尾省略显示，复制可得到完整内容')
         receive_options.addWidget(self.auto_line_check)
+        self.wrap_limit_check = QCheckBox('数据量大时不换行')
+        self.wrap_limit_check.setChecked(True)
+        self.wrap_limit_check.setToolTip(f'接收数据超过{ReceiveView.WRAP_BYTE_LIMIT // 1024}KB后按统一行高显示（截断长行），'
+                                         '避免换行时每次刷新重新计算全部行高')
+        receive_options.addWidget(self.wrap_limit_check)
         
         # 修改显示时间戳复选框，设置默认选中
         self.show_timestamp_check = QCheckBox('显示时间戳')
@@ -241,6 +304,19 @@ class SerialGUI(QMainWindow):
         self.packet_timeout_spin.setValue(10)  # 默认10ms
         receive_options.addWidget(self.packet_timeout_spin)
         
+        # 分帧方式：超时分包或按协议结构分帧（可编辑，格式见framing模块）
+        receive_options.addWidget(QLabel('分帧:'))
+        self.framing_combo = QComboBox()
+        self.framing_combo.setEditable(True)
+        self.framing_combo.addItems(['gap', 'delimiter:0d0a', 'delimiter:0a', 'fixed:aa,4',
+                                     'length:aa,1,1,0', 'slip', 'cobs'])
+        self.framing_combo.setToolTip('gap: 超时分包\ndelimiter:分隔符hex\nfixed:帧头hex,帧长\n'
+                                      'length:帧头hex,长度偏移,长度字节数[,附加长度[,big]]\nslip / cobs')
+        receive_options.addWidget(self.framing_combo)
+        self.frame_discard_check = QCheckBox('超时丢弃半帧')
+        self.frame_discard_check.setToolTip('未完成的帧在分包超时内没有新数据时丢弃并计为分帧错误')
+        receive_options.addWidget(self.frame_discard_check)
+        
         # 应用超时设置按钮
         self.apply_timeout_btn = QPushButton('应用超时设置')
         receive_options.addWidget(self.apply_timeout_btn)
@@ -252,55 +328,223 @@ class SerialGUI(QMainWindow):
         self.save_btn = QPushButton('保存')
         receive_options.addWidget(self.save_btn)
         
+        # 会话记录：串口打开期间把接收数据流式写入会话目录
+        self.record_check = QCheckBox('记录会话')
+        receive_options.addWidget(self.record_check)
+        self.record_type_combo = QComboBox()
+        self.record_type_combo.addItems(['capture', 'raw', 'hex', 'text'])
+        receive_options.addWidget(self.record_type_combo)
+        
         receive_layout.addLayout(receive_options)
+        
+        # 协议解码：按协议定义解码接收的数据包，表格显示各字段的最新值
+        decode_options = QHBoxLayout()
+        self.decode_check = QCheckBox('协议解码')
+        decode_options.addWidget(self.decode_check)
+        self.protocol_combo = QComboBox()
+        self.protocol_combo.addItems(list(protocol.PROTOCOLS))
+        decode_options.addWidget(self.protocol_combo)
+        self.plot_check = QCheckBox('绘图')
+        decode_options.addWidget(self.plot_check)
+        self.decoded_frames_label = QLabel()
+        decode_options.addWidget(self.decoded_frames_label)
+        decode_options.addStretch()
+        receive_layout.addLayout(decode_options)
+        
+        # 搜索接收历史：命中的数据包高亮显示，可只显示命中的数据包（随新数据更新）
+        search_options = QHBoxLayout()
+        search_options.addWidget(QLabel('搜索:'))
+        self.search_kind_combo = QComboBox()
+        self.search_kind_combo.addItem('HEX', packet_search.SEARCH_HEX)
+        self.search_kind_combo.addItem('文本', packet_search.SEARCH_TEXT)
+        self.search_kind_combo.addItem('正则', packet_search.SEARCH_REGEX)
+        self.search_kind_combo.setToolTip('HEX: 字节序列，??匹配任意字节（不区分大小写无效）\n'
+                                          '文本: UTF-8文本按字节匹配\n'
+                                          '正则: 逐包匹配UTF-8解码后的文本，^和$对应数据包的开头和结尾')
+        search_options.addWidget(self.search_kind_combo)
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("如 aa ?? 01，多个用'|'分隔")
+        search_options.addWidget(self.search_edit)
+        self.search_case_check = QCheckBox('忽略大小写')
+        search_options.addWidget(self.search_case_check)
+        self.search_btn = QPushButton('查找')
+        search_options.addWidget(self.search_btn)
+        self.search_prev_btn = QPushButton('上一个')
+        search_options.addWidget(self.search_prev_btn)
+        self.search_next_btn = QPushButton('下一个')
+        search_options.addWidget(self.search_next_btn)
+        self.filter_check = QCheckBox('只显示匹配')
+        search_options.addWidget(self.filter_check)
+        self.search_result_label = QLabel()
+        search_options.addWidget(self.search_result_label)
+        receive_layout.addLayout(search_options)
+        
+        # 回放控制（只在回放时显示）
+        self.replay_controls = QWidget()
+        replay_layout = QHBoxLayout(self.replay_controls)
+        replay_layout.setContentsMargins(0, 0, 0, 0)
+        self.replay_pause_btn = QPushButton('暂停')
+        replay_layout.addWidget(self.replay_pause_btn)
+        replay_layout.addWidget(QLabel('倍速:'))
+        self.replay_speed_combo = QComboBox()
+        self.replay_speed_combo.addItems(['0.5x', '1x', '2x', '5x', '10x', '最快'])
+        self.replay_speed_combo.setCurrentText('1x')
+        replay_layout.addWidget(self.replay_speed_combo)
+        replay_layout.addWidget(QLabel('跳到记录:'))
+        self.replay_seek_spin = QSpinBox()
+        self.replay_seek_spin.setRange(0, 0)
+        replay_layout.addWidget(self.replay_seek_spin)
+        self.replay_seek_btn = QPushButton('跳转')
+        replay_layout.addWidget(self.replay_seek_btn)
+        self.replay_position_label = QLabel()
+        replay_layout.addWidget(self.replay_position_label)
+        replay_layout.addStretch()
+        self.replay_controls.hide()
+        receive_layout.addWidget(self.replay_controls)
+        self.replay_timer = QTimer()
+        self.replay_timer.timeout.connect(self.update_replay_status)
+        
         receive_group.setLayout(receive_layout)
         main_layout.addWidget(receive_group)
         
         # 状态栏
         self.statusBar().showMessage('就绪')
-        
-        # 自动发送定时器
-        self.auto_timer = QTimer()
-        self.auto_timer.timeout.connect(self.send_data)
+        # 切换显示模式后台格式化的进度条（超过一帧才显示）
+        self.format_progress = QProgressBar()
+        self.format_progress.setMaximumWidth(160)
+        self.format_progress.setFormat('格式化 %p%')
+        self.format_progress.hide()
+        self.statusBar().addPermanentWidget(self.format_progress)
+        self.format_worker = None
+        
+        # 运行统计：状态栏显示摘要，每秒采样一次
+        self.metrics = metrics.MetricsRegistry(labels={'port': ''})
+        self.update_timing = self.metrics.timing('update')  # 每次显示刷新（同步模型、搜索、解码）的耗时
+        self.ingest_timing = self.metrics.timing('ingest')  # 每次从接收缓冲区取出并存储数据包的耗时
+        self._register_metrics()
+        self.metrics_label = QLabel()
+        self.statusBar().addPermanentWidget(self.metrics_label)
+        self.metrics_btn = QPushButton('统计')
+        self.metrics_btn.setFlat(True)
+        self.statusBar().addPermanentWidget(self.metrics_btn)
+        self.metrics_window = MetricsWindow(parent=self)
+        self.metrics_timer = QTimer()
+        self.metrics_timer.timeout.connect(self.update_metrics)
+        self.metrics_timer.start(1000)
+        
+        # 自动发送调度线程（AutoSender），自动发送时创建
+        self.auto_sender = None
         
     def setup_connections(self):
         """设置信号连接"""
         self.refresh_btn.clicked.connect(self.refresh_ports)
         self.open_btn.clicked.connect(self.toggle_port)
+        self.replay_btn.clicked.connect(self.open_replay)
+        self.replay_pause_btn.clicked.connect(self.toggle_replay_pause)
+        self.replay_speed_combo.currentTextChanged.connect(self.set_replay_speed)
+        self.replay_seek_btn.clicked.connect(self.seek_replay)
         self.send_btn.clicked.connect(self.send_data)
         self.clear_btn.clicked.connect(self.clear_receive)
         self.save_btn.clicked.connect(self.save_receive)
         self.auto_send_check.stateChanged.connect(self.toggle_auto_send)
-        self.hex_display_check.stateChanged.connect(self.update_receive_display)
+        self.send_interval.valueChanged.connect(self.restart_auto_send)
+        # 自动发送中修改发送内容或选项时，下一个周期起发送新的内容
+        self.send_text.textChanged.connect(self.update_auto_send_payload)
+        self.hex_send_check.stateChanged.connect(self.update_auto_send_payload)
+        self.send_timestamp_check.stateChanged.connect(self.update_auto_send_payload)
+        self.tx_coalesce_check.stateChanged.connect(self.apply_tx_options)
+        self.tx_rate_spin.valueChanged.connect(self.apply_tx_options)
+        self.serial_comm.send_failed.connect(self.statusBar().showMessage)
+        self.serial_comm.port_lost.connect(self.on_port_lost)
+        self.hex_display_check.stateChanged.connect(self.update_display_options)
         self.auto_line_check.stateChanged.connect(self.update_line_wrap_mode)
+        self.wrap_limit_check.stateChanged.connect(self.update_line_wrap_mode)
         # 添加电流设置按钮的信号连接
         self.set_current_btn.clicked.connect(self.send_current_settings)
         self.show_timestamp_check.stateChanged.connect(self.toggle_timestamp)
         # 添加超时设置应用按钮的信号连接
         self.apply_timeout_btn.clicked.connect(self.apply_timeout_settings)
+        self.framing_combo.activated.connect(self.apply_framing)
+        self.framing_combo.lineEdit().editingFinished.connect(self.apply_framing)
+        self.frame_discard_check.stateChanged.connect(self.apply_framing)
         # 添加滚动控制按钮的信号连接
         self.scroll_to_bottom_btn.clicked.connect(self.scroll_to_bottom)
         self.lock_scroll_check.stateChanged.connect(self.toggle_scroll_lock)
-        # 设置串口数据接收信号连接
-        self.serial_comm.data_received.connect(self.on_data_received)
+        self.record_check.stateChanged.connect(self.toggle_recording)
+        self.decode_check.stateChanged.connect(self.toggle_decoding)
+        self.plot_check.stateChanged.connect(self.toggle_plot)
+        self.protocol_combo.currentTextChanged.connect(self.restart_decoding)
+        self.search_btn.clicked.connect(self.run_search)
+        self.search_edit.returnPressed.connect(self.run_search)
+        self.search_prev_btn.clicked.connect(lambda: self.find_match(-1))
+        self.search_next_btn.clicked.connect(lambda: self.find_match(1))
+        self.filter_check.stateChanged.connect(self.toggle_filter)
+        # 设置串口数据接收信号连接：收到通知后从接收缓冲区批量读取
+        self.serial_comm.packets_available.connect(self.on_packets_available)
         # 添加清除历史按钮的信号连接
         self.clear_history_btn.clicked.connect(self.clear_send_history)
+        self.metrics_btn.clicked.connect(self.show_metrics)
+        self.metrics_window.trace_check.stateChanged.connect(self.toggle_tracing)
+        self.metrics_window.sample_spin.valueChanged.connect(self.reset_tracing)
+        self.metrics_window.trace_reset_btn.clicked.connect(self.reset_tracing)
+        self.metrics_window.trace_dump_btn.clicked.connect(self.dump_latency)
 
     def update_line_wrap_mode(self):
-        """根据自动换行设置更新文本编辑器的换行模式"""
-        if self.auto_line_check.isChecked():
-            # 启用自动换行，换行到窗口宽度
-            self.receive_text.setLineWrapMode(QTextEdit.WidgetWidth)
-        else:
-            # 禁用自动换行
-            self.receive_text.setLineWrapMode(QTextEdit.NoWrap)
+        """根据自动换行设置更新接收视图的换行模式"""
+        self.receive_view.set_wrap_byte_limit(ReceiveView.WRAP_BYTE_LIMIT if self.wrap_limit_check.isChecked() else 0)
+        self.receive_view.set_wrap(self.auto_line_check.isChecked())
+
+    def update_display_options(self):
+        """HEX显示/显示时间戳切换后，按新模式重新显示全部数据
+
+        可见行立即在GUI线程中格式化，其余数据由后台线程按块预先格式化到缓存中。
+        """
+        changed = self.receive_model.set_display_options(self.hex_display_check.isChecked(),
+                                                         self.show_timestamp_check.isChecked())
+        if self.filter_model is not None:
+            self.filter_model.set_display_options(*self.receive_model.mode)
+        if changed and len(self.packet_store):
+            self._start_format_rebuild()
+
+    def _start_format_rebuild(self):
+        """启动后台格式化线程，超过一帧（16ms）仍未完成时显示进度"""
+        if self.format_worker is not None:
+            self.format_worker.cancel()
+        center_row = self.receive_view.indexAt(QPoint(0, 0)).row()
+        if self.receive_view.model() is self.filter_model and center_row >= 0:
+            center_row = self.filter_model.seq_at(center_row) - self.packet_store.evicted
+        worker = FormatWorker(self.receive_model, center_row, self)
+        worker.progress.connect(self._on_format_progress)
+        worker.finished.connect(lambda: self._on_format_finished(worker))
+        self.format_worker = worker
+        worker.start()
+        QTimer.singleShot(16, lambda: self._show_format_progress(worker))
+
+    def _show_format_progress(self, worker):
+        """格式化耗时超过一帧时显示进度条"""
+        if worker is self.format_worker and worker.isRunning():
+            self.format_progress.setValue(0)
+            self.format_progress.show()
+
+    def _on_format_progress(self, done, total):
+        """更新格式化进度"""
+        self.format_progress.setMaximum(total)
+        self.format_progress.setValue(done)
+
+    def _on_format_finished(self, worker):
+        """后台格式化完成"""
+        if worker is self.format_worker:
+            self.format_worker = None
+            self.format_progress.hide()
+        worker.deleteLater()
     
-    def refresh_ports(self):
-        """刷新可用串口列表"""
+    def refresh_ports(self, ports=None):
+        """刷新可用串口列表（ports为主窗口统一获取的串口列表）"""
         current_port = self.port_combo.currentText()
         self.port_combo.clear()
         
-        ports = self.serial_comm.get_ports()
+        if ports is None:
+            ports = self.serial_comm.get_ports()
         if ports:
             self.port_combo.addItems(ports)
             # 尝试恢复之前选择的串口
@@ -317,54 +561,138 @@ class SerialGUI(QMainWindow):
                 QMessageBox.warning(self, '警告', '请选择串口')
                 return
                 
-            baudrate = int(self.baud_combo.currentText())
-            bytesize = int(self.data_bits_combo.currentText())
-            
-            parity_map = {'无 (N)': 'N', '奇校验 (O)': 'O', '偶校验 (E)': 'E', 
-                         '标记 (M)': 'M', '空格 (S)': 'S'}
-            parity = parity_map[self.parity_combo.currentText()]
-            
-            stopbits_map = {'1': 1, '1.5': 1.5, '2': 2}
-            stopbits = stopbits_map[self.stop_bits_combo.currentText()]
-            
-            # 打开串口
-            success, msg = self.serial_comm.open_port(
-                port=port, 
-                baudrate=baudrate, 
-                bytesize=bytesize, 
-                parity=parity, 
-                stopbits=stopbits
-            )
-            
-            if success:
-                self.open_btn.setText('关闭串口')
-                self.statusBar().showMessage(f'串口已打开: {port}')
-                # 禁用串口设置控件
-                self.port_combo.setEnabled(False)
-                self.baud_combo.setEnabled(False)
-                self.data_bits_combo.setEnabled(False)
-                self.parity_combo.setEnabled(False)
-                self.stop_bits_combo.setEnabled(False)
-            else:
-                QMessageBox.critical(self, '错误', msg)
+            self._open_port(port)
         else:
-            # 关闭串口
-            success, msg = self.serial_comm.close_port()
-            if success:
-                self.open_btn.setText('打开串口')
-                self.statusBar().showMessage('串口已关闭')
-                # 启用串口设置控件
-                self.port_combo.setEnabled(True)
-                self.baud_combo.setEnabled(True)
-                self.data_bits_combo.setEnabled(True)
-                self.parity_combo.setEnabled(True)
-                self.stop_bits_combo.setEnabled(True)
-                # 停止自动发送
-                if self.auto_timer.isActive():
-                    self.auto_timer.stop()
-                    self.auto_send_check.setChecked(False)
+            self._close_port()
+    
+    def _open_port(self, port):
+        """按当前串口参数打开串口（port也可以是回放/pyserial URL）"""
+        baudrate = int(self.baud_combo.currentText())
+        bytesize = int(self.data_bits_combo.currentText())
+        
+        parity_map = {'无 (N)': 'N', '奇校验 (O)': 'O', '偶校验 (E)': 'E', 
+                     '标记 (M)': 'M', '空格 (S)': 'S'}
+        parity = parity_map[self.parity_combo.currentText()]
+        
+        stopbits_map = {'1': 1, '1.5': 1.5, '2': 2}
+        stopbits = stopbits_map[self.stop_bits_combo.currentText()]
+        
+        # 打开串口
+        success, msg = self.serial_comm.open_port(
+            port=port, 
+            baudrate=baudrate, 
+            bytesize=bytesize, 
+            parity=parity, 
+            stopbits=stopbits
+        )
+        
+        if success:
+            self.open_btn.setText('关闭串口')
+            self.statusBar().showMessage(f'串口已打开: {port}')
+            if port.startswith('replay://'):
+                self.port_name = '回放:' + os.path.basename(port[len('replay://'):].partition('?')[0].rstrip('/'))
             else:
-                QMessageBox.critical(self, '错误', msg)
+                self.port_name = port
+            self.setWindowTitle(self.port_name)
+            # 禁用串口设置控件
+            self.port_combo.setEnabled(False)
+            self.baud_combo.setEnabled(False)
+            self.data_bits_combo.setEnabled(False)
+            self.parity_combo.setEnabled(False)
+            self.stop_bits_combo.setEnabled(False)
+            self.replay_btn.setEnabled(False)
+            replay_port = self.serial_comm.replay
+            if replay_port is not None:
+                self.replay_seek_spin.setRange(0, max(replay_port.total - 1, 0))
+                self.replay_pause_btn.setText('暂停')
+                self.set_replay_speed(self.replay_speed_combo.currentText())
+                self.replay_controls.show()
+                self.replay_timer.start(500)
+            if self.record_check.isChecked():
+                self.start_recording()
+        else:
+            QMessageBox.critical(self, '错误', msg)
+    
+    def _close_port(self):
+        """关闭串口"""
+        success, msg = self.serial_comm.close_port()
+        if success:
+            self._on_port_closed('串口已关闭')
+        else:
+            QMessageBox.critical(self, '错误', msg)
+    
+    def on_port_lost(self, msg):
+        """串口断开（读取线程已关闭串口）"""
+        if not self.serial_comm.is_open:
+            self._on_port_closed(msg)
+    
+    def _on_port_closed(self, msg):
+        """串口关闭后读取剩余数据、停止记录并恢复设置控件"""
+        self.on_packets_available()
+        self.stop_recording()
+        self.open_btn.setText('打开串口')
+        self.statusBar().showMessage(msg)
+        self.setWindowTitle('未连接')
+        # 启用串口设置控件
+        self.port_combo.setEnabled(True)
+        self.baud_combo.setEnabled(True)
+        self.data_bits_combo.setEnabled(True)
+        self.parity_combo.setEnabled(True)
+        self.stop_bits_combo.setEnabled(True)
+        self.replay_btn.setEnabled(True)
+        self.replay_timer.stop()
+        self.replay_controls.hide()
+        # 停止自动发送
+        self.auto_send_check.setChecked(False)
+    
+    def open_replay(self):
+        """选择记录的会话文件并回放"""
+        if self.serial_comm.is_open:
+            return
+        filename, _ = QFileDialog.getOpenFileName(
+            self, '回放会话', self.data_logger.log_dir,
+            '会话记录 (*.scap *.bin *_hex.txt);;所有文件 (*.*)'
+        )
+        if filename:
+            self._open_port(f'replay://{filename}')
+    
+    def toggle_replay_pause(self):
+        """暂停/继续回放"""
+        replay_port = self.serial_comm.replay
+        if replay_port is None:
+            return
+        if replay_port.paused:
+            replay_port.resume()
+            self.replay_pause_btn.setText('暂停')
+        else:
+            replay_port.pause()
+            self.replay_pause_btn.setText('继续')
+    
+    def set_replay_speed(self, text):
+        """设置回放倍速，'最快'时保留分包边界所需的最小包间隔"""
+        replay_port = self.serial_comm.replay
+        if replay_port is None:
+            return
+        if text == '最快':
+            replay_port.min_gap_ns = int(self.serial_comm.packet_timeout * 2e9)
+            replay_port.set_speed(0)
+        else:
+            replay_port.min_gap_ns = 0
+            replay_port.set_speed(float(text.rstrip('x')))
+    
+    def seek_replay(self):
+        """跳到指定记录"""
+        replay_port = self.serial_comm.replay
+        if replay_port is not None:
+            replay_port.seek(self.replay_seek_spin.value())
+    
+    def update_replay_status(self):
+        """刷新回放进度"""
+        replay_port = self.serial_comm.replay
+        if replay_port is None:
+            return
+        state = '已结束' if replay_port.finished else ('已暂停' if replay_port.paused else '回放中')
+        self.replay_position_label.setText(f'{state} {replay_port.position}/{replay_port.total}')
     
     def send_data(self):
         """发送数据"""
@@ -403,40 +731,66 @@ class SerialGUI(QMainWindow):
         if success:
             # 格式：时间戳 [HEX] 数据
             mode = "[HEX]" if is_hex else ""
-            history_entry = f"{timestamp} {mode} {original_data}\n"
-            self.send_history.append(history_entry)
-            
-            # 限制历史记录数量
-            if len(self.send_history) > self.send_history_max_lines:
-                self.send_history = self.send_history[-self.send_history_max_lines:]
-            
-            # 更新发送历史显示
-            self.send_history_text.clear()
-            for entry in self.send_history:
-                self.send_history_text.insertPlainText(entry)
-            
-            # 滚动到底部
-            self.send_history_text.moveCursor(QTextCursor.End)
+            self.append_send_history(f"{timestamp} {mode} {original_data}\n")
+    
+    def append_send_history(self, history_entry):
+        """添加一条发送历史并刷新显示"""
+        self.send_history.append(history_entry)
+        
+        # 限制历史记录数量
+        if len(self.send_history) > self.send_history_max_lines:
+            self.send_history = self.send_history[-self.send_history_max_lines:]
+        
+        # 更新发送历史显示
+        self.send_history_text.clear()
+        for entry in self.send_history:
+            self.send_history_text.insertPlainText(entry)
+        
+        # 滚动到底部
+        self.send_history_text.moveCursor(QTextCursor.End)
     
-    # 修复缩进错误，确保这个方法是SerialGUI类的直接方法
-    # 修改on_data_received方法，使用更智能的节流机制
+    def apply_tx_options(self):
+        """应用发送线程的合并写入和限速设置"""
+        self.serial_comm.set_tx_options(self.tx_coalesce_check.isChecked(), self.tx_rate_spin.value())
+    
+    def on_packets_available(self):
+        """接收缓冲区有新数据，按GUI自己的节奏读取"""
+        start_ns = time.perf_counter_ns()
+        packets = self.rx_consumer.read()
+        if packets:
+            tracer = self.tracer
+            if tracer is not None:
+                sampled = tracer.select(packets)
+                tracer.record('ingest', sampled)
+                self._trace_display += sampled
+            self.on_packets_received(packets)
+        self.ingest_timing.add(time.perf_counter_ns() - start_ns)
+        # 分帧错误增加时在状态栏提示
+        framing_stats = self.serial_comm.get_framing_stats()
+        if framing_stats and framing_stats['errors'] != self._reported_framing_errors:
+            self._reported_framing_errors = framing_stats['errors']
+            self.statusBar().showMessage(
+                f'分帧错误: {framing_stats["errors"]} 次，已丢弃 {framing_stats["discarded_bytes"]} 字节')
+        # 缓冲区溢出时在状态栏提示
+        if self.rx_consumer.missed_packets != self._reported_missed_packets:
+            self._reported_missed_packets = self.rx_consumer.missed_packets
+            stats = self.serial_comm.get_buffer_stats()
+            self.statusBar().showMessage(
+                f'接收缓冲区溢出: 已丢弃 {stats["dropped_packets"]} 包 / {stats["dropped_bytes"]} 字节')
+
     def on_data_received(self, data):
-        """接收到数据的回调函数"""
+        """接收到单个数据包的回调函数（保持向后兼容）"""
+        now_ns = self.serial_comm.clock.now_ns()
+        self.on_packets_received([Packet(data, now_ns, now_ns)])
+
+    # 批量接收数据包，每批只做一次节流计算和定时器调度
+    def on_packets_received(self, packets):
+        """接收到一批数据包的回调函数，packets为[Packet(数据, 首字节时间ns, 末字节时间ns), ...]"""
         try:
-            # 获取当前时间（毫秒）
-            current_time = time.time() * 1000
-            current_timestamp = datetime.now()  # 获取当前数据块的时间戳
-            
-            # 将时间间隔阈值从10ms减小到5ms，确保相关数据块连续显示在同一行
-            if self.last_receive_time > 0 and current_time - self.last_receive_time > 5:
-                # 在数据列表中添加一个特殊标记表示换行
-                self.received_data_with_timestamp.append(("NEWLINE", None))
-            
-            # 更新上次接收时间
-            self.last_receive_time = current_time
-            
-            # 将数据和对应时间戳一起保存
-            self.received_data_with_timestamp.append((data, current_timestamp))
+            # 数据包自带捕获时间戳，直接保存（每个数据包在视图中占一行）
+            self.packet_store.extend(packets)
+            self.last_receive_time = packets[-1].last_ns
+            self.packets_stored.emit(packets)
             
             # 使用更智能的节流机制：
             # 1. 当数据量小时，使用较短的更新间隔
@@ -445,7 +799,7 @@ class SerialGUI(QMainWindow):
             current_update_time = time.time() * 1000
             
             # 动态调整更新间隔
-            data_size = len(self.received_data_with_timestamp)
+            data_size = len(self.packet_store)
             if data_size > 1000:
                 self.update_interval = 50  # 数据量大时，更新间隔加大到50ms
             elif data_size > 100:
@@ -456,14 +810,14 @@ class SerialGUI(QMainWindow):
             # 如果有更新待处理，不重复触发
             if not self.update_pending:
                 # 立即触发更新，但确保最小间隔
+                self.update_pending = True
                 if current_update_time - self.last_update_time >= self.update_interval:
-                    self.update_pending = True
                     QTimer.singleShot(0, self._delayed_update_display)
                 else:
                     # 确保即使在高频数据情况下也会更新
                     QTimer.singleShot(int(self.update_interval), self._delayed_update_display)
-        except Exception as e:
-            print(f"数据接收处理出错: {e}")
+        except Exception:
+            log.exception("数据接收处理出错")
     
     # 修复缩进错误
     def _delayed_update_display(self):
@@ -472,142 +826,247 @@ class SerialGUI(QMainWindow):
         self.last_update_time = time.time() * 1000
         self.update_pending = False
     
-    # 修复缩进错误
-    # 修复clear_receive方法中的未定义变量问题
     def clear_receive(self):
         """清空接收区域"""
-        self.received_data = b''
-        self.received_data_with_timestamp = []  # 使用正确的数据结构
+        self.packet_store.clear()
         self.current_data_timestamp = None
-        
-        # 冻结更新以减少闪烁
-        self.receive_text.blockSignals(True)
-        self.receive_text.setUpdatesEnabled(False)
-        self.receive_text.clear()
-        self.receive_text.setUpdatesEnabled(True)
-        self.receive_text.blockSignals(False)
+        self.last_receive_time = 0
+        self.receive_model.set_packets(self.packet_store)
+        self._decoded_seq = self.packet_store.evicted
+        self.decoded_table.clear_values()
+        self.plot_view.clear()
+        self._show_decoded_frames()
+        if self.search is not None:
+            self.search.reset()
+            self.filter_model.set_packets(self.packet_store)
+            self._show_search_result()
     
-    # 优化update_receive_display方法，实现增量更新
+    # 虚拟化显示：模型只通知新增行，视图只格式化和绘制可见行
     def update_receive_display(self):
-        """更新接收显示区域，使用增量更新减少闪烁"""
-        if not self.received_data_with_timestamp:
-            self.receive_text.clear()
+        """更新接收显示区域"""
+        start_ns = time.perf_counter_ns()
+        # 新增行插入前判断是否位于底部
+        at_bottom = self.receive_view.is_at_bottom()
+        self.receive_model.sync()
+        if self.search is not None:
+            # 增量搜索新存入的数据包
+            self.search.update()
+            self.filter_model.sync()
+            self._show_search_result()
+        # 未固定滚动且之前在底部时跟随最新数据
+        if at_bottom and not self.scroll_locked:
+            self.receive_view.scrollToBottom()
+        if self.decode_check.isChecked():
+            self.update_decoded()
+        if self._trace_display:
+            if self.tracer is not None:
+                self.tracer.record('display', self._trace_display)
+            self._trace_display = []
+        self.update_timing.add(time.perf_counter_ns() - start_ns)
+    
+    def _register_metrics(self):
+        """登记本页的统计项：串口收发、GUI队列和存储、各阶段耗时、记录积压"""
+        registry = self.metrics
+        self.serial_comm.register_metrics(registry)
+        store = self.packet_store
+        registry.add_gauge('gui_pending_packets', lambda: self.rx_consumer.pending())
+        registry.add_rate('gui_missed_packets', lambda: self.rx_consumer.missed_packets)
+        registry.add_gauge('store_packets', lambda: len(store))
+        registry.add_gauge('store_bytes', store.memory_usage)
+        registry.add_gauge('store_evicted_packets', lambda: store.evicted)
+        registry.add_timing('format', self.receive_model.format_timing)
+        registry.add_timing('paint', self.receive_view.paint_timing)
+        registry.add_gauge('recorder_queued_bytes', lambda: self._recorder_stat('queued_bytes'))
+        registry.add_gauge('recorder_dropped_packets', lambda: self._recorder_stat('dropped_packets'))
+        registry.add_gauge('auto_send_period_ms', lambda: self._auto_send_stat('period_ms'))
+        registry.add_gauge('auto_send_jitter_ms', lambda: self._auto_send_stat('jitter_ms'))
+        registry.add_gauge('auto_send_missed', lambda: self._auto_send_stat('missed'))
+    
+    def _recorder_stat(self, name):
+        recorder = self.data_logger.recorder
+        return recorder.stats()[name] if recorder is not None else 0
+    
+    def update_metrics(self):
+        """采样一次运行统计：更新状态栏摘要和统计窗口，启用导出时写入一行"""
+        self.metrics.labels['port'] = self.port_name
+        snapshot = self.metrics.snapshot()
+        self.metrics_label.setText(
+            f"RX {metrics.format_rate(snapshot['rx_bytes_per_s'])} {snapshot['rx_packets_per_s']:.0f}包/s | "
+            f"TX {metrics.format_rate(snapshot['tx_bytes_per_s'])} | "
+            f"刷新 {snapshot['update_avg_ms']:.1f}ms 绘制 {snapshot['paint_avg_ms']:.1f}ms | "
+            f"待处理 {snapshot['gui_pending_packets']}包")
+        self.metrics_window.update_snapshot(snapshot)
+        if self.auto_sender is not None:
+            stats = self.auto_sender.stats()
+            self.auto_send_label.setText(
+                f"自动发送: 实际周期 {stats['period_ms']:.3f}ms 抖动 {stats['jitter_ms']:.3f}ms "
+                f"延迟p99 {stats['late_p99_ms']:.3f}ms 跳过 {stats['missed']}")
+        if self.tracer is not None:
+            self.metrics_window.update_latency(self.tracer.summary())
+    
+    def toggle_tracing(self, state):
+        """启用/停用抽样延迟追踪"""
+        self._set_tracer(LatencyTracer(self.metrics_window.sample_spin.value()) if state == Qt.Checked else None)
+        self.metrics_window.update_latency({})
+    
+    def reset_tracing(self):
+        """清空延迟直方图（修改抽样间隔时也重新开始）"""
+        if self.tracer is not None:
+            self.toggle_tracing(Qt.Checked)
+    
+    def _set_tracer(self, tracer):
+        self.tracer = tracer
+        self._trace_display = []
+        self.serial_comm.tracer = tracer
+        if self.data_logger.recorder is not None:
+            self.data_logger.recorder.tracer = tracer
+    
+    def dump_latency(self):
+        """把延迟直方图导出为JSON文件（可用benchmarks/compare_latency.py对比）"""
+        if self.tracer is None:
+            QMessageBox.information(self, '提示', '请先启用延迟追踪')
             return
-            
-        # 保存当前滚动条位置和状态
-        scrollbar = self.receive_text.verticalScrollBar()
-        scroll_pos = scrollbar.value()
-        max_scroll_pos = scrollbar.maximum()
-        
-        # 使用更宽松的底部判断条件
-        at_bottom = scroll_pos >= max_scroll_pos - 10 or max_scroll_pos == 0
-        
-        # 设置自动换行模式（仅在模式改变时设置，避免频繁设置）
-        if hasattr(self, '_last_line_wrap_mode'):
-            if self.auto_line_check.isChecked() != self._last_line_wrap_mode:
-                self._last_line_wrap_mode = self.auto_line_check.isChecked()
-                if self._last_line_wrap_mode:
-                    self.receive_text.setLineWrapMode(QTextEdit.WidgetWidth)
-                else:
-                    self.receive_text.setLineWrapMode(QTextEdit.NoWrap)
+        filename, _ = QFileDialog.getSaveFileName(self, '导出延迟直方图', 'latency.json',
+                                                  'JSON文件 (*.json);;所有文件 (*)')
+        if not filename:
+            return
+        try:
+            self.tracer.dump(filename, port=self.port_name, source='gui')
+            self.statusBar().showMessage(f'延迟直方图已导出: {filename}')
+        except OSError as e:
+            QMessageBox.critical(self, '错误', f'导出失败: {str(e)}')
+    
+    def show_metrics(self):
+        """显示运行统计窗口"""
+        self.metrics_window.setWindowTitle(f'运行统计 - {self.port_name or "未连接"}')
+        self.metrics_window.show()
+        self.metrics_window.raise_()
+    
+    def run_search(self):
+        """按输入的查询搜索整个接收历史，查询为空时取消搜索"""
+        text = self.search_edit.text()
+        if not text.strip():
+            self.clear_search()
+            return
+        try:
+            pattern = packet_search.compile_query(text, self.search_kind_combo.currentData(),
+                                                  self.search_case_check.isChecked())
+        except ValueError as e:
+            self.statusBar().showMessage(f'搜索失败: {e}')
+            return
+        self.clear_search()
+        self.search = packet_search.PacketSearch(self.packet_store, pattern)
+        self.search.update()
+        self.filter_model = FilteredModel(self.receive_model, self.search, self)
+        self.filter_model.sync()
+        self.receive_model.set_highlight(self.search)
+        if self.filter_check.isChecked():
+            self.receive_view.setModel(self.filter_model)
+        self._show_search_result()
+        self.find_match(1)
+    
+    def clear_search(self):
+        """取消搜索：去掉高亮，恢复显示全部数据包"""
+        if self.search is None:
+            return
+        self.receive_model.set_highlight(None)
+        if self.receive_view.model() is not self.receive_model:
+            self.receive_view.setModel(self.receive_model)
+        self.search = None
+        self.filter_model = None
+        self.search_result_label.clear()
+    
+    def toggle_filter(self, state):
+        """切换只显示命中的数据包，保持当前选中的数据包可见"""
+        seq = self._current_seq()
+        model = self.filter_model if state == Qt.Checked and self.filter_model is not None else self.receive_model
+        if self.receive_view.model() is model:
+            return
+        self.receive_view.setModel(model)
+        if seq is None:
+            self.receive_view.scrollToBottom()
+        elif model is self.receive_model:
+            self._select_row(seq - self.packet_store.evicted)
         else:
-            self._last_line_wrap_mode = self.auto_line_check.isChecked()
-            if self._last_line_wrap_mode:
-                self.receive_text.setLineWrapMode(QTextEdit.WidgetWidth)
-            else:
-                self.receive_text.setLineWrapMode(QTextEdit.NoWrap)
-        
-        # 为了支持增量更新，我们需要跟踪上次处理到的位置
-        if not hasattr(self, '_last_processed_index'):
-            self._last_processed_index = 0
-        
-        # 构建增量更新的文本
-        new_display_text = ""
-        for i in range(self._last_processed_index, len(self.received_data_with_timestamp)):
-            item = self.received_data_with_timestamp[i]
-            if item[0] == "NEWLINE":
-                new_display_text += "\n"
-                continue
-                
-            data, timestamp = item
-            chunk_text = ""
-            
-            # 根据显示模式处理数据
-            if self.hex_display_check.isChecked():
-                try:
-                    # 转换为十六进制并格式化
-                    hex_str = binascii.hexlify(data).decode('ascii')
-                    formatted_hex = ' '.join([hex_str[i:i+2] for i in range(0, len(hex_str), 2)])
-                    chunk_text = formatted_hex
-                except Exception:
-                    chunk_text = str(data)
-            else:
-                try:
-                    chunk_text = data.decode('utf-8', errors='replace')
-                except Exception:
-                    chunk_text = str(data)
-                
-            # 添加时间戳
-            if self.show_timestamp_check.isChecked() and timestamp:
-                time_str = timestamp.strftime('[%Y-%m-%d %H:%M:%S.%f]')
-                new_display_text += f"{time_str} {chunk_text}"
-            else:
-                new_display_text += chunk_text
-        
-        # 确保换行符格式正确
-        new_display_text = new_display_text.replace('\r\n', '\n')
-        new_display_text = new_display_text.replace('\r', '\n')
-        
-        # 冻结更新以减少闪烁
-        self.receive_text.blockSignals(True)
-        self.receive_text.setUpdatesEnabled(False)
-        
-        # 如果是第一次更新，直接设置文本
-        if self._last_processed_index == 0:
-            self.receive_text.setPlainText(new_display_text)
+            # 过滤视图的第i行即第i个命中
+            self._select_row(self.search.next_index(seq - 1))
+    
+    def find_match(self, direction):
+        """跳到当前选中数据包之后（direction=1）或之前（-1）的命中"""
+        if self.search is None or not len(self.search):
+            return
+        seq = self._current_seq()
+        if direction > 0:
+            index = self.search.next_index(-1 if seq is None else seq)
         else:
-            # 增量更新：将新文本追加到现有文本
-            cursor = self.receive_text.textCursor()
-            cursor.movePosition(QTextCursor.End)
-            cursor.insertText(new_display_text)
-        
-        # 更新处理索引
-        self._last_processed_index = len(self.received_data_with_timestamp)
-        
-        # 恢复更新和信号
-        self.receive_text.setUpdatesEnabled(True)
-        self.receive_text.blockSignals(False)
-        
-        # 只有之前在底部时才滚动到底部
-        if at_bottom:
-            QTimer.singleShot(0, self.scroll_to_bottom)
+            index = self.search.prev_index(self.search.seq_at(len(self.search) - 1) + 1 if seq is None else seq)
+        if index < 0:
+            self.statusBar().showMessage('没有更多匹配')
+            return
+        if self.receive_view.model() is self.filter_model:
+            self._select_row(index)
+        else:
+            self._select_row(self.search.seq_at(index) - self.packet_store.evicted)
+        self.search_result_label.setText(f'{index + 1}/{len(self.search)}')
     
-    # 修复缩进错误
-    # 优化scroll_to_bottom方法
-    def scroll_to_bottom(self):
-        """滚动到底部，减少滚动引起的闪烁"""
-        # 直接设置滚动条到最大值，避免移动光标引起的额外更新
-        scrollbar = self.receive_text.verticalScrollBar()
-        
-        # 使用单次延迟调用，确保在UI更新完成后执行
-        QTimer.singleShot(0, lambda: scrollbar.setValue(scrollbar.maximum()))
-        # 分步骤确保可靠滚动到底部
-        self.receive_text.moveCursor(QTextCursor.End)
-        scrollbar = self.receive_text.verticalScrollBar()
-        
-        def set_scrollbar():
-            scrollbar.setValue(scrollbar.maximum())
-        
-        QTimer.singleShot(0, set_scrollbar)
-
-    # 其余方法保持不变，但需要删除文件末尾的重复方法定义
-    def clear_receive(self):
-        """清空接收区域"""
-        self.received_data = b''
-        self.current_data_timestamp = None  # 重置时间戳
-        self.receive_text.clear()
-        self.data_packets = []  # 清空数据包包列表
-        self.receive_text.clear()
+    def _current_seq(self):
+        """视图中当前数据包的绝对序号，没有当前行时返回None"""
+        index = self.receive_view.currentIndex()
+        if not index.isValid():
+            return None
+        return self.receive_view.model().seq_at(index.row())
+    
+    def _select_row(self, row):
+        model = self.receive_view.model()
+        if 0 <= row < model.rowCount():
+            index = model.index(row)
+            self.receive_view.setCurrentIndex(index)
+            self.receive_view.scrollTo(index, ReceiveView.PositionAtCenter)
+    
+    def _show_search_result(self):
+        self.search_result_label.setText(f'命中 {len(self.search)} 个数据包')
+    
+    def toggle_decoding(self, state):
+        """启用/停用协议解码"""
+        self.decoded_table.setVisible(state == Qt.Checked)
+        if state == Qt.Checked:
+            self.restart_decoding()
+        else:
+            # 曲线的数据来自解码结果
+            self.plot_check.setChecked(False)
+    
+    def toggle_plot(self, state):
+        """显示/隐藏解码字段的曲线，显示时自动启用协议解码"""
+        self.plot_view.setVisible(state == Qt.Checked)
+        if state == Qt.Checked:
+            self.decode_check.setChecked(True)
+    
+    def restart_decoding(self):
+        """按当前选择的协议从头解码存储中的数据包"""
+        selected = protocol.PROTOCOLS.get(self.protocol_combo.currentText())
+        self.decoded_table.set_protocol(selected)
+        self.plot_view.set_protocol(selected)
+        self._decoded_seq = self.packet_store.evicted
+        if self.decode_check.isChecked():
+            self.update_decoded()
+    
+    def update_decoded(self):
+        """批量解码上次之后存入的数据包，更新解码表（每次显示刷新一次）"""
+        table = self.decoded_table
+        if table.protocol is None:
+            return
+        end = self.packet_store.evicted + len(self.packet_store)
+        for batch in table.protocol.decode_store(self.packet_store, self._decoded_seq):
+            table.update_batch(batch)
+            self.plot_view.add_batch(batch)
+        self._decoded_seq = end
+        self._show_decoded_frames()
+    
+    def _show_decoded_frames(self):
+        if self.decode_check.isChecked():
+            self.decoded_frames_label.setText(f'已解码 {self.decoded_table.frames} 帧')
+        else:
+            self.decoded_frames_label.clear()
     
     def clear_send_history(self):
         """清除发送历史"""
@@ -616,41 +1075,47 @@ class SerialGUI(QMainWindow):
     
     def save_receive(self):
         """保存接收数据到文件"""
-        if not self.received_data:
+        if not len(self.packet_store):
             QMessageBox.information(self, '提示', '没有数据可保存')
             return
             
         filename, _ = QFileDialog.getSaveFileName(
             self, '保存数据', '', 
-            '文本文件 (*.txt);;十六进制文件 (*.hex);;二进制文件 (*.bin);;所有文件 (*.*)'
+            '文本文件 (*.txt);;十六进制文件 (*.hex);;十六进制转储 (*.dump);;二进制文件 (*.bin);;所有文件 (*.*)'
         )
         
         if not filename:
             return
             
         try:
+            store = self.packet_store
             if filename.endswith('.hex'):
-                # 保存为十六进制文本
-                hex_str = binascii.hexlify(self.received_data).decode('ascii')
-                formatted_hex = ' '.join([hex_str[i:i+2] for i in range(0, len(hex_str), 2)])
+                # 保存为十六进制文本，数据包间隔超过换行阈值时换行（按块批量格式化）
+                with open(filename, 'w') as f:
+                    separator = ''
+                    for line in data_format.iter_hex_lines(store):
+                        f.write(separator)
+                        f.write(line)
+                        separator = '\n'
+            elif filename.endswith('.dump'):
+                # 保存为带偏移和ASCII列的十六进制转储
                 with open(filename, 'w') as f:
-                    f.write(formatted_hex)
+                    for line in data_format.iter_hexdump_lines(store):
+                        f.write(line)
+                        f.write('\n')
             elif filename.endswith('.txt'):
-                # 保存为文本
-                try:
-                    text = self.received_data.decode('utf-8', errors='replace')
-                    with open(filename, 'w', encoding='utf-8') as f:
+                # 保存为文本（分块增量解码，不复制整个数据区）
+                with open(filename, 'w', encoding='utf-8') as f:
+                    for text in data_format.iter_text(store):
                         f.write(text)
-                except Exception:
-                    with open(filename, 'wb') as f:
-                        f.write(self.received_data)
             else:
-                # 保存为二进制
-                with open(filename, 'wb') as f:
-                    f.write(self.received_data)
+                # 保存为二进制（直接写出连续数据区，不复制）
+                with store.payload() as payload, open(filename, 'wb') as f:
+                    f.write(payload)
                     
             QMessageBox.information(self, '成功', f'数据已保存到 {filename}')
         except Exception as e:
+            log.exception("保存接收数据失败: %s", filename)
             QMessageBox.critical(self, '错误', f'保存失败: {str(e)}')
     
     def toggle_auto_send(self, state):
@@ -661,16 +1126,80 @@ class SerialGUI(QMainWindow):
                 self.auto_send_check.setChecked(False)
                 return
                 
-            interval = self.send_interval.value()
-            self.auto_timer.start(interval)
-        else:
-            if self.auto_timer.isActive():
-                self.auto_timer.stop()
+            payload = self._auto_send_payload()
+            if payload is None:
+                QMessageBox.warning(self, '警告', '发送内容为空或HEX格式无效')
+                self.auto_send_check.setChecked(False)
+                return
+            self._start_auto_send(payload)
+            timestamp = datetime.now().strftime('[%Y-%m-%d %H:%M:%S.%f]')
+            self.append_send_history(f"{timestamp} 自动发送开始: 间隔 {self.send_interval.value()}ms\n")
+        elif self.auto_sender is not None:
+            stats = self._stop_auto_send()
+            timestamp = datetime.now().strftime('[%Y-%m-%d %H:%M:%S.%f]')
+            self.append_send_history(
+                f"{timestamp} 自动发送停止: 已发送 {stats['sent']}次，实际周期 {stats['period_ms']:.3f}ms，"
+                f"抖动 {stats['jitter_ms']:.3f}ms，跳过 {stats['missed']}个周期\n")
     
-    def closeEvent(self, event):
-        """窗口关闭事件"""
+    def _auto_send_payload(self):
+        """自动发送的数据：固定的bytes，启用发送时间戳时为每次生成数据的函数；内容为空或HEX无效时返回None"""
+        data = self.send_text.toPlainText()
+        if not data:
+            return None
+        is_hex = self.hex_send_check.isChecked()
+        try:
+            payload = encode_payload(data, is_hex)
+        except ValueError:
+            return None
+        if self.send_timestamp_check.isChecked() and not is_hex:
+            # 时间戳在调度线程中生成，为实际发送时刻
+            return lambda: encode_payload(f"{datetime.now().strftime('[%Y-%m-%d %H:%M:%S.%f]')} {data}")
+        return payload
+    
+    def _start_auto_send(self, payload):
+        self.auto_sender = AutoSender(self.serial_comm.send_bytes, payload, self.send_interval.value() / 1000.0)
+        self.auto_sender.start()
+    
+    def _stop_auto_send(self):
+        """停止自动发送，返回统计"""
+        sender = self.auto_sender
+        self.auto_sender = None
+        sender.stop()
+        self.auto_send_label.clear()
+        return sender.stats()
+    
+    def restart_auto_send(self):
+        """自动发送中修改间隔时按新间隔重新调度"""
+        if self.auto_sender is not None:
+            payload = self.auto_sender.payload
+            self._stop_auto_send()
+            self._start_auto_send(payload)
+    
+    def update_auto_send_payload(self):
+        """自动发送中修改了发送内容，内容有效时从下一个周期起生效"""
+        if self.auto_sender is not None:
+            payload = self._auto_send_payload()
+            if payload is not None:
+                self.auto_sender.set_payload(payload)
+    
+    def _auto_send_stat(self, name):
+        sender = self.auto_sender
+        return sender.stats()[name] if sender is not None else 0
+    
+    def shutdown(self):
+        """关闭串口并停止记录（关闭标签页或主窗口时调用）"""
+        if self.auto_sender is not None:
+            self._stop_auto_send()
         if self.serial_comm.is_open:
             self.serial_comm.close_port()
+        self.stop_recording()
+        self.metrics_timer.stop()
+        self.metrics_window.stop_export()
+        self.metrics_window.hide()
+
+    def closeEvent(self, event):
+        """窗口关闭事件"""
+        self.shutdown()
         event.accept()
 
     def apply_timeout_settings(self):
@@ -684,6 +1213,21 @@ class SerialGUI(QMainWindow):
         # 更新状态栏提示
         self.statusBar().showMessage(f'已应用超时设置: 读超时={read_timeout}s, 分包超时={packet_timeout}s')
 
+    def apply_framing(self):
+        """应用分帧方式"""
+        spec = self.framing_combo.currentText()
+        current = self.serial_comm.framer
+        try:
+            framer = framing.create_framer(spec, self.frame_discard_check.isChecked())
+        except ValueError as e:
+            QMessageBox.warning(self, '警告', f'分帧方式无效: {e}')
+            return
+        if framer is None and current is None:
+            return
+        self._reported_framing_errors = 0
+        self.serial_comm.set_framer(framer)
+        self.statusBar().showMessage(f'分帧方式: {spec}')
+
     # 其他方法保持不变...
     
     # 在apply_timeout_settings方法后添加toggle_timestamp方法
@@ -691,26 +1235,67 @@ class SerialGUI(QMainWindow):
         """切换时间戳显示状态"""
         enabled = state == Qt.Checked
         self.serial_comm.set_timestamp_enabled(enabled)
+        self.update_display_options()
         self.statusBar().showMessage(f'时间戳显示已{"启用" if enabled else "禁用"}')
 
-    # 添加这个方法到SerialGUI类中
-    # 增强scroll_to_bottom方法，确保滚动效果可靠
     def scroll_to_bottom(self):
         """滚动到底部"""
-        self.receive_text.moveCursor(QTextCursor.End)
-        # 额外步骤确保垂直滚动条也滚动到底部
-        scrollbar = self.receive_text.verticalScrollBar()
-        scrollbar.setValue(scrollbar.maximum())
-        # 解锁滚动锁定，确保能自由滚动
+        # 解锁滚动锁定，恢复跟随最新数据
         self.lock_scroll_check.setChecked(False)
+        self.receive_view.scrollToBottom()
+    
+    def toggle_recording(self, state):
+        """切换会话记录，串口未打开时在打开串口后开始记录"""
+        if state == Qt.Checked:
+            if self.serial_comm.is_open:
+                self.start_recording()
+        else:
+            self.stop_recording()
+    
+    def start_recording(self):
+        """开始会话记录"""
+        port_info = {
+            'port': self.port_combo.currentText(),
+            'baudrate': int(self.baud_combo.currentText()),
+            'bytesize': int(self.data_bits_combo.currentText()),
+            'parity': self.parity_combo.currentText(),
+            'stopbits': self.stop_bits_combo.currentText(),
+        }
+        try:
+            session_dir = self.data_logger.start_session_log(
+                port_info, self.serial_comm.clock, record=self.record_type_combo.currentText(),
+                tracer=self.tracer)
+        except Exception as e:
+            log.exception("开始会话记录失败")
+            QMessageBox.critical(self, '错误', f'开始记录失败: {str(e)}')
+            self.record_check.setChecked(False)
+            return
+        # 记录器作为接收端订阅：读取线程直接把收发的数据包交给记录器，界面卡顿不影响记录
+        self.record_sink = self.serial_comm.subscribe(RecorderSink(self.data_logger.recorder))
+        self.record_type_combo.setEnabled(False)
+        self.statusBar().showMessage(f'正在记录会话: {session_dir}')
+    
+    def stop_recording(self):
+        """停止会话记录"""
+        if self.record_sink is not None:
+            self.serial_comm.unsubscribe(self.record_sink)
+            self.record_sink = None
+        stats = self.data_logger.stop_session_log()
+        self.record_type_combo.setEnabled(True)
+        if stats is None:
+            return
+        msg = f'会话记录已保存: {stats["path"]}（{stats["bytes_written"]} 字节）'
+        if stats['dropped_packets']:
+            msg += f'，丢弃 {stats["dropped_packets"]} 包'
+        if stats['error']:
+            msg += f'，错误: {stats["error"]}'
+        self.statusBar().showMessage(msg)
     
-    # 修复toggle_scroll_lock方法，移除内部的信号连接代码
     def toggle_scroll_lock(self, state):
-        """切换滚动锁定状态"""
+        """切换滚动锁定状态：锁定时新数据到达不自动滚动，解锁后回到底部继续跟随"""
         self.scroll_locked = state == Qt.Checked
-        # 如果启用了滚动锁定，立即滚动到底部
-        if self.scroll_locked:
-            self.scroll_to_bottom()
+        if not self.scroll_locked:
+            self.receive_view.scrollToBottom()
 
     def send_current_settings(self):
         """发送电流设置"""
@@ -724,40 +1309,11 @@ class SerialGUI(QMainWindow):
         # 处理电流值：除5，减1
         current_value = (current_value // 5) - 1
         
-        # 获取opa0和opa1的值，并转换为数字
+        # 获取opa0和opa1的值，并转换为数字（增益表与协议解码共用）
         opa0_text = self.opa0_combo.currentText()
         opa1_text = self.opa1_combo.currentText()
-        
-        # 将OPA设置转换为数字值
-        # 为每个选项创建对应的数值映射
-        opa0_map = {
-            '1x': 1,
-            '20x': 20,
-            '40x': 40,
-            '60x': 60,
-            '80x': 80,
-            '100x': 100,
-            '120x': 120,
-            '140x': 140,
-            '160x': 160,
-            '200x': 200,
-            '240x': 240,
-            '280x': 280
-        }
-        
-        opa1_map = {
-            '1x': 1,
-            '10x': 10,
-            '20x': 20,
-            '30x': 30,
-            '40x': 40,
-            '50x': 50,
-            '60x': 60,
-            '70x': 70
-        }
-        
-        opa0_value = opa0_map.get(opa0_text, 1)
-        opa1_value = opa1_map.get(opa1_text, 1)
+        opa0_value = protocol.OPA0_GAINS.get(opa0_text, 1)
+        opa1_value = protocol.OPA1_GAINS.get(opa1_text, 1)
         
         # 构建HEX格式的数据：aa 电流值 opa0值 opa1值
         # 确保值在0-255范围内，因为HEX格式每个字节限制
@@ -775,17 +1331,107 @@ class SerialGUI(QMainWindow):
         # 记录到发送历史
         if success:
             timestamp = datetime.now().strftime('[%Y-%m-%d %H:%M:%S.%f]')
-            history_entry = f"{timestamp} [HEX] 电流设置: {hex_data} (电流={current_value}mA, opa0={opa0_text}, opa1={opa1_text})\n"
-            self.send_history.append(history_entry)
-            
-            # 限制历史记录数量
-            if len(self.send_history) > self.send_history_max_lines:
-                self.send_history = self.send_history[-self.send_history_max_lines:]
-            
-            # 更新发送历史显示
-            self.send_history_text.clear()
-            for entry in self.send_history:
-                self.send_history_text.insertPlainText(entry)
-            
-            # 滚动到底部
-            self.send_history_text.moveCursor(QTextCursor.End)
\ No newline at end of file
+            self.append_send_history(
+                f"{timestamp} [HEX] 电流设置: {hex_data} (电流={current_value}mA, opa0={opa0_text}, opa1={opa1_text})\n")
+
+class SerialGUI(QMainWindow):
+    """主窗口：每个串口一个标签页，另有按时间合并各串口数据包的合并视图
+
+    所有标签页的串口共用一个PortHub选择线程读取。
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.hub = PortHub()
+        self.panels = []
+        self.merger = PacketMerger()
+        self.init_ui()
+        self.add_panel()
+
+        # 按时间顺序把各串口的数据包送入合并视图（有待合并的数据包时才运行）
+        self.merge_timer = QTimer()
+        self.merge_timer.setInterval(50)
+        self.merge_timer.timeout.connect(self.flush_merged)
+
+        # 定时刷新串口列表（所有标签页共用一次查询）
+        self.port_timer = QTimer()
+        self.port_timer.timeout.connect(self.refresh_ports)
+        self.port_timer.start(3000)  # 每3秒刷新一次
+
+    def init_ui(self):
+        """初始化UI界面"""
+        self.setWindowTitle('串口通信工具')
+        self.setGeometry(100, 100, 800, 600)
+        self.tabs = QTabWidget()
+        self.tabs.setTabsClosable(True)
+        self.tabs.tabCloseRequested.connect(self.close_panel)
+        self.setCentralWidget(self.tabs)
+
+        self.merged_view = MergedView()
+        self.tabs.addTab(self.merged_view, '合并视图')
+        # 合并视图不可关闭
+        for side in (QTabBar.LeftSide, QTabBar.RightSide):
+            self.tabs.tabBar().setTabButton(0, side, None)
+
+        self.add_port_btn = QPushButton('添加串口')
+        self.add_port_btn.clicked.connect(self.add_panel)
+        self.tabs.setCornerWidget(self.add_port_btn, Qt.TopRightCorner)
+
+    @property
+    def current_panel(self):
+        """当前标签页的串口页面（合并视图时为None）"""
+        widget = self.tabs.currentWidget()
+        return widget if isinstance(widget, PortPanel) else None
+
+    def add_panel(self):
+        """添加一个串口标签页"""
+        panel = PortPanel(self.hub)
+        panel.packets_stored.connect(lambda packets, panel=panel: self.on_panel_packets(panel, packets))
+        panel.windowTitleChanged.connect(
+            lambda title, panel=panel: self.tabs.setTabText(self.tabs.indexOf(panel), title))
+        self.panels.append(panel)
+        self.tabs.setCurrentIndex(self.tabs.addTab(panel, panel.windowTitle()))
+        return panel
+
+    def close_panel(self, index):
+        """关闭串口标签页"""
+        panel = self.tabs.widget(index)
+        if not isinstance(panel, PortPanel):
+            return
+        panel.shutdown()
+        self.tabs.removeTab(index)
+        self.panels.remove(panel)
+        panel.deleteLater()
+
+    def on_panel_packets(self, panel, packets):
+        """某个串口页面存入了一批数据包"""
+        self.merger.add(panel.port_name, packets)
+        if not self.merge_timer.isActive():
+            self.merge_timer.start()
+
+    def flush_merged(self):
+        """把重排窗口之前的数据包按时间顺序送入合并视图"""
+        items = self.merger.pop_ready()
+        if items:
+            self.merged_view.append(items)
+        if not len(self.merger):
+            self.merge_timer.stop()
+
+    def refresh_ports(self):
+        """刷新所有标签页的串口列表"""
+        if not self.panels:
+            return
+        ports = self.panels[0].serial_comm.get_ports()
+        for panel in self.panels:
+            panel.refresh_ports(ports)
+
+    def closeEvent(self, event):
+        """窗口关闭事件"""
+        for panel in self.panels:
+            panel.shutdown()
+        items = self.merger.pop_all()
+        if items:
+            self.merged_view.append(items)
+        # 所有串口已注销，关闭选择器和唤醒管道
+        self.hub.close()
+        event.accept()
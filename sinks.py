@@ -0,0 +1,80 @@
+# 数据包接收端（sink）：订阅SerialCore后，读取线程每次批量通知时把这一批数据包直接交给各接收端
+# 接收端在读取线程中被调用，必须立即返回（入队、计数等），耗时的工作交给各自的线程
+import queue
+from capture_file import DIR_RX, DIR_TX
+
+
+class PacketSink:
+    """接收端基类"""
+
+    def on_packets(self, packets):
+        """收到一批接收的数据包（Packet列表），在读取线程中调用"""
+
+    def on_sent(self, packet):
+        """数据发送成功（Packet），在发送线程中调用"""
+
+    def close(self):
+        """取消订阅时调用"""
+
+
+class CallbackSink(PacketSink):
+    """把每批数据包交给回调函数"""
+
+    def __init__(self, on_packets, on_sent=None):
+        self._on_packets = on_packets
+        self._on_sent = on_sent
+
+    def on_packets(self, packets):
+        self._on_packets(packets)
+
+    def on_sent(self, packet):
+        if self._on_sent is not None:
+            self._on_sent(packet)
+
+
+class QueueSink(PacketSink):
+    """把每批数据包放入队列，由消费者线程用get()取出
+
+    maxsize为队列最多积压的批次数（0为不限），满时丢弃新批次并计数，不阻塞读取线程。
+    队列项为(方向, [Packet, ...])。
+    """
+
+    def __init__(self, maxsize=0, include_sent=False):
+        self.queue = queue.Queue(maxsize)
+        self.include_sent = include_sent  # 是否也放入发送的数据
+        self.dropped_batches = 0
+        self.dropped_packets = 0
+
+    def _put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped_batches += 1
+            self.dropped_packets += len(item[1])
+
+    def on_packets(self, packets):
+        self._put((DIR_RX, packets))
+
+    def on_sent(self, packet):
+        if self.include_sent:
+            self._put((DIR_TX, [packet]))
+
+    def get(self, timeout=None):
+        """取出一批(方向, [Packet, ...])，超时返回None"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class RecorderSink(PacketSink):
+    """把收发的数据包交给会话记录器（data_logger.SessionRecorder），由其写线程写文件"""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    def on_packets(self, packets):
+        self.recorder.write(packets, DIR_RX)
+
+    def on_sent(self, packet):
+        self.recorder.write([packet], DIR_TX)
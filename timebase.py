@@ -0,0 +1,53 @@
+# 时间基准：读取线程使用单调时钟纳秒时间戳，每个会话只记录一次墙上时间锚点
+import time
+from datetime import datetime
+
+
+class SessionClock:
+    """会话时钟：把time.monotonic_ns()时间戳换算为墙上时间
+
+    打开串口时记录一对(墙上时间, 单调时间)锚点，之后所有数据包只记录单调时间，
+    显示和记录时再换算，避免在读取线程中调用datetime.now()和strftime。
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """重新记录墙上时间锚点（每个会话开始时调用）"""
+        self.mono_anchor_ns = time.monotonic_ns()
+        self.wall_anchor_ns = time.time_ns()
+        self._second_cache = (None, '')  # (整秒, 格式化后的日期时间前缀)
+
+    def now_ns(self):
+        """当前单调时钟时间戳（纳秒）"""
+        return time.monotonic_ns()
+
+    def wall_ns(self, mono_ns):
+        """单调时间戳换算为Unix纪元纳秒"""
+        return self.wall_anchor_ns + (mono_ns - self.mono_anchor_ns)
+
+    def to_datetime(self, mono_ns):
+        """单调时间戳换算为本地datetime"""
+        return datetime.fromtimestamp(self.wall_ns(mono_ns) / 1e9)
+
+    def format(self, mono_ns, ms=False):
+        """格式化为'[%Y-%m-%d %H:%M:%S.%f]'，ms为True时只保留毫秒
+
+        日期时间部分按整秒缓存，同一秒内的时间戳只做整数运算和拼接。
+        """
+        second, nanos = divmod(self.wall_ns(mono_ns), 1_000_000_000)
+        cached_second, prefix = self._second_cache
+        if second != cached_second:
+            prefix = datetime.fromtimestamp(second).strftime('%Y-%m-%d %H:%M:%S')
+            self._second_cache = (second, prefix)
+        if ms:
+            return f'[{prefix}.{nanos // 1_000_000:03d}]'
+        return f'[{prefix}.{nanos // 1000:06d}]'
+
+    def anchor_info(self):
+        """返回锚点信息，供会话日志记录"""
+        return {
+            'wall_anchor_ns': self.wall_anchor_ns,
+            'monotonic_anchor_ns': self.mono_anchor_ns,
+        }
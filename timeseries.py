@@ -0,0 +1,152 @@
+# 数值通道的时间序列：有界样本缓冲 + 多级min/max摘要，按像素宽度抽取用于绘图
+#
+# 第0级是原始样本，第k级的每个桶汇总第k-1级的FACTOR个条目（桶的起始时间、最小值、最大值），
+# 追加样本时逐级增量生成。按时间范围和像素列数抽取时，选择每列仍至少有一个桶的最粗一级，
+# 每列只取该级若干个桶的min/max，缩小到数小时的范围也只处理与像素数同量级的数据。
+from array import array
+from bisect import bisect_left
+
+FACTOR = 8  # 相邻两级的汇总倍数
+
+
+class _Level:
+    """一级摘要：桶起始时间、最小值、最大值三列，第0个元素的绝对编号为base"""
+
+    def __init__(self, raw=False):
+        self.times = array('q')
+        self.mins = array('d')
+        # 原始样本的最小值和最大值都是样本值本身，两列共用一个数组
+        self.maxs = self.mins if raw else array('d')
+        self.base = 0
+        self.next = 0  # 下一个待汇总的下一级条目的绝对编号
+
+    def __len__(self):
+        return len(self.times)
+
+    def drop_before(self, time_ns):
+        """丢弃起始时间早于time_ns的条目"""
+        count = bisect_left(self.times, time_ns)
+        if count:
+            del self.times[:count]
+            del self.mins[:count]
+            if self.maxs is not self.mins:
+                del self.maxs[:count]
+            self.base += count
+
+
+class TimeSeries:
+    """单通道时间序列
+
+    样本按到达时间（单调时钟纳秒）追加，时间不能倒退。超过capacity个样本时
+    淘汰最旧的约10%（整体压缩一次，摊还O(1)），各级摘要同时丢弃对应时间之前的桶。
+    """
+
+    def __init__(self, capacity=1_000_000, levels=7):
+        self.capacity = capacity
+        self._levels = [_Level(raw=True)] + [_Level() for _ in range(levels - 1)]
+
+    def __len__(self):
+        return len(self._levels[0])
+
+    @property
+    def evicted(self):
+        """累计淘汰的样本数"""
+        return self._levels[0].base
+
+    def clear(self):
+        self._levels = [_Level(raw=True)] + [_Level() for _ in range(len(self._levels) - 1)]
+
+    def time_range(self):
+        """保留样本的(最早时间, 最晚时间)，没有样本时返回None"""
+        times = self._levels[0].times
+        return (times[0], times[-1]) if times else None
+
+    def extend(self, times, values):
+        """追加一批样本"""
+        raw = self._levels[0]
+        raw.times.extend(times)
+        raw.mins.extend(values)
+        for lower, upper in zip(self._levels, self._levels[1:]):
+            if not self._summarize(lower, upper):
+                break
+        if len(raw) > self.capacity:
+            self._evict(len(raw) - int(self.capacity * 0.9))
+
+    @staticmethod
+    def _summarize(lower, upper):
+        """把lower中已凑满FACTOR个的条目汇总为upper的桶，返回是否新增了桶"""
+        i = max(upper.next - lower.base, 0)
+        end = len(lower) - FACTOR
+        if i > end:
+            return False
+        times, mins, maxs = lower.times, lower.mins, lower.maxs
+        while i <= end:
+            j = i + FACTOR
+            upper.times.append(times[i])
+            upper.mins.append(min(mins[i:j]))
+            upper.maxs.append(max(maxs[i:j]))
+            i = j
+        upper.next = lower.base + i
+        return True
+
+    def _evict(self, count):
+        raw = self._levels[0]
+        cutoff = raw.times[count]
+        for level in self._levels:
+            level.drop_before(cutoff)
+
+    def _tail(self, k):
+        """第k级最后一个完整桶之后尚未汇总的样本，返回(起始时间, 最小值, 最大值)或None"""
+        if k == 0:
+            return None
+        lower = self._levels[k - 1]
+        i = max(self._levels[k].next - lower.base, 0)
+        parts = []
+        if i < len(lower):
+            parts.append((lower.times[i], min(lower.mins[i:]), max(lower.maxs[i:])))
+        tail = self._tail(k - 1)
+        if tail is not None:
+            parts.append(tail)
+        if not parts:
+            return None
+        return parts[0][0], min(p[1] for p in parts), max(p[2] for p in parts)
+
+    def count_between(self, t0, t1):
+        """时间范围[t0, t1)内的原始样本数"""
+        times = self._levels[0].times
+        return bisect_left(times, t1) - bisect_left(times, t0)
+
+    def samples(self, t0, t1):
+        """时间范围[t0, t1)内的原始样本，返回(时间数组, 值数组)"""
+        raw = self._levels[0]
+        a = bisect_left(raw.times, t0)
+        b = bisect_left(raw.times, t1)
+        return raw.times[a:b], raw.mins[a:b]
+
+    def decimate(self, t0, t1, columns):
+        """把时间范围[t0, t1)均分为columns列，返回每列的(最小值, 最大值)，没有样本的列为None"""
+        if columns <= 0 or t1 <= t0:
+            return []
+        per_column = self.count_between(t0, t1) / columns
+        k = 0
+        while k + 1 < len(self._levels) and FACTOR ** (k + 1) <= per_column:
+            k += 1
+        level = self._levels[k]
+        times, mins, maxs = level.times, level.mins, level.maxs
+        step = (t1 - t0) / columns
+        result = [None] * columns
+        i = bisect_left(times, t0)
+        for c in range(columns):
+            j = bisect_left(times, t0 + (c + 1) * step, i)
+            if j > i:
+                result[c] = (min(mins[i:j]), max(maxs[i:j]))
+            i = j
+        # 最后一个桶之后的样本尚未汇总到这一级，合并到所在的列
+        tail = self._tail(k)
+        if tail is not None and t0 <= tail[0] < t1:
+            c = min(int((tail[0] - t0) / step), columns - 1)
+            low, high = tail[1], tail[2]
+            if result[c] is not None:
+                low, high = min(low, result[c][0]), max(high, result[c][1])
+            result[c] = (low, high)
+        return result
@@ -0,0 +1,280 @@
+# 发送管线：发送线程和高精度周期发送
+#
+# TxWriter：send_data只把数据放入发送队列，由发送线程调用serial_port.write()，
+# 串口启用流控、写入阻塞时只阻塞发送线程，不会冻结界面。可选合并队列中积压的小块数据为一次写入，
+# 以及按字节速率限速（大块数据按约10ms的量分段写入）。
+# AutoSender：周期发送的调度线程，按绝对截止时间（start + k*interval）调度，误差不累积，
+# 统计实际周期、周期抖动和相对截止时间的延迟。
+import math
+import time
+import threading
+from collections import deque
+from packet_buffer import Packet
+from latency import LatencyHistogram
+from diag_log import get_logger
+
+log = get_logger('writer')
+
+
+class TxWriter:
+    """串口发送线程
+
+    submit()可在任意线程调用，队列积压超过max_queue_bytes时拒绝新数据并计数。
+    每次提交的数据写完后调用on_sent(Packet)（首字节/末字节时间为实际写入前后的单调时间，
+    合并写入的各块共用同一次写入的时间）；写入出错时调用on_error(data, error)。
+    两个回调都在发送线程中执行，回调抛出的异常只记录日志，不会结束发送线程。
+    """
+
+    COALESCE_MAX = 4096  # 合并写入的最大字节数
+    PACE_SLICE = 0.01  # 限速时每次写入约为该时长（秒）的数据量
+
+    def __init__(self, port, on_sent, on_error, coalesce=False, byte_rate=0, max_queue_bytes=4 * 1024 * 1024):
+        self.port = port
+        self.on_sent = on_sent
+        self.on_error = on_error
+        self.coalesce = coalesce
+        self.byte_rate = byte_rate  # 限速（字节/秒），0为不限
+        self.max_queue_bytes = max_queue_bytes
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._next_ns = 0  # 限速时下一次写入的最早时间
+        self.queued_bytes = 0
+        self.writes = 0  # 实际调用write()的次数
+        self.written_bytes = 0
+        self.coalesced = 0  # 被合并到前一块的提交数
+        self.dropped = 0  # 队列满或关闭时丢弃的提交数
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='serial-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """停止发送线程，丢弃尚未写入的数据"""
+        with self._cond:
+            self._stop.set()
+            self.dropped += len(self._queue)
+            self._queue.clear()
+            self.queued_bytes = 0
+            self._cond.notify()
+        # 流控阻塞中的写入：支持时取消，否则等到超时后由关闭串口结束
+        cancel_write = getattr(self.port, 'cancel_write', None)
+        if cancel_write is not None:
+            try:
+                cancel_write()
+            except Exception:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, data):
+        """提交一块数据，队列已满或已停止时返回False"""
+        with self._cond:
+            if self._stop.is_set() or self.queued_bytes + len(data) > self.max_queue_bytes:
+                self.dropped += 1
+                return False
+            self._queue.append(data)
+            self.queued_bytes += len(data)
+            self._cond.notify()
+        return True
+
+    def _take(self):
+        """取出下一次写入的数据块列表（合并时可能多块），停止时返回None"""
+        with self._cond:
+            while not self._queue:
+                if self._stop.is_set():
+                    return None
+                self._cond.wait()
+            if self._stop.is_set():
+                return None
+            queue = self._queue
+            items = [queue.popleft()]
+            size = len(items[0])
+            if self.coalesce:
+                while queue and size + len(queue[0]) <= self.COALESCE_MAX:
+                    data = queue.popleft()
+                    items.append(data)
+                    size += len(data)
+                self.coalesced += len(items) - 1
+            self.queued_bytes -= size
+            return items
+
+    def _run(self):
+        while True:
+            items = self._take()
+            if items is None:
+                break
+            data = items[0] if len(items) == 1 else b''.join(items)
+            try:
+                start_ns, end_ns = self._write(data)
+            except Exception as e:
+                if not self._stop.is_set():
+                    try:
+                        self.on_error(data, e)
+                    except Exception:
+                        log.exception("发送错误回调执行出错")
+                continue
+            if end_ns is None:
+                break
+            for item in items:
+                try:
+                    self.on_sent(Packet(item, start_ns, end_ns))
+                except Exception:
+                    log.exception("发送完成回调执行出错")
+
+    def _write(self, data):
+        """写入一块数据（限速时分段并等待），返回(开始时间, 结束时间)，中途停止时结束时间为None"""
+        byte_rate = self.byte_rate
+        if not byte_rate:
+            start_ns = time.monotonic_ns()
+            self.port.write(data)
+            self.writes += 1
+            self.written_bytes += len(data)
+            return start_ns, time.monotonic_ns()
+        step = max(1, int(byte_rate * self.PACE_SLICE))
+        view = memoryview(data)
+        start_ns = None
+        for offset in range(0, len(data), step):
+            delay = (self._next_ns - time.monotonic_ns()) / 1e9
+            if delay > 0 and self._stop.wait(delay):
+                return start_ns, None
+            now_ns = time.monotonic_ns()
+            if start_ns is None:
+                start_ns = now_ns
+            chunk = view[offset:offset + step]
+            self.port.write(chunk)
+            self.writes += 1
+            self.written_bytes += len(chunk)
+            # 令牌桶（不允许突发）：下一段在这一段按限速传完后才能写入
+            self._next_ns = max(self._next_ns, now_ns) + len(chunk) * 1_000_000_000 // byte_rate
+        return start_ns, time.monotonic_ns()
+
+    def stats(self):
+        return {
+            'queued_bytes': self.queued_bytes,
+            'writes': self.writes,
+            'written_bytes': self.written_bytes,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+        }
+
+
+class AutoSender:
+    """周期发送调度线程
+
+    send(data)返回是否提交成功；payload为bytes，或在调度线程中调用生成每次数据的函数
+    （如带发送时间戳的文本）。每个周期的截止时间为start + k*interval，睡眠到截止时间前spin秒后
+    忙等到截止时间（spin为0时只睡眠）；落后超过一个周期时跳过错过的周期并计数，不连续补发。
+    spin为None时按间隔自动选择：短于SPIN_INTERVAL的间隔忙等SPIN秒（睡眠唤醒误差约1ms，
+    相对短间隔不可忽略），更长的间隔只睡眠。
+    """
+
+    SLEEP_SLICE = 0.05  # 长间隔分段睡眠，保证stop()及时返回
+    SPIN = 0.002  # 自动选择时的忙等时长（秒）
+    SPIN_INTERVAL = 0.05  # 自动选择时间隔短于该值（秒）才忙等
+
+    def __init__(self, send, payload, interval, spin=None):
+        self.send = send
+        self.payload = payload
+        self.interval = interval
+        self.spin = spin
+        self._stop = threading.Event()
+        self._thread = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.sent = 0
+        self.failed = 0  # 提交失败（发送队列已满）的次数
+        self.missed = 0  # 跳过的周期数
+        self._first_ns = 0
+        self._last_ns = 0
+        self._intervals = 0
+        self._interval_sum = 0  # 相邻两次发送间隔的累计（纳秒），用于计算实际周期和抖动
+        self._interval_sq = 0
+        self.lateness = LatencyHistogram()  # 发送时刻相对截止时间的延迟（微秒）
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def set_payload(self, payload):
+        """替换发送的数据（下一个周期生效）"""
+        self.payload = payload
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='auto-sender', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _sleep_until(self, deadline_ns):
+        """等待到截止时间，被stop()打断时返回False"""
+        spin = self.spin
+        if spin is None:
+            spin = self.SPIN if self.interval < self.SPIN_INTERVAL else 0.0
+        spin_ns = int(spin * 1e9)
+        while True:
+            if self._stop.is_set():
+                return False
+            remaining = deadline_ns - time.perf_counter_ns()
+            if remaining <= spin_ns:
+                break
+            time.sleep(min((remaining - spin_ns) / 1e9, self.SLEEP_SLICE))
+        while time.perf_counter_ns() < deadline_ns:
+            pass
+        return True
+
+    def _run(self):
+        period_ns = max(int(self.interval * 1e9), 1)
+        deadline = time.perf_counter_ns()
+        while self._sleep_until(deadline):
+            payload = self.payload
+            if callable(payload):
+                payload = payload()
+            now = time.perf_counter_ns()
+            if self.send(payload):
+                self._record(now, deadline)
+            else:
+                self.failed += 1
+            deadline += period_ns
+            behind = time.perf_counter_ns() - deadline
+            if behind >= 0:
+                skipped = behind // period_ns + 1
+                self.missed += skipped
+                deadline += skipped * period_ns
+
+    def _record(self, now, deadline):
+        if self.sent:
+            interval = now - self._last_ns
+            self._intervals += 1
+            self._interval_sum += interval
+            self._interval_sq += interval * interval
+        else:
+            self._first_ns = now
+        self._last_ns = now
+        self.sent += 1
+        self.lateness.record((now - deadline) // 1000)
+
+    def stats(self):
+        """实际周期（平均发送间隔）、周期抖动（间隔的标准差）和相对截止时间的延迟，单位毫秒"""
+        n = self._intervals
+        period = self._interval_sum / n if n else 0.0
+        jitter = math.sqrt(max(self._interval_sq / n - period * period, 0.0)) if n else 0.0
+        lateness = self.lateness
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'missed': self.missed,
+            'interval_ms': self.interval * 1000,
+            'period_ms': round(period / 1e6, 4),
+            'jitter_ms': round(jitter / 1e6, 4),
+            'late_p99_ms': lateness.percentile(99) / 1000,
+            'late_max_ms': lateness.max / 1000,
+        }